@@ -1,5 +1,8 @@
+import json
+
 import pytest
 
+from esrally import client
 from esrally.driver import runner
 
 bulk_index = runner.BulkIndex()
@@ -8,14 +11,15 @@ BULK_SIZE = 5000
 
 
 class ElasticsearchMock:
-    def __init__(self, bulk_size):
-        self.no_errors = {
+    def __init__(self, bulk_size, raw_responses_supported=True):
+        self.raw_responses_supported = raw_responses_supported
+        no_errors = {
             "took": 500,
             "errors": False,
             "items": []
         }
         for idx in range(0, bulk_size):
-            self.no_errors["items"].append({
+            no_errors["items"].append({
                 "index": {
                     "_index": "test",
                     "_type": "type1",
@@ -32,12 +36,18 @@ class ElasticsearchMock:
                     "_seq_no": 0
                 }
             })
+        # Elasticsearch does not pretty-print responses by default
+        self.no_errors = json.dumps(no_errors, separators=(",", ":"))
 
     def bulk(self, body=None, index=None, doc_type=None, params=None):
-        return self.no_errors
+        # like the real client, parse the response unless the caller wants to handle it
+        if self.raw_responses_supported and client.raw_responses_requested():
+            return self.no_errors
+        return json.loads(self.no_errors)
 
 
 es = ElasticsearchMock(bulk_size=BULK_SIZE)
+es_without_raw_responses = ElasticsearchMock(bulk_size=BULK_SIZE, raw_responses_supported=False)
 
 
 @pytest.mark.benchmark(
@@ -54,6 +64,20 @@ def test_bulk_runner_without_errors_no_detailed_results(benchmark):
     })
 
 
+@pytest.mark.benchmark(
+    group="bulk-runner",
+    warmup="on",
+    warmup_iterations=1000,
+    disable_gc=True
+)
+def test_bulk_runner_without_errors_no_detailed_results_parsed_response(benchmark):
+    benchmark(bulk_index, es_without_raw_responses, {
+        "action_metadata_present": True,
+        "body": "bulk API body",
+        "bulk-size": BULK_SIZE
+    })
+
+
 @pytest.mark.benchmark(
     group="bulk-runner",
     warmup="on",
@@ -67,3 +91,16 @@ def test_bulk_runner_without_errors_with_detailed_results(benchmark):
         "bulk-size": BULK_SIZE,
         "detailed-results": True
     })
+
+
+parsed_response = json.loads(es.no_errors)
+
+
+@pytest.mark.benchmark(
+    group="bulk-runner",
+    warmup="on",
+    warmup_iterations=1000,
+    disable_gc=True
+)
+def test_bulk_runner_detailed_stats(benchmark):
+    benchmark(bulk_index.detailed_stats, BULK_SIZE, parsed_response)
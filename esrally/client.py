@@ -1,11 +1,17 @@
+import contextlib
 import gzip
 import logging
+import threading
+import time
 
 import certifi
 import urllib3
 
 logger = logging.getLogger("rally.client")
 
+# tracks per thread whether the caller wants to handle response bodies itself and how many bytes have been transferred
+_request_context = threading.local()
+
 
 class EsClientFactory:
     """
@@ -30,14 +36,29 @@ class EsClientFactory:
 
     def create(self):
         class PoolWrap(object):
-            def __init__(self, pool, compressed=False, **kwargs):
+            def __init__(self, pool, stats, compressed=False, **kwargs):
                 self.pool = pool
+                self.stats = stats
                 self.compressed = compressed
 
             def urlopen(self, method, url, body, retries, headers, **kw):
-                if body is not None and self.compressed:
+                self.stats.request()
+                if isinstance(body, CompressedBody):
+                    # the body has been compressed ahead of time
+                    if not self.compressed:
+                        headers = dict(headers)
+                        headers["Content-Encoding"] = "gzip"
+                elif body is not None and self.compressed:
                     body = gzip.compress(body)
-                return self.pool.urlopen(method, url, body=body, retries=retries, headers=headers, **kw)
+                response = self.pool.urlopen(method, url, body=body, retries=retries, headers=headers, **kw)
+                byte_counts = getattr(_request_context, "byte_counts", None)
+                if byte_counts:
+                    byte_counts.requests += 1
+                    # as sent over the wire, i.e. after compression
+                    byte_counts.request_bytes += len(body) if body else 0
+                    # after decompression
+                    byte_counts.response_bytes += len(response.data) if response.data else 0
+                return response
 
             def __getattr__(self, attr_name):
                 return getattr(self.pool, attr_name)
@@ -50,6 +71,193 @@ class EsClientFactory:
                 if compressed:
                     self.headers.update(urllib3.make_headers(accept_encoding=True))
                     self.headers.update({"Content-Encoding": "gzip"})
-                self.pool = PoolWrap(self.pool, **kwargs)
+                self.stats = ConnectionStats()
+                self.pool.ConnectionCls = timed_connection_class(self.pool.ConnectionCls, self.stats)
+                self.pool = PoolWrap(self.pool, self.stats, **kwargs)
+
+            def log_request_success(self, method, full_url, path, body, status_code, response, duration):
+                # the client would attempt to decode the compressed body
+                if isinstance(body, CompressedBody):
+                    body = None
+                super().log_request_success(method, full_url, path, body, status_code, response, duration)
+
+            def log_request_fail(self, method, full_url, path, body, duration, status_code=None, response=None, exception=None):
+                if isinstance(body, CompressedBody):
+                    body = None
+                super().log_request_fail(method, full_url, path, body, duration, status_code, response, exception)
+
+        class RallySerializer(elasticsearch.serializer.JSONSerializer):
+            def dumps(self, data):
+                # bodies that are already serialized are sent as is
+                if isinstance(data, bytes):
+                    return data
+                return super().dumps(data)
+
+            def loads(self, s):
+                if raw_responses_requested():
+                    return s
+                return super().loads(s)
+
+        class RallyElasticsearch(elasticsearch.Elasticsearch):
+            def _bulk_body(self, body):
+                if isinstance(body, bytes):
+                    return body
+                return super()._bulk_body(body)
+
+        return RallyElasticsearch(hosts=self.hosts, connection_class=ConfigurableHttpConnection, serializer=RallySerializer(),
+                                  **self.client_options)
+
+
+@contextlib.contextmanager
+def raw_responses():
+    """
+    Within this context, Elasticsearch clients that have been created by ``EsClientFactory`` return the response body of requests that
+    are issued by the current thread as a string instead of parsing it.
+    """
+    previous = raw_responses_requested()
+    _request_context.raw = True
+    try:
+        yield
+    finally:
+        _request_context.raw = previous
+
+
+def raw_responses_requested():
+    """
+    :return: ``True`` iff the current thread has requested raw responses with ``raw_responses()``.
+    """
+    return getattr(_request_context, "raw", False)
+
+
+class ByteCounts:
+    def __init__(self):
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+
+@contextlib.contextmanager
+def counting_bytes():
+    """
+    Within this context, Elasticsearch clients that have been created by ``EsClientFactory`` count the size of the request and response
+    bodies of all requests that are issued by the current thread.
+
+    :return: A ``ByteCounts`` instance that is updated with every request.
+    """
+    previous = getattr(_request_context, "byte_counts", None)
+    byte_counts = ByteCounts()
+    _request_context.byte_counts = byte_counts
+    try:
+        yield byte_counts
+    finally:
+        _request_context.byte_counts = previous
+
+
+class CompressedBody(bytes):
+    """
+    A request body that has already been serialized and compressed with gzip.
+    """
+    pass
 
-        return elasticsearch.Elasticsearch(hosts=self.hosts, connection_class=ConfigurableHttpConnection, **self.client_options)
+
+def prepare_body(body, compression_level=None):
+    """
+    Serializes a request body ahead of time so the Elasticsearch client can send it without any further processing.
+
+    :param body: A request body as it would be passed to the Elasticsearch client, i.e. a dict, a string, a list of bulk lines or bytes.
+    :param compression_level: If set, the body is also compressed with gzip with this compression level (1-9).
+    :return: The body as ``bytes`` (or ``CompressedBody`` if it has been compressed).
+    """
+    if body is None or isinstance(body, CompressedBody):
+        return body
+    if not isinstance(body, bytes):
+        import elasticsearch
+        serializer = elasticsearch.serializer.JSONSerializer()
+        if isinstance(body, (list, tuple)):
+            # bulk bodies consist of one line per item and need to end with a newline
+            body = "\n".join(serializer.dumps(line) for line in body) + "\n"
+        else:
+            body = serializer.dumps(body)
+        body = body.encode("utf-8")
+    if compression_level:
+        return CompressedBody(gzip.compress(body, compresslevel=compression_level))
+    return body
+
+
+class ConnectionStats:
+    """
+    Tracks how an Elasticsearch client uses its HTTP connections to one node.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.connect_time = 0.0
+
+    def request(self):
+        with self.lock:
+            self.requests += 1
+
+    def connected(self, duration):
+        with self.lock:
+            self.new_connections += 1
+            self.connect_time += duration
+
+
+def timed_connection_class(connection_class, stats):
+    """
+    :param connection_class: A connection class of urllib3.
+    :param stats: A ``ConnectionStats`` instance that is updated whenever a new connection is opened.
+    :return: A subclass of ``connection_class`` that records how long it takes to open a connection.
+    """
+    class TimedConnection(connection_class):
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            finally:
+                stats.connected(time.perf_counter() - start)
+
+    return TimedConnection
+
+
+def connection_stats(es):
+    """
+    :param es: An Elasticsearch client that has been created by ``EsClientFactory``.
+    :return: A triple of the total number of requests, the number of newly opened connections and the time in seconds that has been
+    spent to open them for all nodes the client is connected to.
+    """
+    requests = 0
+    new_connections = 0
+    connect_time = 0.0
+    for connection in es.transport.connection_pool.connections:
+        stats = connection.stats
+        with stats.lock:
+            requests += stats.requests
+            new_connections += stats.new_connections
+            connect_time += stats.connect_time
+    return requests, new_connections, connect_time
+
+
+def warm_up(es, connections):
+    """
+    Opens the provided number of persistent connections to each node of the provided Elasticsearch client so that the first requests of a
+    benchmark do not need to establish a connection (including a TLS handshake if applicable).
+
+    :param es: An Elasticsearch client that has been created by ``EsClientFactory``.
+    :param connections: The number of connections to open per node.
+    """
+    for connection in es.transport.connection_pool.connections:
+        # bypass our wrapper so warm-up requests are not counted
+        pool = connection.pool.pool
+        # we keep all responses (and thus their connections) until the end, otherwise urllib3 hands out the same connection again
+        responses = []
+        try:
+            for _ in range(min(connections, pool.pool.maxsize)):
+                responses.append(pool.urlopen("HEAD", connection.url_prefix + "/", headers=connection.headers, retries=False,
+                                              preload_content=False, release_conn=False))
+        finally:
+            for response in responses:
+                response.read()
+                response.release_conn()
+        logger.info("Opened [%d] connections to [%s]." % (len(responses), connection.host))
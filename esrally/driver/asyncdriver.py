@@ -0,0 +1,234 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+from esrally.driver import driver
+from esrally.utils import convert
+
+logger = logging.getLogger("rally.driver")
+profile_logger = logging.getLogger("rally.profile")
+
+# Note: This module uses Python 3.5+ syntax. It is only imported if the execution mode "asyncio" is chosen.
+
+
+def execute_clients(cancel, current_track, jobs, enable_profiling=False, max_in_flight=None, prefetch_size=0, record_overhead=False,
+                    stack_sampler=None, task_completion=None):
+    """
+    Runs the tasks of all clients of a load generator as coroutines on a dedicated event loop in the current thread.
+
+    The Elasticsearch client does not support non-blocking I/O so requests are handed over to a thread pool with one thread per in-flight
+    request, i.e. each in-flight request still blocks a thread.
+    Waiting for the next scheduled request and bookkeeping of samples happens on the event loop.
+
+    :param cancel: A shared boolean that indicates we need to cancel execution.
+    :param current_track: The current track.
+    :param jobs: A list of triples of client id, Elasticsearch client and a list of (task, sampler) pairs that this client should run.
+    :param enable_profiling: Enables a Python profiler for the event loop thread (default: False).
+    :param max_in_flight: The maximum number of concurrent requests per client with the open load model. ``None`` (default) for the
+    closed load model.
+    :param prefetch_size: The number of parameters per client that are generated ahead of time in a background thread. 0 (default)
+    disables prefetching.
+    :param record_overhead: Whether to record the time that the load driver spends in the different phases of each request (default:
+    False).
+    :param stack_sampler: A ``driver.StackSampler`` that profiles the event loop thread. As all clients share this thread, samples are
+    attributed to all tasks that run concurrently. Optional.
+    :param task_completion: A dict of task to an event that is set when the task should be completed before its schedule ends. Optional.
+    """
+    if enable_profiling:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    loop = asyncio.new_event_loop()
+    request_pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(len(jobs), 1) * (max_in_flight or 1))
+
+    async def run_all():
+        client_tasks = [asyncio.ensure_future(execute_tasks(loop, request_pool, cancel, current_track, client_id, es, tasks,
+                                                            max_in_flight, prefetch_size, record_overhead, task_completion))
+                        for client_id, es, tasks in jobs]
+        try:
+            await asyncio.gather(*client_tasks)
+        except BaseException:
+            # don't leave other clients running if one of them has failed
+            for client_task in client_tasks:
+                client_task.cancel()
+            await asyncio.gather(*client_tasks, return_exceptions=True)
+            raise
+
+    if stack_sampler:
+        stack_sampler.register(threading.get_ident(), ",".join(sorted({task.operation.name for _, _, tasks in jobs for task, _ in tasks})))
+    try:
+        loop.run_until_complete(run_all())
+    finally:
+        if stack_sampler:
+            stack_sampler.unregister(threading.get_ident())
+        loop.close()
+        request_pool.shutdown()
+        if enable_profiling:
+            import pstats
+            import io as python_io
+            profiler.disable()
+            s = python_io.StringIO()
+            ps = pstats.Stats(profiler, stream=s).sort_stats("cumulative")
+            ps.print_stats()
+            client_ids = [client_id for client_id, _, _ in jobs]
+            profile = "\n=== Profile START for clients %s ===\n" % str(client_ids)
+            profile += s.getvalue()
+            profile += "=== Profile END for clients %s ===" % str(client_ids)
+            profile_logger.info(profile)
+
+
+async def execute_tasks(loop, request_pool, cancel, current_track, client_id, es, tasks, max_in_flight=None, prefetch_size=0,
+                        record_overhead=False, task_completion=None):
+    """
+    Executes the provided tasks for one client one after the other.
+
+    :param loop: The event loop on which this coroutine runs.
+    :param request_pool: The executor that issues (blocking) requests.
+    :param cancel: A shared boolean that indicates we need to cancel execution.
+    :param current_track: The current track.
+    :param client_id: The id of the client that executes the tasks.
+    :param es: Elasticsearch client that will be used to execute the tasks.
+    :param tasks: A list of pairs of a task and the sampler that should store the samples for this task.
+    :param max_in_flight: The maximum number of concurrent requests of this client with the open load model. ``None`` (default) for the
+    closed load model.
+    :param prefetch_size: The number of parameters that are generated ahead of time in a background thread. 0 (default) disables
+    prefetching.
+    :param record_overhead: Whether to record the time that the load driver spends in the different phases of each request (default:
+    False).
+    :param task_completion: A dict of task to an event that is set when the task should be completed before its schedule ends. Optional.
+    """
+    for task, sampler in tasks:
+        if cancel.is_set():
+            break
+        task_start = time.perf_counter()
+        delay = driver.ramp_up_delay(task, client_id)
+        if delay > 0:
+            logger.info("Client [%d] starts [%s] after a ramp-up delay of [%.3f] seconds." % (client_id, task, delay))
+            await asyncio.sleep(delay)
+            if cancel.is_set():
+                break
+        schedule = driver.schedule_for(current_track, task, client_id, prefetch_size, sampler.add_param_source_stall)
+        if driver.ramp_up_time_period(task) > 0:
+            schedule = driver.with_ramp_up(schedule, task_start + driver.ramp_up_time_period(task))
+        if task_completion and task in task_completion:
+            schedule = driver.until_completed(schedule, task_completion[task])
+        if record_overhead:
+            overhead = driver.DriverOverhead(sampler)
+            overhead.instrument(es)
+            try:
+                await execute_schedule(loop, request_pool, cancel, client_id, task.operation, overhead.timed(schedule), es, sampler,
+                                       max_in_flight, overhead)
+            finally:
+                overhead.uninstrument(es)
+        else:
+            await execute_schedule(loop, request_pool, cancel, client_id, task.operation, schedule, es, sampler, max_in_flight)
+
+
+async def wait_until(deadline):
+    """
+    Waits with high precision until the given point in time has been reached. This is the coroutine equivalent of
+    ``driver.wait_until``.
+
+    :param deadline: A point in time as returned by ``time.perf_counter()``.
+    """
+    rest = deadline - time.perf_counter()
+    if rest > driver.PACING_SPIN_SECONDS:
+        await asyncio.sleep(rest - driver.PACING_SPIN_SECONDS)
+    while time.perf_counter() < deadline:
+        # yield to other clients on the event loop while we spin
+        await asyncio.sleep(0)
+
+
+async def execute_schedule(loop, request_pool, cancel, client_id, op, schedule, es, sampler, max_in_flight=None, overhead=None):
+    """
+    Executes tasks according to the schedule for a given operation. This is the coroutine equivalent of ``driver.execute_schedule``.
+
+    :param loop: The event loop on which this coroutine runs.
+    :param request_pool: The executor that issues (blocking) requests.
+    :param cancel: A shared boolean that indicates we need to cancel execution.
+    :param client_id: The id of the client that executes the operation.
+    :param op: The operation that is executed.
+    :param schedule: The schedule for this operation.
+    :param es: Elasticsearch client that will be used to execute the operation.
+    :param sampler: A container to store raw samples.
+    :param max_in_flight: The maximum number of concurrent requests with the open load model. ``None`` (default) for the closed load
+    model.
+    :param overhead: A ``driver.DriverOverhead`` that records the time the load driver spends per request. Optional.
+    """
+    total_start = time.perf_counter()
+    in_flight = set()
+    failures = []
+
+    def request_done(f):
+        in_flight.discard(f)
+        if not f.cancelled() and f.exception() is not None:
+            failures.append(f.exception())
+
+    try:
+        for expected_scheduled_time, sample_type, percent_completed, runner, params in schedule:
+            if cancel.is_set():
+                logger.info("User cancelled execution.")
+                break
+            if failures:
+                raise failures[0]
+            absolute_expected_schedule_time = total_start + expected_scheduled_time
+            throughput_throttled = expected_scheduled_time > 0
+            if throughput_throttled:
+                await wait_until(absolute_expected_schedule_time)
+                if max_in_flight:
+                    # open load model: the arrival of the next request does not depend on the response to this one
+                    if len(in_flight) < max_in_flight:
+                        f = asyncio.ensure_future(execute_and_sample(loop, request_pool, runner, es, params, sampler, sample_type,
+                                                                     percent_completed, total_start, absolute_expected_schedule_time,
+                                                                     overhead))
+                        in_flight.add(f)
+                        f.add_done_callback(request_done)
+                    else:
+                        sampler.add_dropped(sample_type)
+                    continue
+            # Do not calculate latency separately when we don't throttle throughput. This metric is just confusing then.
+            await execute_and_sample(loop, request_pool, runner, es, params, sampler, sample_type, percent_completed, total_start,
+                                     absolute_expected_schedule_time if throughput_throttled else None, overhead)
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            # done callbacks may not have run yet
+            failures.extend([f.exception() for f in done if not f.cancelled() and f.exception() is not None])
+        if failures:
+            raise failures[0]
+    except asyncio.CancelledError:
+        logger.info("Execution of [%s] for client [%s] has been cancelled." % (str(op), str(client_id)))
+        raise
+    except BaseException:
+        logger.exception("Could not execute schedule")
+        raise
+    finally:
+        for f in list(in_flight):
+            f.cancel()
+
+
+async def execute_and_sample(loop, request_pool, runner, es, params, sampler, sample_type, percent_completed, total_start,
+                             expected_start=None, overhead=None):
+    """
+    Executes a single request and adds a sample for it. This is the coroutine equivalent of ``driver.execute_and_sample``.
+    """
+    start = time.perf_counter()
+    total_ops, total_ops_unit, request_meta_data = await loop.run_in_executor(request_pool, driver.execute_single, runner, es, params,
+                                                                                     overhead)
+    stop = time.perf_counter()
+
+    service_time = stop - start
+    if expected_start is not None:
+        latency = stop - expected_start
+        schedule_lag = convert.seconds_to_ms(start - expected_start)
+    else:
+        latency = service_time
+        schedule_lag = None
+    sampling_start = driver.perf_counter_ns()
+    sampler.add(sample_type, request_meta_data, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops,
+                total_ops_unit, (stop - total_start), percent_completed, schedule_lag)
+    if overhead:
+        overhead.record("sampling", sampling_start)
+        overhead.request_finished()
@@ -1,16 +1,30 @@
+import array
+import collections
 import concurrent.futures
+import copy
 import threading
 import datetime
 import json
 import logging
+import math
 import queue
 import socket
+import statistics
+import sys
 import time
 
 import thespian.actors
-from esrally import actor, exceptions, metrics, track, client, PROGRAM_NAME
+
+# NumPy is optional. If it is available, we use it to speed up post-processing of samples.
+try:
+    import numpy
+    numpy_available = True
+except ImportError:
+    numpy_available = False
+
+from esrally import actor, exceptions, metrics, track, client, paths, PROGRAM_NAME
 from esrally.driver import runner, scheduler
-from esrally.utils import convert, console, versions, io
+from esrally.utils import convert, console, versions, io, sysstats
 
 logger = logging.getLogger("rally.driver")
 profile_logger = logging.getLogger("rally.profile")
@@ -44,17 +58,19 @@ class StartLoadGenerator:
     Starts a load generator.
     """
 
-    def __init__(self, client_id, config, track, tasks):
+    def __init__(self, load_generator_id, config, track, client_allocations, prepare_track=False):
         """
-        :param client_id: Client id of the load generator.
+        :param load_generator_id: Id of the load generator.
         :param config: Rally internal configuration object.
         :param track: The track to use.
-        :param tasks: Tasks to run.
+        :param client_allocations: The clients (and their tasks) that this load generator should run.
+        :param prepare_track: True iff this load generator should ensure that the track data are available on its machine.
         """
-        self.client_id = client_id
+        self.load_generator_id = load_generator_id
         self.config = config
         self.track = track
-        self.tasks = tasks
+        self.client_allocations = client_allocations
+        self.prepare_track = prepare_track
 
 
 class Drive:
@@ -62,8 +78,25 @@ class Drive:
     Tells a load generator to drive (either after a join point or initially).
     """
 
-    def __init__(self, client_start_timestamp):
+    def __init__(self, client_start_timestamp, task_params=None, skipped_tasks=None):
+        """
+        :param client_start_timestamp: The point in time (in the clock of the load generator) when the next task should start.
+        :param task_params: A dict of task to parameters that override the task's parameters. Optional.
+        :param skipped_tasks: A collection of tasks that should not be executed. Optional.
+        """
         self.client_start_timestamp = client_start_timestamp
+        self.task_params = task_params if task_params else {}
+        self.skipped_tasks = skipped_tasks if skipped_tasks else set()
+
+
+class CompleteTask:
+    """
+    Tells a load generator that its clients should stop executing the provided task (e.g. because the measurement period after the
+    detected steady state is over).
+    """
+
+    def __init__(self, task):
+        self.task = task
 
 
 class UpdateSamples:
@@ -71,9 +104,20 @@ class UpdateSamples:
     Used to send samples from a load generator node to the master.
     """
 
-    def __init__(self, client_id, samples):
-        self.client_id = client_id
-        self.samples = samples
+    def __init__(self, load_generator_id, chunks, histograms=None, counters=None, stacks=None):
+        """
+        :param load_generator_id: Id of the load generator.
+        :param chunks: A list of ``SampleChunk``.
+        :param histograms: A list of ``RequestHistograms``. Optional.
+        :param counters: A list of tuples of task, counter name, unit, sample type and value (e.g. the number of requests that could not
+        be dispatched because the in-flight limit of the open load model has been reached). Optional.
+        :param stacks: A list of triples of profiling label, collapsed stack and the number of times it has been sampled. Optional.
+        """
+        self.load_generator_id = load_generator_id
+        self.chunks = chunks
+        self.histograms = histograms
+        self.counters = counters
+        self.stacks = stacks
 
 
 class JoinPointReached:
@@ -81,12 +125,31 @@ class JoinPointReached:
     Tells the master that a load generator has reached a join point. Used for coordination across multiple load generators.
     """
 
-    def __init__(self, client_id, task):
-        self.client_id = client_id
-        self.client_local_timestamp = time.perf_counter()
+    def __init__(self, load_generator_id, task):
+        self.load_generator_id = load_generator_id
         self.task = task
 
 
+class Ping:
+    """
+    Sent by the master to a load generator to estimate the offset between their clocks.
+    """
+
+    def __init__(self, master_timestamp):
+        self.master_timestamp = master_timestamp
+
+
+class Pong:
+    """
+    The answer of a load generator to a ``Ping``.
+    """
+
+    def __init__(self, load_generator_id, master_timestamp):
+        self.load_generator_id = load_generator_id
+        self.master_timestamp = master_timestamp
+        self.load_generator_timestamp = time.perf_counter()
+
+
 class BenchmarkComplete:
     """
     Indicates that the benchmark is complete.
@@ -116,6 +179,8 @@ class BenchmarkCancelled:
 
 class Driver(actor.RallyActor):
     WAKEUP_INTERVAL_SECONDS = 1
+    # number of ping exchanges per load generator to estimate its clock offset
+    CLOCK_SYNC_PINGS = 5
     """
     Coordinates all worker drivers.
     """
@@ -126,12 +191,37 @@ class Driver(actor.RallyActor):
         self.config = None
         self.track = None
         self.challenge = None
+        # the challenge's schedule with all throughput searches expanded into their steps
+        self.schedule = None
+        # search step task -> ``ThroughputSearch``
+        self.throughput_searches = {}
+        # target throughput of search steps that are currently running
+        self.search_targets = {}
+        # latency of search steps if individual samples are recorded
+        self.search_latencies = {}
         # Elasticsearch client
         self.es = None
         self.metrics_store = None
+        # only set if metrics should be written to the metrics store while the benchmark is running
+        self.metrics_streamer = None
+        self.lap = None
+        # raw samples are only kept on explicit request
+        self.keep_raw_samples = False
         self.raw_samples = []
+        # throughput and error counts are aggregated incrementally as samples arrive so we only need to finalize them at the end of the
+        # benchmark. Latency and service time are stored per request (unless histograms are recorded).
+        self.throughput_samples = {}
+        self.error_counts = {}
+        # merged latency and service time histograms per task and sample type (only if histograms are recorded)
+        self.histograms = {}
+        # counters per task, counter name, unit and sample type (e.g. requests that could not be dispatched with the open load model)
+        self.counters = {}
+        # profiling label -> collapsed stack -> number of samples (only with the sampling profiler)
+        self.stacks = {}
+        # task -> ``SteadyStateDetector`` (only for tasks with adaptive warmup)
+        self.steady_state_detectors = {}
         self.currently_completed = 0
-        self.clients_completed_current_step = {}
+        self.clock_offsets = {}
         self.current_step = -1
         self.number_of_steps = 0
         self.start_sender = None
@@ -152,20 +242,26 @@ class Driver(actor.RallyActor):
                 self.start_benchmark(msg, sender)
             elif isinstance(msg, JoinPointReached):
                 self.joinpoint_reached(msg)
+            elif isinstance(msg, Pong):
+                self.pong_received(msg)
             elif isinstance(msg, UpdateSamples):
                 self.update_samples(msg)
             elif isinstance(msg, thespian.actors.WakeupMessage):
                 if not self.finished():
                     self.update_progress_message()
+                    if self.metrics_streamer:
+                        self.metrics_streamer.maybe_flush()
                     self.wakeupAfter(datetime.timedelta(seconds=Driver.WAKEUP_INTERVAL_SECONDS))
             elif isinstance(msg, BenchmarkFailure):
                 logger.error("Main driver received a fatal exception from a load generator. Shutting down.")
+                self.close_metrics_streamer()
                 self.metrics_store.close()
                 self.send(self.start_sender, msg)
                 self.send(self.myAddress, thespian.actors.ActorExitRequest())
             elif isinstance(msg, BenchmarkCancelled):
                 logger.info("Main driver received a notification that the benchmark has been cancelled. Shutting down.")
                 self.progress_reporter.finish()
+                self.close_metrics_streamer()
                 self.metrics_store.close()
                 self.send(self.start_sender, msg)
                 self.send(self.myAddress, thespian.actors.ActorExitRequest())
@@ -187,6 +283,7 @@ class Driver(actor.RallyActor):
                 logger.info("Main driver received unknown message [%s] (ignoring)." % (str(msg)))
         except BaseException as e:
             logger.exception("Main driver encountered a fatal exception. Shutting down.")
+            self.close_metrics_streamer()
             if self.metrics_store:
                 self.metrics_store.close()
             self.status = "exiting"
@@ -205,7 +302,7 @@ class Driver(actor.RallyActor):
         selected_car_name = self.config.opts("mechanic", "car.name")
 
         logger.info("Preparing track [%s]" % track_name)
-        # TODO #257: Reconsider this in case we distribute drivers. *For now* the driver will only be on a single machine, so we're safe.
+        # load generators on the coordinator machine rely on this. Remote load driver hosts prepare the track on their own.
         track.prepare_track(self.track, self.config)
 
         logger.info("Benchmark for track [%s], challenge [%s] and car [%s] is about to start." %
@@ -216,15 +313,40 @@ class Driver(actor.RallyActor):
         invocation = self.config.opts("system", "time.start")
         expected_cluster_health = self.config.opts("benchmarks", "cluster.health")
         self.metrics_store.open(invocation, track_name, challenge_name, selected_car_name)
+        if self.config.opts("driver", "live.metrics.enabled", mandatory=False, default_value=False):
+            datastore_type = self.config.opts("reporting", "datastore.type")
+            if datastore_type == "elasticsearch":
+                flush_interval = self.config.opts("driver", "live.metrics.flush.interval", mandatory=False,
+                                                  default_value=MetricsStreamer.DEFAULT_FLUSH_INTERVAL_SECONDS)
+                logger.info("Streaming metrics to the metrics store every [%s] seconds." % str(flush_interval))
+                live_metrics_store = metrics.EsMetricsStore(self.config)
+                live_metrics_store.open(invocation, track_name, challenge_name, selected_car_name)
+                self.metrics_streamer = MetricsStreamer(self.metrics_store, live_metrics_store, flush_interval)
+            else:
+                logger.warning("Live metrics require an Elasticsearch metrics store but datastore type is [%s]. Metrics will only be "
+                               "stored after the benchmark has finished." % datastore_type)
+        self.lap = msg.lap
+        self.keep_raw_samples = self.config.opts("driver", "raw.samples.enabled", mandatory=False, default_value=False)
 
         self.challenge = select_challenge(self.config, self.track)
+        latency_recording = self.config.opts("driver", "latency.recording", mandatory=False, default_value="sample")
+        for tasks in self.challenge.schedule:
+            for task in tasks:
+                if "steady-state" in task.params:
+                    if latency_recording == "histogram":
+                        raise exceptions.SystemSetupError("[%s] uses an adaptive warmup which requires that individual samples are "
+                                                          "recorded but latency recording is [%s]." % (task, latency_recording))
+                    # validates the task definition
+                    SteadyStateDetector.from_task(task)
         for template in self.track.templates:
             setup_template(self.es, template)
 
         for index in self.track.indices:
             setup_index(self.es, index, self.challenge.index_settings)
         wait_for_status(self.es, expected_cluster_health)
-        allocator = Allocator(self.challenge.schedule)
+        self.schedule, self.throughput_searches = expand_throughput_searches(
+            self.challenge.schedule, self.config.opts("track", "test.mode.enabled", mandatory=False, default_value=False))
+        allocator = Allocator(self.schedule)
         self.allocations = allocator.allocations
         self.number_of_steps = len(allocator.join_points) - 1
         self.ops_per_join_point = allocator.operations_per_joinpoint
@@ -232,21 +354,42 @@ class Driver(actor.RallyActor):
         logger.info("Benchmark consists of [%d] steps executed by (at most) [%d] clients as specified by the allocation matrix:\n%s" %
                     (self.number_of_steps, len(self.allocations), self.allocations))
 
-        for client_id in range(allocator.clients):
+        execution_mode = self.config.opts("driver", "execution.mode", mandatory=False, default_value="thread")
+        if execution_mode == "asyncio" and sys.version_info < (3, 5):
+            raise exceptions.SystemSetupError("The execution mode [asyncio] requires at least Python 3.5.")
+        load_driver_hosts = self.config.opts("driver", "hosts", mandatory=False, default_value=["localhost"])
+        remote_hosts = [h for h in load_driver_hosts if not is_local_host(h)]
+        if remote_hosts and not self.config.opts("system", "remote.benchmarking.supported", mandatory=False, default_value=False):
+            raise exceptions.SystemSetupError("To generate load from remote hosts (e.g. %s) you need to start the Rally daemon on each "
+                                              "machine including this one." % remote_hosts[0])
+        # the number of workers applies to each load driver host
+        worker_count = self.config.opts("driver", "worker.count", mandatory=False, default_value=None)
+        if not worker_count:
+            worker_count = default_worker_count()
+        allocations_per_worker = allocations_for_workers(self.allocations, worker_count * len(load_driver_hosts))
+        hosts_per_worker = hosts_for_workers(load_driver_hosts, len(allocations_per_worker))
+
+        for load_generator_id, host in enumerate(hosts_per_worker):
             self.drivers.append(
                 self.createActor(LoadGenerator,
-                                 globalName="/rally/driver/worker/%s" % str(client_id),
-                                 targetActorRequirements={"coordinator": True}))
-        for client_id, driver in enumerate(self.drivers):
-            logger.info("Starting load generator [%d]." % client_id)
-            self.send(driver, StartLoadGenerator(client_id, self.config, self.track, self.allocations[client_id]))
+                                 globalName="/rally/driver/worker/%s" % str(load_generator_id),
+                                 targetActorRequirements=load_generator_requirements(host)))
+        prepared_hosts = set()
+        for load_generator_id, driver in enumerate(self.drivers):
+            client_allocations = allocations_per_worker[load_generator_id]
+            host = hosts_per_worker[load_generator_id]
+            # exactly one load generator per remote host downloads the track data to avoid concurrent downloads of the same file
+            prepare = not is_local_host(host) and host not in prepared_hosts
+            prepared_hosts.add(host)
+            logger.info("Starting load generator [%d] on [%s] for clients %s in execution mode [%s]." %
+                        (load_generator_id, host, client_allocations.client_ids, execution_mode))
+            self.send(driver, StartLoadGenerator(load_generator_id, self.config, self.track, client_allocations, prepare_track=prepare))
 
         self.update_progress_message()
         self.wakeupAfter(datetime.timedelta(seconds=Driver.WAKEUP_INTERVAL_SECONDS))
 
     def joinpoint_reached(self, msg):
         self.currently_completed += 1
-        self.clients_completed_current_step[msg.client_id] = (msg.client_local_timestamp, time.perf_counter())
         logger.info("[%d/%d] drivers reached join point [%d/%d]." %
                     (self.currently_completed, len(self.drivers), self.current_step + 1, self.number_of_steps))
         if self.currently_completed == len(self.drivers):
@@ -254,9 +397,15 @@ class Driver(actor.RallyActor):
                         (self.current_step + 1, self.number_of_steps))
             # we can go on to the next step
             self.currently_completed = 0
-            # make a copy and reset early to avoid any race conditions from clients that reach a join point already while we are sending...
-            clients_curr_step = self.clients_completed_current_step
-            self.clients_completed_current_step = {}
+            for task, detector in self.steady_state_detectors.items():
+                # the task has finished before its steady state has been detected; all remaining samples are considered warmup
+                for chunk in detector.finish():
+                    self.store_samples(chunk)
+                if not detector.stored:
+                    self.store_steady_state(detector)
+            self.steady_state_detectors = {}
+            if self.throughput_searches and self.current_step >= 0:
+                self.evaluate_throughput_searches(self.schedule[self.current_step])
             self.update_progress_message(task_finished=True)
             # clear per step
             self.most_recent_sample_per_client = {}
@@ -266,11 +415,14 @@ class Driver(actor.RallyActor):
                 # we're done here
                 for driver in self.drivers:
                     self.send(driver, thespian.actors.ActorExitRequest())
-                logger.info("Postprocessing samples...")
+                logger.info("Finalizing results...")
                 self.post_process_samples()
+                if self.metrics_streamer:
+                    logger.info("Writing remaining metrics to the metrics store...")
+                    self.close_metrics_streamer(raise_on_error=True)
                 logger.info("Sending benchmark results...")
-                # TODO #257: In case we are not on a single machine, spilling to disk will not work. Check and reimplement if necessary.
-                # Spill to disk to guard against a too large representation of metrics store.
+                # The main driver always runs on the coordinator machine, i.e. the same machine as race control, so we can spill to disk
+                # to guard against a too large representation of metrics store.
                 self.send(self.start_sender, BenchmarkComplete(self.metrics_store.to_externalizable(spill_to_disk=True)))
                 logger.info("Closing metrics store...")
                 self.metrics_store.close()
@@ -279,55 +431,226 @@ class Driver(actor.RallyActor):
                 logger.info("Terminating main driver actor.")
                 self.send(self.myAddress, thespian.actors.ActorExitRequest())
             else:
-                if self.config.opts("track", "test.mode.enabled"):
-                    # don't wait if test mode is enabled and start the next task immediately.
-                    start_next_task = time.perf_counter()
-                else:
-                    # start the next task in five seconds (relative to master's timestamp)
-                    #
-                    # Assumption: We don't have a lot of clock skew between reaching the join point and sending the next task
-                    #             (it doesn't matter too much if we're a few ms off).
-                    start_next_task = time.perf_counter() + 5.0
-                for client_id, driver in enumerate(self.drivers):
-                    client_ended_task_at, master_received_msg_at = clients_curr_step[client_id]
-                    client_start_timestamp = client_ended_task_at + (start_next_task - master_received_msg_at)
-                    logger.info("Scheduling next task for client id [%d] at their timestamp [%f] (master timestamp [%f])" %
-                                (client_id, client_start_timestamp, start_next_task))
-                    self.send(driver, Drive(client_start_timestamp))
+                # before we start the next task, we need to know the clock offset of each load generator
+                self.clock_offsets = {}
+                for load_generator_id, driver in enumerate(self.drivers):
+                    self.clock_offsets[load_generator_id] = ClockOffsetEstimator()
+                    self.send(driver, Ping(time.perf_counter()))
+
+    def pong_received(self, msg):
+        estimator = self.clock_offsets[msg.load_generator_id]
+        estimator.add(msg.master_timestamp, msg.load_generator_timestamp, time.perf_counter())
+        if len(estimator) < Driver.CLOCK_SYNC_PINGS:
+            self.send(self.drivers[msg.load_generator_id], Ping(time.perf_counter()))
+        elif all([len(e) == Driver.CLOCK_SYNC_PINGS for e in self.clock_offsets.values()]):
+            self.start_next_task()
+
+    def start_next_task(self):
+        if self.config.opts("track", "test.mode.enabled"):
+            # don't wait if test mode is enabled and start the next task immediately.
+            delay = 0
+        else:
+            # give all load generators some time to receive the message
+            delay = self.config.opts("driver", "task.start.delay", mandatory=False, default_value=0.5)
+        task_params = {}
+        skipped_tasks = set()
+        if self.throughput_searches:
+            for task in self.schedule[self.current_step]:
+                search = self.throughput_searches.get(task)
+                if search:
+                    target = search.next_target()
+                    if target is None:
+                        logger.info("Skipping [%s] as the throughput search has finished." % task)
+                        skipped_tasks.add(task)
+                    else:
+                        logger.info("Running [%s] with a target throughput of [%s]." % (task, str(target)))
+                        self.search_targets[task] = target
+                        task_params[task] = {"target-throughput": target}
+        start_next_task = time.perf_counter() + delay
+        for load_generator_id, driver in enumerate(self.drivers):
+            estimator = self.clock_offsets[load_generator_id]
+            client_start_timestamp = start_next_task + estimator.offset
+            logger.info("Scheduling next task for load generator [%d] at their timestamp [%f] (master timestamp [%f]). Estimated clock "
+                        "offset is [%.3f] ms with a round-trip time of [%.3f] ms." %
+                        (load_generator_id, client_start_timestamp, start_next_task, convert.seconds_to_ms(estimator.offset),
+                         convert.seconds_to_ms(estimator.round_trip_time)))
+            meta_data = {"load_generator_id": load_generator_id}
+            self.metrics_store.put_value_cluster_level(name="load_generator_clock_offset", value=convert.seconds_to_ms(estimator.offset),
+                                                       unit="ms", meta_data=meta_data)
+            self.metrics_store.put_value_cluster_level(name="load_generator_round_trip_time",
+                                                       value=convert.seconds_to_ms(estimator.round_trip_time), unit="ms",
+                                                       meta_data=meta_data)
+            self.send(driver, Drive(client_start_timestamp, task_params, skipped_tasks))
 
     def finished(self):
         return self.current_step == self.number_of_steps
 
+    def close_metrics_streamer(self, raise_on_error=False):
+        if self.metrics_streamer:
+            streamer = self.metrics_streamer
+            self.metrics_streamer = None
+            try:
+                streamer.close()
+            except BaseException:
+                if raise_on_error:
+                    raise
+                logger.exception("Could not write remaining metrics to the metrics store.")
+
     def update_samples(self, msg):
-        self.raw_samples += msg.samples
-        if len(msg.samples) > 0:
-            most_recent = msg.samples[-1]
-            self.most_recent_sample_per_client[most_recent.client_id] = most_recent
+        for chunk in msg.chunks:
+            # a load generator may run several clients so we need to check all chunks
+            self.most_recent_sample_per_client[chunk.client_id] = chunk[-1]
+            if self.keep_raw_samples:
+                self.raw_samples.append(chunk)
+            if "steady-state" in chunk.task.params:
+                detector = self.steady_state_detectors.get(chunk.task)
+                if detector is None:
+                    detector = SteadyStateDetector.from_task(chunk.task)
+                    self.steady_state_detectors[chunk.task] = detector
+                for c in detector.add(chunk):
+                    self.store_samples(c)
+            else:
+                self.store_samples(chunk)
+        for task, detector in self.steady_state_detectors.items():
+            if detector.steady_state_time is not None and not detector.stored:
+                self.store_steady_state(detector)
+            if detector.measurement_finished and not detector.completion_sent:
+                logger.info("Measurement period of [%s] is over. Asking all load generators to complete it." % task)
+                detector.completion_sent = True
+                for driver in self.drivers:
+                    self.send(driver, CompleteTask(task))
+        if msg.histograms:
+            for h in msg.histograms:
+                k = (h.task, h.sample_type)
+                if k in self.histograms:
+                    self.histograms[k].merge(h)
+                else:
+                    self.histograms[k] = h
+        if msg.stacks:
+            for label, stack, count in msg.stacks:
+                stacks = self.stacks.setdefault(label, collections.Counter())
+                stacks[stack] += count
+        if msg.counters:
+            for task, name, unit, sample_type, value in msg.counters:
+                k = (task, name, unit, sample_type)
+                self.counters[k] = self.counters.get(k, 0) + value
+
+    def store_steady_state(self, detector):
+        task = detector.task
+        op = task.operation
+        if detector.steady_state_reached:
+            logger.info("[%s] has reached steady state after [%.1f] seconds." % (task, detector.warmup_time_period))
+        else:
+            logger.warning("[%s] has not reached steady state within [%.1f] seconds." % (task, detector.warmup_time_period))
+        meta_data = self.merge(self.track.meta_data, self.challenge.meta_data, op.meta_data, task.meta_data,
+                               {"steady_state_reached": detector.steady_state_reached})
+        self.metrics_store.put_value_cluster_level(name="warmup_time_period", value=detector.warmup_time_period, unit="s",
+                                                   operation=op.name, operation_type=op.type, meta_data=meta_data)
+        detector.stored = True
+
+    def store_samples(self, chunk):
+        task = chunk.task
+        if task not in self.throughput_samples:
+            self.throughput_samples[task] = ThroughputSamples(task)
+        self.throughput_samples[task].add_chunk(chunk)
+
+        op = task.operation
+        task_meta_data = self.merge(self.track.meta_data, self.challenge.meta_data, op.meta_data, task.meta_data)
+        if task in self.throughput_searches:
+            search_latency = self.search_latencies.setdefault(task, metrics.Histogram())
+        else:
+            search_latency = None
+        for sample in chunk:
+            if not sample.success:
+                k = (task, sample.sample_type)
+                self.error_counts[k] = self.error_counts.get(k, 0) + 1
+            # if histograms are recorded, samples only contain throughput
+            if sample.latency_ms is None:
+                continue
+            if search_latency is not None and sample.sample_type == metrics.SampleType.Normal:
+                search_latency.record(sample.latency_ms)
+            meta_data = self.merge(task_meta_data, sample.request_meta_data)
+            self.metrics_store.put_value_cluster_level(name="latency", value=sample.latency_ms, unit="ms", operation=op.name,
+                                                       operation_type=op.type, sample_type=sample.sample_type,
+                                                       absolute_time=sample.absolute_time, relative_time=sample.relative_time,
+                                                       meta_data=meta_data)
+
+            self.metrics_store.put_value_cluster_level(name="service_time", value=sample.service_time_ms, unit="ms",
+                                                       operation=op.name, operation_type=op.type, sample_type=sample.sample_type,
+                                                       absolute_time=sample.absolute_time, relative_time=sample.relative_time,
+                                                       meta_data=meta_data)
+            # only available if the runner has reported how long Elasticsearch took to process the request
+            server_time_ms = sample.request_meta_data.get("took") if sample.request_meta_data else None
+            if server_time_ms is not None:
+                self.metrics_store.put_value_cluster_level(name="server_time", value=server_time_ms, unit="ms",
+                                                           operation=op.name, operation_type=op.type, sample_type=sample.sample_type,
+                                                           absolute_time=sample.absolute_time, relative_time=sample.relative_time,
+                                                           meta_data=meta_data)
+            # only available for throughput-throttled tasks
+            if sample.schedule_lag_ms is not None:
+                self.metrics_store.put_value_cluster_level(name="schedule_lag", value=sample.schedule_lag_ms, unit="ms",
+                                                           operation=op.name, operation_type=op.type, sample_type=sample.sample_type,
+                                                           absolute_time=sample.absolute_time, relative_time=sample.relative_time,
+                                                           meta_data=task_meta_data)
 
     def post_process_samples(self):
-        logger.info("Storing latency and service time... ")
-        for sample in self.raw_samples:
+        for (task, sample_type), h in self.histograms.items():
             meta_data = self.merge(
                 self.track.meta_data,
                 self.challenge.meta_data,
-                sample.operation.meta_data,
-                sample.task.meta_data,
-                sample.request_meta_data)
-
-            self.metrics_store.put_value_cluster_level(name="latency", value=sample.latency_ms, unit="ms", operation=sample.operation.name,
-                                                       operation_type=sample.operation.type, sample_type=sample.sample_type,
-                                                       absolute_time=sample.absolute_time, relative_time=sample.relative_time,
-                                                       meta_data=meta_data)
-
-            self.metrics_store.put_value_cluster_level(name="service_time", value=sample.service_time_ms, unit="ms",
-                                                       operation=sample.operation.name, operation_type=sample.operation.type,
-                                                       sample_type=sample.sample_type, absolute_time=sample.absolute_time,
-                                                       relative_time=sample.relative_time, meta_data=meta_data)
-
-        logger.info("Calculating throughput... ")
-        aggregates = calculate_global_throughput(self.raw_samples)
-        logger.info("Storing throughput... ")
-        for task, samples in aggregates.items():
+                task.operation.meta_data,
+                task.meta_data
+            )
+            op = task.operation
+            self.metrics_store.put_histogram_cluster_level(name="latency", histogram=h.latency, unit="ms", operation=op.name,
+                                                           operation_type=op.type, sample_type=sample_type, meta_data=meta_data)
+            self.metrics_store.put_histogram_cluster_level(name="service_time", histogram=h.service_time, unit="ms", operation=op.name,
+                                                           operation_type=op.type, sample_type=sample_type, meta_data=meta_data)
+            if h.server_time.count > 0:
+                self.metrics_store.put_histogram_cluster_level(name="server_time", histogram=h.server_time, unit="ms",
+                                                               operation=op.name, operation_type=op.type, sample_type=sample_type,
+                                                               meta_data=meta_data)
+            if h.schedule_lag.count > 0:
+                self.metrics_store.put_histogram_cluster_level(name="schedule_lag", histogram=h.schedule_lag, unit="ms",
+                                                               operation=op.name, operation_type=op.type, sample_type=sample_type,
+                                                               meta_data=meta_data)
+            self.metrics_store.put_count_cluster_level(name="error_count", count=h.error_count, operation=op.name,
+                                                       operation_type=op.type, sample_type=sample_type, meta_data=meta_data)
+
+        for (task, sample_type), error_count in self.error_counts.items():
+            logger.warning("[%d] requests of [%s] (sample type [%s]) have failed." % (error_count, task, sample_type.name))
+
+        # the load driver overhead is recorded as a total per task and reported as the mean per request
+        overhead_requests = {task: value for (task, name, _, _), value in self.counters.items() if name == "driver_overhead_requests"}
+        # the rejection rate is reported relative to all bulk items that have been sent
+        bulk_items = {(task, sample_type): value for (task, name, _, sample_type), value in self.counters.items() if name == "bulk_items"}
+        for (task, name, unit, sample_type), value in self.counters.items():
+            if name in ["driver_overhead_requests", "bulk_items"]:
+                continue
+            elif name.startswith("driver_overhead_"):
+                if not overhead_requests.get(task):
+                    continue
+                value = value / overhead_requests[task] / 1000 / 1000
+                unit = "ms"
+            if name == "dropped_requests":
+                logger.warning("[%d] requests of [%s] (sample type [%s]) could not be dispatched because too many requests were in "
+                               "flight." % (value, task, sample_type.name))
+            elif name == "param_source_stalls":
+                logger.warning("Clients had to wait [%d] times for parameters of [%s]." % (value, task))
+            op = task.operation
+            meta_data = self.merge(self.track.meta_data, self.challenge.meta_data, op.meta_data, task.meta_data)
+            self.metrics_store.put_value_cluster_level(name=name, value=value, unit=unit, operation=op.name, operation_type=op.type,
+                                                       sample_type=sample_type, meta_data=meta_data)
+            if name == "rejected_items" and bulk_items.get((task, sample_type)):
+                if value > 0:
+                    logger.warning("Elasticsearch has rejected bulk items [%d] times for [%s] (sample type [%s])." %
+                                   (value, task, sample_type.name))
+                self.metrics_store.put_value_cluster_level(name="rejection_rate", value=value / bulk_items[(task, sample_type)],
+                                                           unit=None, operation=op.name, operation_type=op.type, sample_type=sample_type,
+                                                           meta_data=meta_data)
+
+        logger.info("Calculating and storing throughput... ")
+        for task, samples in self.throughput_samples.items():
             meta_data = self.merge(
                 self.track.meta_data,
                 self.challenge.meta_data,
@@ -335,11 +658,105 @@ class Driver(actor.RallyActor):
                 task.meta_data
             )
             op = task.operation
-            for absolute_time, relative_time, sample_type, throughput, throughput_unit in samples:
+            for absolute_time, relative_time, sample_type, throughput, throughput_unit in calculate_task_throughput(samples):
                 self.metrics_store.put_value_cluster_level(name="throughput", value=throughput, unit=throughput_unit,
                                                            operation=op.name, operation_type=op.type, sample_type=sample_type,
                                                            absolute_time=absolute_time, relative_time=relative_time, meta_data=meta_data)
 
+        self.store_throughput_searches()
+
+        if self.keep_raw_samples:
+            self.write_raw_samples()
+        if self.stacks:
+            self.write_stacks()
+
+    def evaluate_throughput_searches(self, tasks):
+        sample_type = metrics.SampleType.Normal
+        for task in tasks:
+            search = self.throughput_searches.get(task)
+            # skipped steps do not have a target
+            if search is None or task not in self.search_targets:
+                continue
+            target = self.search_targets.pop(task)
+            if (task, sample_type) in self.histograms:
+                h = self.histograms[(task, sample_type)]
+                latency = h.latency
+                errors = h.error_count
+            else:
+                latency = self.search_latencies.get(task, metrics.Histogram())
+                errors = self.error_counts.get((task, sample_type), 0)
+            throughput = []
+            throughput_unit = None
+            if task in self.throughput_samples:
+                for _, _, st, value, unit in calculate_task_throughput(self.throughput_samples[task]):
+                    if st == sample_type:
+                        throughput.append(value)
+                        throughput_unit = unit
+            search.add_step(target,
+                            throughput=statistics.median(throughput) if throughput else None,
+                            throughput_unit=throughput_unit,
+                            latency=latency.percentile(search.latency_percentile) if latency.count > 0 else None,
+                            error_rate=errors / latency.count if latency.count > 0 else None)
+            step = search.steps[-1]
+            logger.info("Throughput search for [%s] at target throughput [%s]: throughput [%s], %sth percentile latency [%s] ms, "
+                        "error rate [%s]. Service level objective met: [%s]." %
+                        (search.task, str(target), str(step["throughput"]), str(search.latency_percentile), str(step["latency"]),
+                         str(step["error_rate"]), str(step["slo_met"])))
+
+    def store_throughput_searches(self):
+        searches = []
+        for search in self.throughput_searches.values():
+            if search not in searches:
+                searches.append(search)
+        for search in searches:
+            task = search.task
+            op = task.operation
+            meta_data = self.merge(self.track.meta_data, self.challenge.meta_data, op.meta_data, task.meta_data)
+            for step in search.steps:
+                if step["latency"] is not None:
+                    step_meta_data = self.merge(meta_data, {
+                        "step": step["step"],
+                        "target_throughput": step["target_throughput"],
+                        "throughput": step["throughput"],
+                        "latency_percentile": search.latency_percentile,
+                        "error_rate": step["error_rate"],
+                        "slo_met": step["slo_met"]
+                    })
+                    self.metrics_store.put_value_cluster_level(name="throughput_search_latency", value=step["latency"], unit="ms",
+                                                               operation=op.name, operation_type=op.type, meta_data=step_meta_data)
+            best = search.best_step
+            if best:
+                logger.info("Maximum sustainable throughput of [%s] is [%s] %s." % (task, str(best["throughput"]), best["throughput_unit"]))
+                self.metrics_store.put_value_cluster_level(name="max_sustainable_throughput", value=best["throughput"],
+                                                           unit=best["throughput_unit"], operation=op.name, operation_type=op.type,
+                                                           meta_data=self.merge(meta_data, {"target_throughput": best["target_throughput"]}))
+            else:
+                logger.warning("No step of the throughput search for [%s] has met the service level objective." % task)
+
+    def write_raw_samples(self):
+        output_path = "%s/raw_samples_lap_%d.csv" % (paths.race_root(self.config), self.lap)
+        logger.info("Writing raw samples to [%s]." % output_path)
+        io.ensure_dir(io.dirname(output_path))
+        with open(output_path, mode="wt", encoding="UTF-8") as f:
+            print("client_id,absolute_time,relative_time,operation,sample_type,latency_ms,service_time_ms,schedule_lag_ms,total_ops,"
+                  "total_ops_unit,time_period,success", file=f)
+            for chunk in self.raw_samples:
+                for s in chunk:
+                    print("%d,%f,%f,%s,%s,%s,%s,%s,%s,%s,%f,%s" %
+                          (s.client_id, s.absolute_time, s.relative_time, s.operation.name, s.sample_type.name.lower(), s.latency_ms,
+                           s.service_time_ms, s.schedule_lag_ms, s.total_ops, s.total_ops_unit, s.time_period, s.success), file=f)
+
+    def write_stacks(self):
+        for label, stacks in self.stacks.items():
+            file_name = "".join([c if c.isalnum() or c in "-_" else "_" for c in label])
+            output_path = "%s/profile_lap_%d_%s.collapsed" % (paths.race_root(self.config), self.lap, file_name)
+            logger.info("Writing [%d] sampled stacks of [%s] to [%s]." % (sum(stacks.values()), label, output_path))
+            io.ensure_dir(io.dirname(output_path))
+            with open(output_path, mode="wt", encoding="UTF-8") as f:
+                for stack, count in stacks.most_common():
+                    print("%s %d" % (stack, count), file=f)
+        self.stacks = {}
+
     def merge(self, *args):
         result = {}
         for arg in args:
@@ -361,9 +778,71 @@ class Driver(actor.RallyActor):
                 self.progress_reporter.finish()
 
 
+class MetricsStreamer:
+    """
+    Transfers metrics from the master driver's in-memory metrics store to the Elasticsearch metrics store while the benchmark is running.
+
+    Documents are written in batches on a background thread so the driver can continue to process samples. As each batch is removed from
+    the in-memory metrics store, memory usage is bounded by the number of documents that are produced within one flush interval.
+    """
+    DEFAULT_FLUSH_INTERVAL_SECONDS = 10
+    # if more batches are in flight, we wait for the metrics store to catch up
+    MAX_PENDING_BATCHES = 2
+
+    def __init__(self, source, target, flush_interval=DEFAULT_FLUSH_INTERVAL_SECONDS, clock=time.perf_counter):
+        """
+        :param source: An ``InMemoryMetricsStore`` that receives all metrics of the master driver.
+        :param target: An (open) ``EsMetricsStore`` to which documents are transferred. It must not be used by anybody else.
+        :param flush_interval: The minimum time in seconds between two batches.
+        :param clock: A function returning the current time in seconds. Only needed for testing.
+        """
+        self.source = source
+        self.target = target
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.last_flush = clock()
+        self.pending = collections.deque()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def maybe_flush(self):
+        """
+        Transfers all documents in a background batch if the flush interval has elapsed.
+        """
+        if self.clock() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Transfers all documents that are currently in the source metrics store in a background batch.
+        """
+        self.last_flush = self.clock()
+        # surface errors of completed batches and apply back pressure if the metrics store cannot keep up
+        while self.pending and (self.pending[0].done() or len(self.pending) >= MetricsStreamer.MAX_PENDING_BATCHES):
+            self.pending.popleft().result()
+        docs = self.source.remove_docs()
+        if len(docs) > 0:
+            logger.debug("Streaming [%d] metrics records to the metrics store." % len(docs))
+            self.pending.append(self.executor.submit(self._write, docs))
+
+    def _write(self, docs):
+        self.target.add_docs(docs)
+        self.target.flush()
+
+    def close(self):
+        """
+        Transfers all remaining documents and waits until all batches have been written.
+        """
+        try:
+            self.flush()
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            self.executor.shutdown()
+
+
 class LoadGenerator(actor.RallyActor):
     """
-    The actual driver that applies load against the cluster.
+    The actual driver that applies load against the cluster. One load generator can run one or more clients.
 
     It will also regularly send measurements to the master node so it can consolidate them.
     """
@@ -374,156 +853,656 @@ class LoadGenerator(actor.RallyActor):
         super().__init__()
         actor.RallyActor.configure_logging(logger)
         self.master = None
-        self.client_id = None
+        self.load_generator_id = None
+        # Elasticsearch client per client id
         self.es = None
         self.config = None
         self.track = None
-        self.tasks = None
-        self.current_task = 0
+        self.client_allocations = None
+        self.current_task_index = 0
         self.start_timestamp = None
-        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.execution_mode = None
+        self.latency_recording = None
+        # maximum number of requests in flight per client (only with the open load model)
+        self.max_in_flight = None
+        # number of parameters per client that are generated ahead of time
+        self.prefetch_size = 0
+        self.record_overhead = False
+        # only set if the sampling profiler is enabled
+        self.stack_sampler = None
+        # task -> event that is set when the master asks to complete it (only for tasks with adaptive warmup)
+        self.task_completion = {}
+        # client id -> pair of the connection statistics of the client's Elasticsearch client when the current step has started and the
+        # sampler of its first task in this step
+        self.connection_stats = {}
+        self.pool = None
         # cancellation via future does not work, hence we use our own mechanism with a shared variable and polling
         self.cancel = threading.Event()
-        self.executor_future = None
-        self.sampler = None
+        self.executor_futures = []
+        self.samplers = []
         self.start_driving = False
+        self.task_params = {}
+        self.skipped_tasks = set()
         self.wakeup_interval = LoadGenerator.WAKEUP_INTERVAL_SECONDS
 
     def receiveMessage(self, msg, sender):
         try:
-            logger.debug("LoadGenerator[%s]#receiveMessage(msg = [%s], sender = [%s])" % (str(self.client_id), str(type(msg)), str(sender)))
+            logger.debug("LoadGenerator[%s]#receiveMessage(msg = [%s], sender = [%s])" %
+                         (str(self.load_generator_id), str(type(msg)), str(sender)))
             if isinstance(msg, StartLoadGenerator):
-                logger.info("LoadGenerator[%d] is about to start." % msg.client_id)
+                logger.info("LoadGenerator[%d] is about to start for clients %s." %
+                            (msg.load_generator_id, msg.client_allocations.client_ids))
                 self.master = sender
-                self.client_id = msg.client_id
-                self.es = client.EsClientFactory(msg.config.opts("client", "hosts"), msg.config.opts("client", "options")).create()
+                self.load_generator_id = msg.load_generator_id
                 self.config = msg.config
                 self.track = msg.track
-                self.tasks = msg.tasks
-                self.current_task = 0
+                self.client_allocations = msg.client_allocations
+                if msg.prepare_track:
+                    logger.info("LoadGenerator[%d] is preparing track [%s]." % (self.load_generator_id, self.track.name))
+                    track.prepare_track(self.track, self.config)
+                self.es = {}
+                for client_id in self.client_allocations.client_ids:
+                    self.es[client_id] = client.EsClientFactory(self.config.opts("client", "hosts"),
+                                                                self.config.opts("client", "options")).create()
+                self.warm_up_connections()
+                self.current_task_index = 0
                 self.cancel.clear()
+                self.execution_mode = self.config.opts("driver", "execution.mode", mandatory=False, default_value="thread")
+                self.latency_recording = self.config.opts("driver", "latency.recording", mandatory=False, default_value="sample")
+                if self.config.opts("driver", "load.model", mandatory=False, default_value="closed") == "open":
+                    self.max_in_flight = self.config.opts("driver", "max.in.flight.requests", mandatory=False,
+                                                          default_value=DEFAULT_MAX_IN_FLIGHT_REQUESTS)
+                else:
+                    self.max_in_flight = None
+                self.prefetch_size = self.config.opts("driver", "params.prefetch.size", mandatory=False, default_value=0)
+                self.record_overhead = self.config.opts("driver", "overhead.recording", mandatory=False, default_value=False)
+                if self.config.opts("driver", "profiling") and \
+                        self.config.opts("driver", "profiling.mode", mandatory=False, default_value="cprofile") == "sampling":
+                    self.stack_sampler = StackSampler(self.config.opts("driver", "profiling.sampling.interval", mandatory=False,
+                                                                       default_value=StackSampler.DEFAULT_INTERVAL_SECONDS))
+                else:
+                    self.stack_sampler = None
+                if self.execution_mode == "asyncio":
+                    # all clients of this load generator share one thread that runs the event loop
+                    self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+                else:
+                    self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.client_allocations))
                 # we need to wake up more often in test mode
                 if self.config.opts("track", "test.mode.enabled"):
                     self.wakeup_interval = 0.5
-                self.start_timestamp = time.perf_counter()
+                # determined with the first task so relative times are comparable across all load driver hosts
+                self.start_timestamp = None
                 track.load_track_plugins(self.config, runner.register_runner, scheduler.register_scheduler)
                 self.drive()
+            elif isinstance(msg, Ping):
+                self.send(sender, Pong(self.load_generator_id, msg.master_timestamp))
+            elif isinstance(msg, CompleteTask):
+                logger.info("LoadGenerator[%d] is asked to complete [%s]." % (self.load_generator_id, msg.task))
+                if msg.task in self.task_completion:
+                    self.task_completion[msg.task].set()
             elif isinstance(msg, Drive):
                 logger.debug("LoadGenerator[%d] is continuing its work at task index [%d] on [%f]." %
-                             (self.client_id, self.current_task, msg.client_start_timestamp))
+                             (self.load_generator_id, self.current_task_index, msg.client_start_timestamp))
                 self.start_driving = True
-                self.wakeupAfter(datetime.timedelta(seconds=time.perf_counter() - msg.client_start_timestamp))
+                self.task_params = msg.task_params
+                self.skipped_tasks = msg.skipped_tasks
+                if self.start_timestamp is None:
+                    # the master sends the same point in time (in our clock) to all load generators
+                    self.start_timestamp = msg.client_start_timestamp
+                self.wakeupAfter(datetime.timedelta(seconds=max(msg.client_start_timestamp - time.perf_counter(), 0)))
             elif isinstance(msg, thespian.actors.WakeupMessage):
                 # it would be better if we could send ourselves a message at a specific time, simulate this with a boolean...
                 if self.start_driving:
-                    logger.info("LoadGenerator[%s] starts driving now." % str(self.client_id))
+                    logger.info("LoadGenerator[%s] starts driving now." % str(self.load_generator_id))
                     self.start_driving = False
                     self.drive()
                 else:
-                    current_samples = self.send_samples()
+                    current_chunks = self.send_samples()
+                    failure = self.executor_failure()
                     if self.cancel.is_set():
                         logger.info("LoadGenerator[%s] has detected that benchmark has been cancelled. Notifying master..." %
-                                    str(self.client_id))
+                                    str(self.load_generator_id))
                         self.send(self.master, BenchmarkCancelled())
-                    elif self.executor_future is not None and self.executor_future.done():
-                        e = self.executor_future.exception(timeout=0)
-                        if e:
-                            logger.info("LoadGenerator[%s] has detected a benchmark failure. Notifying master..." % str(self.client_id))
-                            self.send(self.master, BenchmarkFailure("Error in load generator [%d]" % self.client_id, e))
-                        else:
-                            logger.info("LoadGenerator[%s] is ready for the next task." % str(self.client_id))
-                            self.executor_future = None
-                            self.drive()
+                    elif failure:
+                        logger.info("LoadGenerator[%s] has detected a benchmark failure. Notifying master..." % str(self.load_generator_id))
+                        self.send(self.master, BenchmarkFailure("Error in load generator [%d]" % self.load_generator_id, failure))
+                    elif len(self.executor_futures) > 0 and all([f.done() for f in self.executor_futures]):
+                        logger.info("LoadGenerator[%s] is ready for the next task." % str(self.load_generator_id))
+                        self.executor_futures = []
+                        self.drive()
                     else:
-                        if current_samples and len(current_samples) > 0:
-                            most_recent_sample = current_samples[-1]
+                        if current_chunks:
+                            most_recent_sample = current_chunks[-1][-1]
                             logger.info("LoadGenerator[%s] is executing [%s] (%.2f%% complete)." %
-                                        (str(self.client_id), most_recent_sample.task, most_recent_sample.percent_completed * 100.0))
+                                        (str(self.load_generator_id), most_recent_sample.task,
+                                         most_recent_sample.percent_completed * 100.0))
                         else:
-                            logger.info("LoadGenerator[%s] is executing (no samples)." % (str(self.client_id)))
+                            logger.info("LoadGenerator[%s] is executing (no samples)." % (str(self.load_generator_id)))
                         self.wakeupAfter(datetime.timedelta(seconds=self.wakeup_interval))
             elif isinstance(msg, thespian.actors.ActorExitRequest):
-                logger.info("LoadGenerator[%s] is exiting due to ActorExitRequest." % str(self.client_id))
-                if self.executor_future is not None and self.executor_future.running():
+                logger.info("LoadGenerator[%s] is exiting due to ActorExitRequest." % str(self.load_generator_id))
+                if any([f.running() for f in self.executor_futures]):
                     self.cancel.set()
                     self.pool.shutdown()
+                if self.stack_sampler:
+                    self.stack_sampler.stop()
             else:
-                logger.info("LoadGenerator[%d] received unknown message [%s] (ignoring)." % (self.client_id, str(msg)))
+                logger.info("LoadGenerator[%d] received unknown message [%s] (ignoring)." % (self.load_generator_id, str(msg)))
         except Exception as e:
-            logger.exception("Fatal error in LoadGenerator[%d]" % self.client_id)
-            self.send(self.master, BenchmarkFailure("Fatal error in load generator [%d]" % self.client_id, e))
+            logger.exception("Fatal error in LoadGenerator[%d]" % self.load_generator_id)
+            self.send(self.master, BenchmarkFailure("Fatal error in load generator [%d]" % self.load_generator_id, e))
 
     def drive(self):
-        profiling_enabled = self.config.opts("driver", "profiling")
-        task = None
-        # skip non-tasks in the task list
-        while task is None:
-            task = self.tasks[self.current_task]
-            self.current_task += 1
-
-        if isinstance(task, JoinPoint):
-            logger.info("LoadGenerator[%d] reached join point [%s]." % (self.client_id, task))
+        # the sampling profiler replaces the (much more expensive) profiler per client
+        profiling_enabled = self.config.opts("driver", "profiling") and self.stack_sampler is None
+        if self.client_allocations.is_join_point(self.current_task_index):
+            task = self.client_allocations.join_point(self.current_task_index)
+            self.current_task_index += 1
+            logger.info("LoadGenerator[%d] reached join point [%s]." % (self.load_generator_id, task))
             # clients that don't execute tasks don't need to care about waiting
-            if self.executor_future is not None:
-                self.executor_future.result()
+            for executor_future in self.executor_futures:
+                executor_future.result()
+            if self.stack_sampler:
+                self.stack_sampler.stop()
+            self.record_connection_stats()
             self.send_samples()
             self.cancel.clear()
-            self.executor_future = None
-            self.sampler = None
-            self.send(self.master, JoinPointReached(self.client_id, task))
-        elif isinstance(task, track.Task):
-            logger.info("LoadGenerator[%d] is executing [%s]." % (self.client_id, task))
-            self.sampler = Sampler(self.client_id, task, self.start_timestamp)
-            schedule = schedule_for(self.track, task, self.client_id)
-            self.executor_future = self.pool.submit(execute_schedule,
-                                                    self.cancel, self.client_id, task.operation, schedule, self.es, self.sampler,
-                                                    profiling_enabled)
-            self.wakeupAfter(datetime.timedelta(seconds=self.wakeup_interval))
+            self.executor_futures = []
+            self.samplers = []
+            self.send(self.master, JoinPointReached(self.load_generator_id, task))
         else:
-            raise exceptions.RallyAssertionError("Unknown task type [%s]" % type(task))
+            # each client runs all of its tasks until the next join point one after the other
+            next_join_point_index = self.client_allocations.next_join_point_index(self.current_task_index)
+            jobs = []
+            self.task_completion = {}
+            for client_id, tasks in self.client_allocations.tasks(self.current_task_index, next_join_point_index):
+                tasks_and_samplers = []
+                for task in tasks:
+                    if not isinstance(task, track.Task):
+                        raise exceptions.RallyAssertionError("Unknown task type [%s]" % type(task))
+                    if task in self.skipped_tasks:
+                        logger.info("LoadGenerator[%d] skips [%s] with client [%d]." % (self.load_generator_id, task, client_id))
+                        continue
+                    if task in self.task_params:
+                        task = copy.copy(task)
+                        task.params = self.merge_params(task.params, self.task_params[task])
+                    logger.info("LoadGenerator[%d] is executing [%s] with client [%d]." % (self.load_generator_id, task, client_id))
+                    if "steady-state" in task.params and task not in self.task_completion:
+                        self.task_completion[task] = threading.Event()
+                    if self.latency_recording == "histogram":
+                        sampler = HistogramSampler(client_id, task, self.start_timestamp)
+                    else:
+                        sampler = Sampler(client_id, task, self.start_timestamp)
+                    self.samplers.append(sampler)
+                    tasks_and_samplers.append((task, sampler))
+                if tasks_and_samplers:
+                    jobs.append((client_id, self.es[client_id], tasks_and_samplers))
+                    self.connection_stats[client_id] = (client.connection_stats(self.es[client_id]), tasks_and_samplers[0][1])
+            self.current_task_index = next_join_point_index
+            if not jobs:
+                # none of our clients participates in this step; proceed to the join point immediately
+                self.drive()
+                return
+
+            if self.stack_sampler:
+                self.stack_sampler.start()
+            if self.execution_mode == "asyncio":
+                from esrally.driver import asyncdriver
+                self.executor_futures = [self.pool.submit(asyncdriver.execute_clients, self.cancel, self.track, jobs, profiling_enabled,
+                                                          self.max_in_flight, self.prefetch_size, self.record_overhead,
+                                                          self.stack_sampler, self.task_completion)]
+            else:
+                self.executor_futures = [self.pool.submit(execute_tasks, self.cancel, self.track, client_id, es, tasks_and_samplers,
+                                                          profiling_enabled, self.max_in_flight, self.prefetch_size,
+                                                          self.record_overhead, self.stack_sampler, self.task_completion)
+                                         for client_id, es, tasks_and_samplers in jobs]
+            self.wakeupAfter(datetime.timedelta(seconds=self.wakeup_interval))
+
+    def warm_up_connections(self):
+        connections = self.config.opts("driver", "connections.warmup.count", mandatory=False, default_value=1)
+        if connections > 0:
+            logger.info("LoadGenerator[%d] is opening [%d] connection(s) per client." % (self.load_generator_id, connections))
+            for client_id, es in self.es.items():
+                try:
+                    client.warm_up(es, connections)
+                except BaseException:
+                    # the benchmark still works, just with connection setup cost in the first requests
+                    logger.exception("LoadGenerator[%d] could not open connections for client [%d]." % (self.load_generator_id, client_id))
+
+    def record_connection_stats(self):
+        for client_id, ((requests_before, new_before, connect_time_before), sampler) in self.connection_stats.items():
+            requests, new_connections, connect_time = client.connection_stats(self.es[client_id])
+            requests -= requests_before
+            new_connections -= new_before
+            connect_time = convert.seconds_to_ms(connect_time - connect_time_before)
+            reused_connections = max(requests - new_connections, 0)
+            logger.info("Client [%d] has issued [%d] requests with [%d] new and [%d] reused connections. Opening connections took "
+                        "[%.3f] ms." % (client_id, requests, new_connections, reused_connections, connect_time))
+            sampler.pending_counters.add("connections_new", new_connections)
+            sampler.pending_counters.add("connections_reused", reused_connections)
+            sampler.pending_counters.add("connection_setup_time", connect_time, unit="ms")
+        self.connection_stats = {}
+
+    def executor_failure(self):
+        for executor_future in self.executor_futures:
+            if executor_future.done():
+                e = executor_future.exception(timeout=0)
+                if e:
+                    return e
+        return None
+
+    def merge_params(self, params, overrides):
+        result = dict(params)
+        result.update(overrides)
+        return result
 
     def send_samples(self):
-        if self.sampler:
-            samples = self.sampler.samples
-            if len(samples) > 0:
-                self.send(self.master, UpdateSamples(self.client_id, samples))
-            return samples
+        if self.samplers:
+            chunks = []
+            histograms = []
+            counters = []
+            for sampler in self.samplers:
+                chunks += sampler.chunks
+                histograms += sampler.histograms
+                counters += [(sampler.task, name, unit, sample_type, value)
+                             for (name, unit, sample_type), value in sampler.counters.items()]
+            stacks = self.stack_sampler.stacks if self.stack_sampler else []
+            if len(chunks) > 0 or len(histograms) > 0 or len(counters) > 0 or len(stacks) > 0:
+                self.send(self.master, UpdateSamples(self.load_generator_id, chunks, histograms, counters, stacks))
+            return chunks
         return None
 
 
+class Counters:
+    """
+    Accumulates counters (e.g. the number of dropped requests) of a client until the load generator retrieves them.
+    """
+
+    def __init__(self):
+        # counters are updated by the client and retrieved by the load generator in different threads
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name, value, unit=None, sample_type=metrics.SampleType.Normal):
+        k = (name, unit, sample_type)
+        with self.lock:
+            self.values[k] = self.values.get(k, 0) + value
+
+    def drain(self):
+        """
+        :return: A dict of (counter name, unit, sample type) to the counter value that has been gathered since the last call.
+        """
+        with self.lock:
+            values = self.values
+            self.values = {}
+        return values
+
+
+def count_rejections(counters, sample_type, request_meta_data):
+    """
+    Counts rejected bulk items and retries if the runner has retried rejected items.
+
+    :param counters: The ``Counters`` of the client.
+    :param sample_type: The sample type of the request.
+    :param request_meta_data: The meta data that the runner has returned for the request. May be ``None``.
+    """
+    if request_meta_data and "rejected-count" in request_meta_data:
+        # only needed to calculate the rejection rate
+        counters.add("bulk_items", request_meta_data.get("bulk-size", 0), sample_type=sample_type)
+        counters.add("rejected_items", request_meta_data["rejected-count"], unit="docs", sample_type=sample_type)
+        counters.add("bulk_retries", request_meta_data["retries"], sample_type=sample_type)
+        counters.add("bulk_retry_time", request_meta_data["retry-time"], unit="ms", sample_type=sample_type)
+
+
 class Sampler:
     """
     Encapsulates management of gathered samples.
+
+    Samples are written to a ``SampleChunk``. When it is full, the sampler continues with a new chunk so no samples are lost if the load
+    generator does not retrieve them fast enough.
+    """
+
+    def __init__(self, client_id, task, start_timestamp, chunk_size=1024):
+        self.client_id = client_id
+        self.task = task
+        self.start_timestamp = start_timestamp
+        self.chunk_size = chunk_size
+        # samples are added by the client and retrieved by the load generator in different threads
+        self.lock = threading.Lock()
+        self.current_chunk = SampleChunk(client_id, task, chunk_size)
+        self.finished_chunks = []
+        self.pending_counters = Counters()
+
+    def add(self, sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, percent_completed,
+            schedule_lag_ms=None):
+        absolute_time = time.time()
+        relative_time = time.perf_counter() - self.start_timestamp
+        with self.lock:
+            if self.current_chunk.full:
+                self.finished_chunks.append(self.current_chunk)
+                self.current_chunk = SampleChunk(self.client_id, self.task, self.chunk_size)
+            self.current_chunk.append(absolute_time, relative_time, sample_type, request_meta_data, latency_ms, service_time_ms,
+                                      total_ops, total_ops_unit, time_period, percent_completed, schedule_lag_ms)
+        count_rejections(self.pending_counters, sample_type, request_meta_data)
+
+    @property
+    def chunks(self):
+        """
+        :return: All chunks with samples that have been gathered since the last call.
+        """
+        with self.lock:
+            chunks = self.finished_chunks
+            if len(self.current_chunk) > 0:
+                chunks.append(self.current_chunk)
+                self.current_chunk = SampleChunk(self.client_id, self.task, self.chunk_size)
+            self.finished_chunks = []
+        return chunks
+
+    def add_dropped(self, sample_type):
+        """
+        Counts a request that could not be dispatched because the in-flight limit of the open load model has been reached.
+        """
+        self.pending_counters.add("dropped_requests", 1, sample_type=sample_type)
+
+    def add_param_source_stall(self, stall_time_ms):
+        """
+        Counts a request for which the client had to wait until its parameters have been prefetched.
+        """
+        self.pending_counters.add("param_source_stalls", 1)
+        self.pending_counters.add("param_source_stall_time", stall_time_ms, unit="ms")
+
+    @property
+    def counters(self):
+        """
+        :return: A dict of (counter name, unit, sample type) to the counter value that has been gathered since the last call.
+        """
+        return self.pending_counters.drain()
+
+    @property
+    def samples(self):
+        return [sample for chunk in self.chunks for sample in chunk]
+
+    @property
+    def histograms(self):
+        return []
+
+
+class HistogramSampler:
+    """
+    Records latency and service time in histograms instead of keeping an individual sample per request. Throughput is tracked with one
+    aggregated sample per second.
     """
 
     def __init__(self, client_id, task, start_timestamp):
         self.client_id = client_id
         self.task = task
         self.start_timestamp = start_timestamp
-        self.q = queue.Queue(maxsize=16384)
+        # samples are added by the client and retrieved by the load generator in different threads
+        self.lock = threading.Lock()
+        self.throughput = collections.OrderedDict()
+        self.request_histograms = {}
+        self.pending_counters = Counters()
+
+    def add(self, sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, percent_completed,
+            schedule_lag_ms=None):
+        absolute_time = time.time()
+        relative_time = time.perf_counter() - self.start_timestamp
+        with self.lock:
+            if sample_type not in self.request_histograms:
+                self.request_histograms[sample_type] = RequestHistograms(self.task, sample_type)
+            self.request_histograms[sample_type].record(latency_ms, service_time_ms, request_meta_data.get("success", True),
+                                                        schedule_lag_ms, request_meta_data.get("took"))
+
+            k = (sample_type, int(relative_time))
+            aggregated = self.throughput.get(k)
+            if aggregated is None:
+                self.throughput[k] = [absolute_time, relative_time, total_ops, total_ops_unit, time_period, percent_completed]
+            else:
+                aggregated[0] = absolute_time
+                aggregated[1] = relative_time
+                aggregated[2] += total_ops
+                aggregated[4] = time_period
+                aggregated[5] = percent_completed
+        count_rejections(self.pending_counters, sample_type, request_meta_data)
 
-    def add(self, sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period, percent_completed):
-        try:
-            self.q.put_nowait(Sample(self.client_id, time.time(), time.perf_counter() - self.start_timestamp, self.task,
-                                     sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit, time_period,
-                                     percent_completed))
-        except queue.Full:
-            logger.warning("Dropping sample for [%s] due to a full sampling queue." % self.task.operation.name)
+    @property
+    def chunks(self):
+        with self.lock:
+            throughput = self.throughput
+            self.throughput = collections.OrderedDict()
+        if len(throughput) == 0:
+            return []
+        chunk = SampleChunk(self.client_id, self.task, len(throughput))
+        for (sample_type, _), (absolute_time, relative_time, total_ops, total_ops_unit, time_period, percent_completed) in \
+                throughput.items():
+            # latency and service time are only available in the histograms
+            chunk.append(absolute_time, relative_time, sample_type, None, None, None, total_ops, total_ops_unit, time_period,
+                         percent_completed, None)
+        return [chunk]
 
     @property
     def samples(self):
-        samples = []
-        try:
-            while True:
-                samples.append(self.q.get_nowait())
-        except queue.Empty:
-            pass
-        return samples
+        return [sample for chunk in self.chunks for sample in chunk]
+
+    def add_dropped(self, sample_type):
+        self.pending_counters.add("dropped_requests", 1, sample_type=sample_type)
+
+    def add_param_source_stall(self, stall_time_ms):
+        self.pending_counters.add("param_source_stalls", 1)
+        self.pending_counters.add("param_source_stall_time", stall_time_ms, unit="ms")
+
+    @property
+    def counters(self):
+        return self.pending_counters.drain()
+
+    @property
+    def histograms(self):
+        """
+        :return: All histograms that have been recorded since the last call. Each call starts new histograms.
+        """
+        with self.lock:
+            histograms = list(self.request_histograms.values())
+            self.request_histograms = {}
+        return histograms
+
+
+class SampleChunk:
+    """
+    A block of samples for one client and task. Samples are stored column-wise in preallocated typed arrays which is much more compact
+    than one object per sample and can be transferred to the master as a contiguous block.
+    """
+    # columns of type double (missing values are stored as NaN)
+    FLOAT_COLUMNS = ["absolute_time", "relative_time", "latency_ms", "service_time_ms", "schedule_lag_ms", "total_ops", "time_period",
+                     "percent_completed"]
+
+    def __init__(self, client_id, task, capacity):
+        self.client_id = client_id
+        self.task = task
+        self.capacity = capacity
+        self.size = 0
+        for column in SampleChunk.FLOAT_COLUMNS:
+            setattr(self, column, array.array("d", bytes(8 * capacity)))
+        self.sample_type = array.array("b", bytes(capacity))
+        self.success = array.array("b", bytes(capacity))
+        self.total_ops_unit = [None] * capacity
+        self.request_meta_data = [None] * capacity
+
+    @property
+    def full(self):
+        return self.size == self.capacity
+
+    def append(self, absolute_time, relative_time, sample_type, request_meta_data, latency_ms, service_time_ms, total_ops, total_ops_unit,
+               time_period, percent_completed, schedule_lag_ms=None):
+        idx = self.size
+        self.absolute_time[idx] = absolute_time
+        self.relative_time[idx] = relative_time
+        self.latency_ms[idx] = latency_ms if latency_ms is not None else float("nan")
+        self.service_time_ms[idx] = service_time_ms if service_time_ms is not None else float("nan")
+        self.schedule_lag_ms[idx] = schedule_lag_ms if schedule_lag_ms is not None else float("nan")
+        self.total_ops[idx] = total_ops
+        self.time_period[idx] = time_period
+        self.percent_completed[idx] = percent_completed
+        self.sample_type[idx] = sample_type
+        self.success[idx] = 0 if request_meta_data and request_meta_data.get("success") is False else 1
+        self.total_ops_unit[idx] = total_ops_unit
+        self.request_meta_data[idx] = request_meta_data
+        self.size += 1
+
+    def retain(self, predicate):
+        """
+        Removes all samples for which ``predicate`` does not hold. The remaining samples are compacted in place.
+
+        :param predicate: A function that is called with the index of each sample.
+        """
+        columns = [getattr(self, column) for column in SampleChunk.FLOAT_COLUMNS] + \
+                  [self.sample_type, self.success, self.total_ops_unit, self.request_meta_data]
+        size = 0
+        for idx in range(self.size):
+            if predicate(idx):
+                if size != idx:
+                    for column in columns:
+                        column[size] = column[idx]
+                size += 1
+        self.size = size
+
+    def __getstate__(self):
+        # only transfer the used part of each column
+        state = self.__dict__.copy()
+        for column in SampleChunk.FLOAT_COLUMNS + ["sample_type", "success", "total_ops_unit", "request_meta_data"]:
+            state[column] = state[column][:self.size]
+        state["capacity"] = self.size
+        return state
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.size
+        if not 0 <= idx < self.size:
+            raise IndexError("sample index [%d] out of range" % idx)
+        return SampleView(self, idx)
+
+    def __iter__(self):
+        for idx in range(self.size):
+            yield SampleView(self, idx)
+
+
+class SampleView:
+    """
+    Provides the same interface as ``Sample`` for one sample in a ``SampleChunk``.
+    """
+    __slots__ = ["chunk", "index"]
+
+    def __init__(self, chunk, index):
+        self.chunk = chunk
+        self.index = index
+
+    @property
+    def client_id(self):
+        return self.chunk.client_id
+
+    @property
+    def task(self):
+        return self.chunk.task
+
+    @property
+    def operation(self):
+        return self.chunk.task.operation
+
+    @property
+    def absolute_time(self):
+        return self.chunk.absolute_time[self.index]
+
+    @property
+    def relative_time(self):
+        return self.chunk.relative_time[self.index]
+
+    @property
+    def sample_type(self):
+        return metrics.SampleType(self.chunk.sample_type[self.index])
+
+    @property
+    def request_meta_data(self):
+        return self.chunk.request_meta_data[self.index]
+
+    @property
+    def latency_ms(self):
+        v = self.chunk.latency_ms[self.index]
+        return None if math.isnan(v) else v
+
+    @property
+    def service_time_ms(self):
+        v = self.chunk.service_time_ms[self.index]
+        return None if math.isnan(v) else v
+
+    @property
+    def schedule_lag_ms(self):
+        v = self.chunk.schedule_lag_ms[self.index]
+        return None if math.isnan(v) else v
+
+    @property
+    def success(self):
+        return self.chunk.success[self.index] == 1
+
+    @property
+    def total_ops(self):
+        v = self.chunk.total_ops[self.index]
+        return int(v) if v.is_integer() else v
+
+    @property
+    def total_ops_unit(self):
+        return self.chunk.total_ops_unit[self.index]
+
+    @property
+    def time_period(self):
+        return self.chunk.time_period[self.index]
+
+    @property
+    def percent_completed(self):
+        return self.chunk.percent_completed[self.index]
+
+    def __repr__(self, *args, **kwargs):
+        return "[%f; %f] [client [%s]] [%s] [%s]: [%s] ms request latency, [%s] ms service time, [%s %s]" % \
+               (self.absolute_time, self.relative_time, self.client_id, self.task, self.sample_type, self.latency_ms, self.service_time_ms,
+                self.total_ops, self.total_ops_unit)
+
+
+class RequestHistograms:
+    """
+    Latency, service time and server time histograms as well as the number of errors for one task and sample type.
+    """
+
+    def __init__(self, task, sample_type):
+        self.task = task
+        self.sample_type = sample_type
+        self.latency = metrics.Histogram()
+        self.service_time = metrics.Histogram()
+        self.schedule_lag = metrics.Histogram()
+        self.server_time = metrics.Histogram()
+        self.error_count = 0
+
+    def record(self, latency_ms, service_time_ms, success, schedule_lag_ms=None, server_time_ms=None):
+        self.latency.record(latency_ms)
+        self.service_time.record(service_time_ms)
+        if schedule_lag_ms is not None:
+            self.schedule_lag.record(schedule_lag_ms)
+        if server_time_ms is not None:
+            self.server_time.record(server_time_ms)
+        if not success:
+            self.error_count += 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.service_time.merge(other.service_time)
+        self.schedule_lag.merge(other.schedule_lag)
+        self.server_time.merge(other.server_time)
+        self.error_count += other.error_count
 
 
 class Sample:
     def __init__(self, client_id, absolute_time, relative_time, task, sample_type, request_meta_data, latency_ms, service_time_ms,
-                 total_ops, total_ops_unit, time_period, percent_completed):
+                 total_ops, total_ops_unit, time_period, percent_completed, schedule_lag_ms=None):
         self.client_id = client_id
         self.absolute_time = absolute_time
         self.relative_time = relative_time
@@ -536,13 +1515,14 @@ class Sample:
         self.total_ops_unit = total_ops_unit
         self.time_period = time_period
         self.percent_completed = percent_completed
+        self.schedule_lag_ms = schedule_lag_ms
 
     @property
     def operation(self):
         return self.task.operation
 
     def __repr__(self, *args, **kwargs):
-        return "[%f; %f] [client [%s]] [%s] [%s]: [%f] ms request latency, [%f] ms service time, [%d %s]" % \
+        return "[%f; %f] [client [%s]] [%s] [%s]: [%s] ms request latency, [%s] ms service time, [%d %s]" % \
                (self.absolute_time, self.relative_time, self.client_id, self.task, self.sample_type, self.latency_ms, self.service_time_ms,
                 self.total_ops, self.total_ops_unit)
 
@@ -679,6 +1659,41 @@ def _do_wait(es, expected_cluster_status, sleep=time.sleep):
     raise exceptions.RallyAssertionError(msg)
 
 
+class ThroughputSamples:
+    """
+    Holds the data of all samples of one task that are needed to calculate throughput in a compact, column-oriented format.
+    """
+
+    def __init__(self, task):
+        self.task = task
+        self.absolute_time = array.array("d")
+        self.relative_time = array.array("d")
+        self.sample_type = array.array("b")
+        self.total_ops = array.array("d")
+        self.time_period = array.array("d")
+        self.total_ops_unit = []
+
+    def add(self, sample):
+        self.absolute_time.append(sample.absolute_time)
+        self.relative_time.append(sample.relative_time)
+        self.sample_type.append(sample.sample_type)
+        self.total_ops.append(sample.total_ops)
+        self.time_period.append(sample.time_period)
+        self.total_ops_unit.append(sample.total_ops_unit)
+
+    def add_chunk(self, chunk):
+        size = len(chunk)
+        self.absolute_time.extend(chunk.absolute_time[:size])
+        self.relative_time.extend(chunk.relative_time[:size])
+        self.sample_type.extend(chunk.sample_type[:size])
+        self.total_ops.extend(chunk.total_ops[:size])
+        self.time_period.extend(chunk.time_period[:size])
+        self.total_ops_unit.extend(chunk.total_ops_unit[:size])
+
+    def __len__(self):
+        return len(self.absolute_time)
+
+
 def calculate_global_throughput(samples, bucket_interval_secs=1):
     """
     Calculates global throughput based on samples gathered from multiple load generators.
@@ -692,60 +1707,234 @@ def calculate_global_throughput(samples, bucket_interval_secs=1):
     for sample in samples:
         k = sample.task
         if k not in samples_per_task:
-            samples_per_task[k] = []
-        samples_per_task[k].append(sample)
+            samples_per_task[k] = ThroughputSamples(k)
+        samples_per_task[k].add(sample)
 
     global_throughput = {}
-    # with open("raw_samples.csv", "w") as sample_log:
-    #    print("client_id,absolute_time,relative_time,operation,sample_type,total_ops,time_period", file=sample_log)
-    for k, v in samples_per_task.items():
-        task = k
-        if task not in global_throughput:
-            global_throughput[task] = []
-        # sort all samples by time
-        current_samples = sorted(v, key=lambda s: s.absolute_time)
-
-        total_count = 0
-        interval = 0
-        current_bucket = 0
-        current_sample_type = current_samples[0].sample_type
-        sample_count_for_current_sample_type = 0
-        start_time = current_samples[0].absolute_time - current_samples[0].time_period
-        for sample in current_samples:
-            # print("%d,%f,%f,%s,%s,%d,%f" %
-            # (sample.client_id, sample.absolute_time, sample.relative_time, sample.operation, sample.sample_type,
-            #  sample.total_ops, sample.time_period), file=sample_log)
-
-            # once we have seen a new sample type, we stick to it.
-            if current_sample_type < sample.sample_type:
-                current_sample_type = sample.sample_type
-                sample_count_for_current_sample_type = 0
-
-            total_count += sample.total_ops
-            interval = max(sample.absolute_time - start_time, interval)
-
-            # avoid division by zero
-            if interval > 0 and interval >= current_bucket:
-                sample_count_for_current_sample_type += 1
-                current_bucket = int(interval) + bucket_interval_secs
-                throughput = (total_count / interval)
-                # we calculate throughput per second
-                global_throughput[task].append(
-                    (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
-        # also include the last sample if we don't have one for the current sample type, even if it is below the bucket interval
-        # (mainly needed to ensure we show throughput data in test mode)
-        if interval > 0 and sample_count_for_current_sample_type == 0:
+    for task, task_samples in samples_per_task.items():
+        global_throughput[task] = calculate_task_throughput(task_samples, bucket_interval_secs)
+    return global_throughput
+
+
+def calculate_task_throughput(samples, bucket_interval_secs=1):
+    """
+    Calculates throughput for a single task.
+
+    :param samples: A ``ThroughputSamples`` instance containing all samples of this task from all load generators.
+    :param bucket_interval_secs: The bucket interval for aggregations.
+    :return: A list of throughput samples.
+    """
+    if len(samples) == 0:
+        return []
+    elif numpy_available:
+        return _vectorized_task_throughput(samples, bucket_interval_secs)
+    else:
+        return _iterative_task_throughput(samples, bucket_interval_secs)
+
+
+def _vectorized_task_throughput(samples, bucket_interval_secs):
+    absolute_times = numpy.frombuffer(samples.absolute_time, dtype=numpy.float64)
+    # a stable sort ensures we get the same result as _iterative_task_throughput() for samples with identical timestamps
+    order = numpy.argsort(absolute_times, kind="mergesort")
+    absolute_times = absolute_times[order]
+    time_periods = numpy.frombuffer(samples.time_period, dtype=numpy.float64)[order]
+    # once we have seen a new sample type, we stick to it.
+    sample_types = numpy.maximum.accumulate(numpy.frombuffer(samples.sample_type, dtype=numpy.int8)[order])
+    total_counts = numpy.cumsum(numpy.frombuffer(samples.total_ops, dtype=numpy.float64)[order])
+    intervals = numpy.maximum.accumulate(absolute_times - (absolute_times[0] - time_periods[0]))
+
+    # We need one throughput sample for the first sample that reaches the next bucket. As there are usually orders of magnitude less
+    # buckets than samples, we look up bucket boundaries with a binary search instead of visiting all samples.
+    sample_indices = []
+    # avoid division by zero
+    idx = int(numpy.searchsorted(intervals, 0, side="right"))
+    while idx < len(intervals):
+        sample_indices.append(idx)
+        current_bucket = int(intervals[idx]) + bucket_interval_secs
+        idx = max(int(numpy.searchsorted(intervals, current_bucket, side="left")), idx + 1)
+
+    # also include the last sample if we don't have one for the current sample type, even if it is below the bucket interval
+    # (mainly needed to ensure we show throughput data in test mode)
+    last = len(intervals) - 1
+    first_of_current_sample_type = int(numpy.searchsorted(sample_types, sample_types[last], side="left"))
+    if intervals[last] > 0 and (len(sample_indices) == 0 or sample_indices[-1] < first_of_current_sample_type):
+        sample_indices.append(last)
+
+    throughput_samples = []
+    for idx in sample_indices:
+        original_idx = order[idx]
+        throughput_samples.append((float(absolute_times[idx]), samples.relative_time[original_idx],
+                                   metrics.SampleType(int(sample_types[idx])), float(total_counts[idx] / intervals[idx]),
+                                   "%s/s" % samples.total_ops_unit[original_idx]))
+    return throughput_samples
+
+
+def _iterative_task_throughput(samples, bucket_interval_secs):
+    throughput_samples = []
+    absolute_times = samples.absolute_time
+    # sort all samples by time
+    order = sorted(range(len(samples)), key=absolute_times.__getitem__)
+
+    total_count = 0
+    interval = 0
+    current_bucket = 0
+    current_sample_type = samples.sample_type[order[0]]
+    sample_count_for_current_sample_type = 0
+    start_time = absolute_times[order[0]] - samples.time_period[order[0]]
+    for idx in order:
+        sample_type = samples.sample_type[idx]
+        absolute_time = absolute_times[idx]
+        # once we have seen a new sample type, we stick to it.
+        if current_sample_type < sample_type:
+            current_sample_type = sample_type
+            sample_count_for_current_sample_type = 0
+
+        total_count += samples.total_ops[idx]
+        interval = max(absolute_time - start_time, interval)
+
+        # avoid division by zero
+        if interval > 0 and interval >= current_bucket:
+            sample_count_for_current_sample_type += 1
+            current_bucket = int(interval) + bucket_interval_secs
             throughput = (total_count / interval)
-            global_throughput[task].append(
-                (sample.absolute_time, sample.relative_time, current_sample_type, throughput, "%s/s" % sample.total_ops_unit))
+            # we calculate throughput per second
+            throughput_samples.append((absolute_time, samples.relative_time[idx], metrics.SampleType(current_sample_type), throughput,
+                                       "%s/s" % samples.total_ops_unit[idx]))
+    # also include the last sample if we don't have one for the current sample type, even if it is below the bucket interval
+    # (mainly needed to ensure we show throughput data in test mode)
+    if interval > 0 and sample_count_for_current_sample_type == 0:
+        throughput = (total_count / interval)
+        throughput_samples.append((absolute_time, samples.relative_time[idx], metrics.SampleType(current_sample_type), throughput,
+                                   "%s/s" % samples.total_ops_unit[idx]))
+
+    return throughput_samples
+
+
+def execute_tasks(cancel, current_track, client_id, es, tasks, enable_profiling=False, max_in_flight=None, prefetch_size=0,
+                  record_overhead=False, stack_sampler=None, task_completion=None):
+    """
+    Executes the provided tasks for one client one after the other.
+
+    :param cancel: A shared boolean that indicates we need to cancel execution.
+    :param current_track: The current track.
+    :param client_id: The id of the client that executes the tasks.
+    :param es: Elasticsearch client that will be used to execute the tasks.
+    :param tasks: A list of pairs of a task and the sampler that should store the samples for this task.
+    :param enable_profiling: Enables a Python profiler for this execution (default: False).
+    :param max_in_flight: The maximum number of concurrent requests of this client with the open load model. ``None`` (default) for the
+    closed load model.
+    :param prefetch_size: The number of parameters that are generated ahead of time in a background thread. 0 (default) disables
+    prefetching.
+    :param record_overhead: Whether to record the time that the load driver spends in the different phases of each request (default:
+    False).
+    :param stack_sampler: A ``StackSampler`` that profiles the current thread while a task is executed. Optional.
+    :param task_completion: A dict of task to an event that is set when the task should be completed before its schedule ends. Optional.
+    """
+    for task, sampler in tasks:
+        if cancel.is_set():
+            break
+        if stack_sampler:
+            stack_sampler.register(threading.get_ident(), task.operation.name)
+        try:
+            execute_task(cancel, current_track, client_id, es, task, sampler, enable_profiling, max_in_flight, prefetch_size,
+                         record_overhead, task_completion.get(task) if task_completion else None)
+        finally:
+            if stack_sampler:
+                stack_sampler.unregister(threading.get_ident())
+
+
+def execute_task(cancel, current_track, client_id, es, task, sampler, enable_profiling, max_in_flight, prefetch_size, record_overhead,
+                 completed=None):
+    """
+    Executes a single task for one client. See ``execute_tasks`` for a description of the parameters.
+
+    :param completed: An event that is set when the task should be completed before its schedule ends. Optional.
+    """
+    task_start = time.perf_counter()
+    delay = ramp_up_delay(task, client_id)
+    if delay > 0:
+        logger.info("Client [%d] starts [%s] after a ramp-up delay of [%.3f] seconds." % (client_id, task, delay))
+        # returns early on cancellation
+        if cancel.wait(delay):
+            return
+    schedule = schedule_for(current_track, task, client_id, prefetch_size, sampler.add_param_source_stall)
+    if ramp_up_time_period(task) > 0:
+        schedule = with_ramp_up(schedule, task_start + ramp_up_time_period(task))
+    if completed:
+        schedule = until_completed(schedule, completed)
+    if record_overhead:
+        overhead = DriverOverhead(sampler)
+        overhead.instrument(es)
+        try:
+            execute_schedule(cancel, client_id, task.operation, overhead.timed(schedule), es, sampler, enable_profiling, max_in_flight,
+                             overhead)
+        finally:
+            overhead.uninstrument(es)
+    else:
+        execute_schedule(cancel, client_id, task.operation, schedule, es, sampler, enable_profiling, max_in_flight)
+
+
+# Maps the position of a client among all clients of a task (in the range [0, 1)) to the point in time when it starts (as a fraction of
+# the ramp-up time period).
+RAMP_UP_CURVES = {
+    "linear": lambda x: x,
+    # starts only few clients at first and the majority towards the end of the ramp-up time period
+    "quadratic": lambda x: x * x,
+    # starts the majority of clients early
+    "square-root": lambda x: math.sqrt(x)
+}
 
-    return global_throughput
 
+def ramp_up_time_period(task):
+    return task.params.get("ramp-up-time-period", 0)
 
-def execute_schedule(cancel, client_id, op, schedule, es, sampler, enable_profiling=False):
+
+def ramp_up_delay(task, client_id):
+    """
+    Calculates how long a client waits after the start of a task before it issues its first request so that the clients of a task start
+    gradually instead of all at once.
+
+    :param task: The task that is about to start.
+    :param client_id: The id of the client.
+    :return: The delay in seconds.
+    """
+    time_period = ramp_up_time_period(task)
+    if not time_period:
+        return 0
+    curve_name = task.params.get("ramp-up-curve", "linear")
+    if curve_name not in RAMP_UP_CURVES:
+        raise exceptions.SystemSetupError("Unknown ramp-up curve [%s] for [%s]. Use one of %s." %
+                                          (curve_name, task, sorted(RAMP_UP_CURVES.keys())))
+    return time_period * RAMP_UP_CURVES[curve_name]((client_id % task.clients) / task.clients)
+
+
+def with_ramp_up(schedule, ramp_up_end):
+    """
+    Marks all samples of a schedule as warmup samples that are taken before the ramp-up time period of a task has ended.
+
+    :param schedule: The schedule of a client.
+    :param ramp_up_end: The point in time (as returned by ``time.perf_counter()``) when all clients of the task have started.
+    :return: A generator for the modified schedule.
+    """
+    for expected_scheduled_time, sample_type, percent_completed, runner, params in schedule:
+        if time.perf_counter() < ramp_up_end:
+            sample_type = metrics.SampleType.Warmup
+        yield expected_scheduled_time, sample_type, percent_completed, runner, params
+
+
+# Default limit of concurrent requests per client for the open load model
+DEFAULT_MAX_IN_FLIGHT_REQUESTS = 32
+
+
+def execute_schedule(cancel, client_id, op, schedule, es, sampler, enable_profiling=False, max_in_flight=None, overhead=None):
     """
     Executes tasks according to the schedule for a given operation.
 
+    By default, a client waits for the response of a request before it issues the next one (closed load model). If ``max_in_flight`` is
+    provided, requests of throughput-throttled tasks are dispatched at their scheduled arrival time regardless of whether previous
+    requests have already finished (open load model). Requests that arrive while ``max_in_flight`` requests are outstanding are dropped
+    and counted.
+
     :param cancel: A shared boolean that indicates we need to cancel execution.
     :param client_id: The id of the client that executes the operation.
     :param op: The operation that is executed.
@@ -753,6 +1942,9 @@ def execute_schedule(cancel, client_id, op, schedule, es, sampler, enable_profil
     :param es: Elasticsearch client that will be used to execute the operation.
     :param sampler: A container to store raw samples.
     :param enable_profiling: Enables a Python profiler for this execution (default: False).
+    :param max_in_flight: The maximum number of concurrent requests with the open load model. ``None`` (default) for the closed load
+    model.
+    :param overhead: A ``DriverOverhead`` that records the time the load driver spends per request. Optional.
     """
     if enable_profiling:
         logger.debug("Enabling Python profiler for [%s]" % str(op))
@@ -764,6 +1956,7 @@ def execute_schedule(cancel, client_id, op, schedule, es, sampler, enable_profil
         logger.debug("Python profiler for [%s] is disabled." % str(op))
 
     total_start = time.perf_counter()
+    in_flight = InFlightRequests(max_in_flight) if max_in_flight else None
     # noinspection PyBroadException
     try:
         for expected_scheduled_time, sample_type, percent_completed, runner, params in schedule:
@@ -773,22 +1966,24 @@ def execute_schedule(cancel, client_id, op, schedule, es, sampler, enable_profil
             absolute_expected_schedule_time = total_start + expected_scheduled_time
             throughput_throttled = expected_scheduled_time > 0
             if throughput_throttled:
-                rest = absolute_expected_schedule_time - time.perf_counter()
-                if rest > 0:
-                    time.sleep(rest)
-            start = time.perf_counter()
-            total_ops, total_ops_unit, request_meta_data = execute_single(runner, es, params)
-            stop = time.perf_counter()
-
-            service_time = stop - start
+                wait_until(absolute_expected_schedule_time)
+                if in_flight:
+                    # open load model: the arrival of the next request does not depend on the response to this one
+                    if not in_flight.submit(execute_and_sample, runner, es, params, sampler, sample_type, percent_completed, total_start,
+                                            absolute_expected_schedule_time, overhead):
+                        sampler.add_dropped(sample_type)
+                    continue
             # Do not calculate latency separately when we don't throttle throughput. This metric is just confusing then.
-            latency = stop - absolute_expected_schedule_time if throughput_throttled else service_time
-            sampler.add(sample_type, request_meta_data, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops,
-                        total_ops_unit, (stop - total_start), percent_completed)
+            execute_and_sample(runner, es, params, sampler, sample_type, percent_completed, total_start,
+                               absolute_expected_schedule_time if throughput_throttled else None, overhead)
+        if in_flight:
+            in_flight.close()
     except BaseException:
         logger.exception("Could not execute schedule")
         raise
     finally:
+        if in_flight:
+            in_flight.shutdown()
         if enable_profiling:
             profiler.disable()
             s = python_io.StringIO()
@@ -802,16 +1997,290 @@ def execute_schedule(cancel, client_id, op, schedule, es, sampler, enable_profil
             profile_logger.info(profile)
 
 
-def execute_single(runner, es, params):
+def execute_and_sample(runner, es, params, sampler, sample_type, percent_completed, total_start, expected_start=None, overhead=None):
+    """
+    Executes a single request and adds a sample for it.
+
+    :param runner: The runner that executes the request.
+    :param es: Elasticsearch client that will be used to execute the request.
+    :param params: The parameters for the runner.
+    :param sampler: A container to store raw samples.
+    :param sample_type: The sample type of this request.
+    :param percent_completed: The progress of the task after this request.
+    :param total_start: The point in time when the schedule has been started as returned by ``time.perf_counter()``.
+    :param expected_start: The point in time when the request should have been issued for throughput-throttled tasks. ``None`` otherwise.
+    :param overhead: A ``DriverOverhead`` that records the time the load driver spends per request. Optional.
+    """
+    start = time.perf_counter()
+    total_ops, total_ops_unit, request_meta_data = execute_single(runner, es, params, overhead)
+    stop = time.perf_counter()
+
+    service_time = stop - start
+    if expected_start is not None:
+        latency = stop - expected_start
+        # How late did we send the request? If this is significant, the load driver is the bottleneck and not Elasticsearch.
+        schedule_lag = convert.seconds_to_ms(start - expected_start)
+    else:
+        latency = service_time
+        schedule_lag = None
+    sampling_start = perf_counter_ns()
+    sampler.add(sample_type, request_meta_data, convert.seconds_to_ms(latency), convert.seconds_to_ms(service_time), total_ops,
+                total_ops_unit, (stop - total_start), percent_completed, schedule_lag)
+    if overhead:
+        overhead.record("sampling", sampling_start)
+        overhead.request_finished()
+
+
+if hasattr(time, "perf_counter_ns"):
+    perf_counter_ns = time.perf_counter_ns
+else:
+    def perf_counter_ns():
+        # time.perf_counter_ns() is only available as of Python 3.7
+        return int(time.perf_counter() * 1000 * 1000 * 1000)
+
+
+class DriverOverhead:
+    """
+    Records the time that the load driver itself spends in the different phases of each request of a client:
+
+    * ``params``: Determining the next request of the schedule including its parameters.
+    * ``serialization``: Serializing the request body in the Elasticsearch client.
+    * ``deserialization``: Parsing the response body in the Elasticsearch client.
+    * ``normalization``: Converting the return value of the runner.
+    * ``sampling``: Storing the sample of the request.
+
+    Durations are accumulated as counters of the client's sampler in nanoseconds together with the number of requests.
+    """
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+
+    def record(self, phase, start_ns):
+        """
+        :param phase: The name of the phase.
+        :param start_ns: The point in time when the phase has started as returned by ``perf_counter_ns()``.
+        """
+        self.sampler.pending_counters.add("driver_overhead_%s" % phase, perf_counter_ns() - start_ns, unit="ns")
+
+    def request_finished(self):
+        self.sampler.pending_counters.add("driver_overhead_requests", 1)
+
+    def timed(self, schedule):
+        """
+        :param schedule: A schedule as returned by ``schedule_for()``.
+        :return: A generator for the same schedule that records how long it takes to determine each request.
+        """
+        it = iter(schedule)
+        while True:
+            start = perf_counter_ns()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.record("params", start)
+            yield item
+
+    def instrument(self, es):
+        """
+        Lets the provided Elasticsearch client record the time it spends for (de)serialization until ``uninstrument()`` is called.
+        """
+        es.transport.serializer = TimedSerializer(es.transport.serializer, self, "serialization")
+        es.transport.deserializer = TimedSerializer(es.transport.deserializer, self, "deserialization")
+
+    def uninstrument(self, es):
+        es.transport.serializer = es.transport.serializer.delegate
+        es.transport.deserializer = es.transport.deserializer.delegate
+
+
+class TimedSerializer:
+    """
+    Wraps a serializer (or deserializer) of the Elasticsearch client and records the time spent in ``dumps()`` and ``loads()``.
+    """
+
+    def __init__(self, delegate, overhead, phase):
+        self.delegate = delegate
+        self.overhead = overhead
+        self.phase = phase
+
+    def dumps(self, data):
+        start = perf_counter_ns()
+        try:
+            return self.delegate.dumps(data)
+        finally:
+            self.overhead.record(self.phase, start)
+
+    def loads(self, s, *args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return self.delegate.loads(s, *args, **kwargs)
+        finally:
+            self.overhead.record(self.phase, start)
+
+    def __getattr__(self, name):
+        return getattr(self.delegate, name)
+
+
+class StackSampler:
+    """
+    A statistical profiler that periodically samples the stacks of all registered threads in a background thread. In contrast to a
+    deterministic profiler it does not slow down the profiled threads, so it is suitable to profile regular benchmarks.
+
+    Samples are aggregated per label (e.g. a task) across all threads as collapsed stacks, i.e. one line per distinct stack with the
+    frames from the outermost to the innermost one separated by semicolons followed by the number of samples. This is the input format of
+    flamegraph tools.
+    """
+    DEFAULT_INTERVAL_SECONDS = 0.01
+
+    def __init__(self, interval=DEFAULT_INTERVAL_SECONDS):
+        """
+        :param interval: The time in seconds between two samples.
+        """
+        self.interval = interval
+        self.lock = threading.Lock()
+        # thread id -> label
+        self.threads = {}
+        # label -> collapsed stack -> number of samples
+        self.samples = {}
+        self.stopped = threading.Event()
+        self.sampler_thread = None
+
+    def register(self, thread_id, label):
+        with self.lock:
+            self.threads[thread_id] = label
+
+    def unregister(self, thread_id):
+        with self.lock:
+            self.threads.pop(thread_id, None)
+
+    def start(self):
+        if self.sampler_thread is None:
+            self.stopped.clear()
+            self.sampler_thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self.sampler_thread.start()
+
+    def stop(self):
+        if self.sampler_thread is not None:
+            self.stopped.set()
+            self.sampler_thread.join()
+            self.sampler_thread = None
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        with self.lock:
+            threads = dict(self.threads)
+        if not threads:
+            return
+        frames = sys._current_frames()
+        for thread_id, label in threads.items():
+            frame = frames.get(thread_id)
+            if frame is not None:
+                stack = self.collapse(frame)
+                with self.lock:
+                    stacks = self.samples.setdefault(label, collections.Counter())
+                    stacks[stack] += 1
+
+    def collapse(self, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            # don't include line numbers so all samples within the same function are merged
+            frames.append("%s (%s:%d)" % (code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        return ";".join(reversed(frames))
+
+    @property
+    def stacks(self):
+        """
+        :return: A list of triples of label, collapsed stack and number of samples that have been taken since the last call.
+        """
+        with self.lock:
+            samples = self.samples
+            self.samples = {}
+        return [(label, stack, count) for label, stacks in samples.items() for stack, count in stacks.items()]
+
+
+class InFlightRequests:
+    """
+    Executes requests of one client on a bounded number of threads so the client can dispatch requests without waiting for responses.
+    """
+
+    def __init__(self, max_in_flight):
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight)
+        self.failure = None
+
+    def submit(self, fn, *args):
+        """
+        Dispatches a request unless the in-flight limit has been reached.
+
+        :param fn: The function that executes the request.
+        :param args: Arguments for ``fn``.
+        :return: True iff the request has been dispatched.
+        """
+        if self.failure:
+            raise self.failure
+        if not self.slots.acquire(blocking=False):
+            return False
+        self.pool.submit(self._run, fn, *args)
+        return True
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except BaseException as e:
+            if self.failure is None:
+                self.failure = e
+        finally:
+            self.slots.release()
+
+    def close(self):
+        """
+        Waits until all requests in flight have finished and raises the first error that has occurred (if any).
+        """
+        self.pool.shutdown(wait=True)
+        if self.failure:
+            raise self.failure
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+# Sleeping tends to overshoot by up to a few milliseconds on a loaded machine. Therefore, we stop sleeping slightly before the deadline
+# and spin for the rest of the time.
+PACING_SPIN_SECONDS = 0.002
+
+
+def wait_until(deadline, sleep=time.sleep, clock=time.perf_counter):
+    """
+    Waits with high precision until the given point in time has been reached.
+
+    :param deadline: A point in time as returned by ``time.perf_counter()``.
+    :param sleep: A function that sleeps for the provided number of seconds (only intended for testing).
+    :param clock: A function that returns the current point in time (only intended for testing).
+    """
+    rest = deadline - clock()
+    if rest > PACING_SPIN_SECONDS:
+        sleep(rest - PACING_SPIN_SECONDS)
+    while clock() < deadline:
+        # sleep(0) releases the GIL so other clients in the same process can proceed while we spin
+        sleep(0)
+
+
+def execute_single(runner, es, params, overhead=None):
     """
     Invokes the given runner once and provides the runner's return value in a uniform structure.
 
+    :param overhead: A ``DriverOverhead`` that records how long it takes to normalize the runner's return value. Optional.
     :return: a triple of: total number of operations, unit of operations, a dict of request meta data (may be None).
     """
     import elasticsearch
     try:
-        with runner:
+        with client.counting_bytes() as byte_counts, runner:
             return_value = runner(es, params)
+        normalization_start = perf_counter_ns()
         if isinstance(return_value, tuple) and len(return_value) == 2:
             total_ops, total_ops_unit = return_value
             request_meta_data = {"success": True}
@@ -825,6 +2294,8 @@ def execute_single(runner, es, params):
             total_ops = 1
             total_ops_unit = "ops"
             request_meta_data = {"success": True}
+        if overhead:
+            overhead.record("normalization", normalization_start)
     except elasticsearch.TransportError as e:
         total_ops = 0
         total_ops_unit = "ops"
@@ -840,9 +2311,42 @@ def execute_single(runner, es, params):
         msg = "Cannot execute [%s]. Provided parameters are: %s. Error: [%s]." % (str(runner), list(params.keys()), str(e))
         raise exceptions.SystemSetupError(msg)
 
+    # only counted if the runner has used a client that has been created by Rally
+    if byte_counts.requests > 0:
+        request_meta_data["request-bytes"] = byte_counts.request_bytes
+        request_meta_data["response-bytes"] = byte_counts.response_bytes
     return total_ops, total_ops_unit, request_meta_data
 
 
+class ClockOffsetEstimator:
+    """
+    Estimates the offset of a load generator's clock relative to the master's clock based on several ping exchanges (similar to NTP).
+
+    For each exchange we know when the master has sent the ping (t0), the load generator's timestamp when it has answered (t1) and when
+    the master has received the answer (t2). Assuming symmetric delays, the offset is ``t1 - (t0 + t2) / 2``. We use the exchange with
+    the smallest round-trip time ``t2 - t0`` because it is least affected by delays.
+    """
+
+    def __init__(self):
+        self.measurements = []
+
+    def add(self, master_sent, load_generator_timestamp, master_received):
+        round_trip_time = master_received - master_sent
+        offset = load_generator_timestamp - (master_sent + master_received) / 2
+        self.measurements.append((round_trip_time, offset))
+
+    @property
+    def round_trip_time(self):
+        return min(self.measurements)[0]
+
+    @property
+    def offset(self):
+        return min(self.measurements)[1]
+
+    def __len__(self):
+        return len(self.measurements)
+
+
 class JoinPoint:
     def __init__(self, id):
         self.id = id
@@ -854,6 +2358,109 @@ class JoinPoint:
         return "JoinPoint(%s)" % self.id
 
 
+class ClientAllocations:
+    """
+    Holds the rows of the allocation matrix (see ``Allocator#allocations``) for all clients that are run by one load generator.
+    """
+
+    def __init__(self):
+        self.allocations = []
+
+    def add(self, client_id, tasks):
+        self.allocations.append((client_id, tasks))
+
+    @property
+    def client_ids(self):
+        return [client_id for client_id, _ in self.allocations]
+
+    def is_join_point(self, task_index):
+        # join points are always at the same position for all clients (see Allocator#allocations)
+        return isinstance(self.join_point(task_index), JoinPoint)
+
+    def join_point(self, task_index):
+        _, tasks = self.allocations[0]
+        return tasks[task_index]
+
+    def next_join_point_index(self, task_index):
+        """
+        :param task_index: The index at which to start searching.
+        :return: The index of the next join point at or after ``task_index``.
+        """
+        idx = task_index
+        while not self.is_join_point(idx):
+            idx += 1
+        return idx
+
+    def tasks(self, start_index, end_index):
+        """
+        :param start_index: The first index in the allocation matrix (inclusive).
+        :param end_index: The last index in the allocation matrix (exclusive).
+        :return: A list of pairs of client id and all tasks of this client in the provided range (skipping empty entries).
+        """
+        return [(client_id, [task for task in tasks[start_index:end_index] if task is not None]) for client_id, tasks in self.allocations]
+
+    def __len__(self):
+        return len(self.allocations)
+
+    def __repr__(self, *args, **kwargs):
+        return "ClientAllocations(%s)" % self.allocations
+
+
+def default_worker_count():
+    """
+    :return: The number of load generator processes that Rally starts if the user does not specify it explicitly.
+    """
+    # psutil may not be able to determine the number of physical cores on all platforms
+    return sysstats.physical_cpu_cores() or sysstats.logical_cpu_cores() or 1
+
+
+def is_local_host(host):
+    return host in ["localhost", "127.0.0.1"]
+
+
+def load_generator_requirements(host):
+    """
+    :param host: The load driver host on which a load generator should run.
+    :return: Actor requirements that place the load generator on the provided host.
+    """
+    # the local actor system is registered as coordinator with the "ip" 127.0.0.1 so we need to treat this case specially
+    if is_local_host(host):
+        return {"coordinator": True}
+    else:
+        return {"ip": host}
+
+
+def hosts_for_workers(hosts, worker_count):
+    """
+    Assigns each worker (i.e. load generator) to a load driver host.
+
+    :param hosts: A non-empty list of load driver hosts.
+    :param worker_count: The number of workers.
+    :return: A list with the host of each worker.
+    """
+    if not hosts:
+        raise exceptions.SystemSetupError("At least one load driver host is required.")
+    # round-robin so clients are spread evenly across hosts (clients are assigned round-robin to workers as well)
+    return [hosts[i % len(hosts)] for i in range(worker_count)]
+
+
+def allocations_for_workers(allocations, worker_count):
+    """
+    Splits the allocation matrix into bundles of clients so that each worker (i.e. load generator) runs a group of clients.
+
+    :param allocations: The allocation matrix as calculated by ``Allocator#allocations``.
+    :param worker_count: The maximum number of workers. Must be greater than zero.
+    :return: A list of ``ClientAllocations``, one per worker. There are never more workers than clients.
+    """
+    if worker_count < 1:
+        raise exceptions.SystemSetupError("The number of load driver workers must be positive but was [%d]." % worker_count)
+    bundles = [ClientAllocations() for _ in range(min(worker_count, len(allocations)))]
+    # round-robin so clients of a task with fewer clients than workers end up on different workers
+    for client_id, tasks in enumerate(allocations):
+        bundles[client_id % len(bundles)].add(client_id, tasks)
+    return bundles
+
+
 class Allocator:
     """
     Decides which operations runs on which client and how to partition them.
@@ -960,6 +2567,326 @@ class Allocator:
         return max_clients
 
 
+class ThroughputSearchStep(track.Task):
+    """
+    One step of a throughput search. It runs the operation of the searched task for a fixed time period. The target throughput is
+    determined by the master just before the step starts.
+    """
+
+    def __init__(self, task, step, warmup_time_period, time_period):
+        params = dict(task.params)
+        # the target is provided by the master for each step
+        params.pop("target-throughput", None)
+        params.pop("target-interval", None)
+        meta_data = dict(task.meta_data)
+        meta_data["throughput_search_step"] = step
+        super().__init__(operation=task.operation, meta_data=meta_data, warmup_time_period=warmup_time_period,
+                         time_period=time_period, clients=task.clients, schedule=task.schedule, params=params)
+        self.step = step
+
+    def __hash__(self):
+        return hash((super().__hash__(), self.step))
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.step == other.step
+
+    def __str__(self, *args, **kwargs):
+        return "Throughput search step [%d] for [%s]" % (self.step, self.operation.name)
+
+
+class ThroughputSearch:
+    """
+    Searches the maximum throughput of a task that still meets a latency and error rate service level objective (SLO).
+
+    The ``step`` strategy increases the target throughput by a fixed amount after each step until the SLO is breached. The ``binary``
+    strategy bisects the range between zero and a maximum throughput until the range is smaller than the configured precision.
+    """
+
+    def __init__(self, task, strategy="step", initial_throughput=None, throughput_step=None, max_throughput=None, max_steps=10,
+                 latency_percentile=99, max_latency=None, max_error_rate=0.01):
+        """
+        :param task: The task whose throughput is searched.
+        :param strategy: Either "step" or "binary".
+        :param initial_throughput: The target throughput of the first step (only ``step`` strategy).
+        :param throughput_step: The increment per step (``step`` strategy) or the precision of the search (``binary`` strategy).
+        :param max_throughput: The highest target throughput that is tried. Mandatory for the ``binary`` strategy.
+        :param max_steps: The maximum number of steps.
+        :param latency_percentile: The latency percentile that is checked against ``max_latency``.
+        :param max_latency: The maximum latency in milliseconds that meets the SLO.
+        :param max_error_rate: The maximum error rate (between 0 and 1) that meets the SLO.
+        """
+        self.task = task
+        self.strategy = strategy
+        self.initial_throughput = initial_throughput
+        self.throughput_step = throughput_step
+        self.max_throughput = max_throughput
+        self.max_steps = max_steps
+        self.latency_percentile = latency_percentile
+        self.max_latency = max_latency
+        self.max_error_rate = max_error_rate
+        self.steps = []
+        # bounds of the binary search
+        self.lower = 0
+        self.upper = max_throughput
+        self.finished = False
+
+    @staticmethod
+    def from_task(task):
+        spec = task.params["throughput-search"]
+
+        def mandatory(key):
+            if key not in spec:
+                raise exceptions.SystemSetupError("The throughput search of [%s] requires the property [%s]." % (task, key))
+            return spec[key]
+
+        strategy = spec.get("strategy", "step")
+        if strategy == "step":
+            initial_throughput = mandatory("initial-throughput")
+            throughput_step = mandatory("throughput-step")
+            max_throughput = spec.get("max-throughput")
+        elif strategy == "binary":
+            initial_throughput = None
+            max_throughput = mandatory("max-throughput")
+            throughput_step = spec.get("throughput-step", max_throughput / 100)
+        else:
+            raise exceptions.SystemSetupError("Unknown throughput search strategy [%s] for [%s]. Use either 'step' or 'binary'." %
+                                              (strategy, task))
+        return ThroughputSearch(task, strategy, initial_throughput=initial_throughput, throughput_step=throughput_step,
+                                max_throughput=max_throughput, max_steps=spec.get("max-steps", 10),
+                                latency_percentile=spec.get("latency-percentile", 99), max_latency=mandatory("max-latency"),
+                                max_error_rate=spec.get("max-error-rate", 0.01))
+
+    def next_target(self):
+        """
+        :return: The target throughput of the next step or ``None`` if the search has finished.
+        """
+        if self.finished or len(self.steps) >= self.max_steps:
+            return None
+        if self.strategy == "step":
+            target = self.initial_throughput + len(self.steps) * self.throughput_step
+            if self.max_throughput is not None and target > self.max_throughput:
+                return None
+            return target
+        else:
+            if self.upper - self.lower <= self.throughput_step:
+                return None
+            return (self.lower + self.upper) / 2
+
+    def add_step(self, target_throughput, throughput, throughput_unit, latency, error_rate):
+        """
+        Records the results of one step and adjusts the search accordingly.
+
+        :param target_throughput: The target throughput of this step.
+        :param throughput: The median achieved throughput or ``None`` if no throughput samples are available.
+        :param throughput_unit: The unit of throughput.
+        :param latency: The latency at the configured percentile in milliseconds or ``None`` if no request has been measured.
+        :param error_rate: The error rate or ``None`` if no request has been measured.
+        """
+        slo_met = throughput is not None and latency is not None and latency <= self.max_latency and error_rate <= self.max_error_rate
+        self.steps.append({
+            "step": len(self.steps),
+            "target_throughput": target_throughput,
+            "throughput": throughput,
+            "throughput_unit": throughput_unit,
+            "latency": latency,
+            "error_rate": error_rate,
+            "slo_met": slo_met
+        })
+        if self.strategy == "step":
+            self.finished = not slo_met
+        elif slo_met:
+            self.lower = target_throughput
+        else:
+            self.upper = target_throughput
+
+    @property
+    def best_step(self):
+        """
+        :return: The step with the highest achieved throughput that has met the SLO or ``None`` if no step has met it.
+        """
+        best = None
+        for step in self.steps:
+            if step["slo_met"] and (best is None or step["throughput"] > best["throughput"]):
+                best = step
+        return best
+
+
+def expand_throughput_searches(schedule, test_mode=False):
+    """
+    Replaces each task that defines a ``throughput-search`` with one task per search step.
+
+    :param schedule: The schedule of a challenge.
+    :param test_mode: Whether test mode is enabled. Each step runs only for one second in test mode.
+    :return: A pair of the expanded schedule and a dict of each search step task to its ``ThroughputSearch``.
+    """
+    expanded = []
+    searches = {}
+    for item in schedule:
+        if isinstance(item, track.Task) and "throughput-search" in item.params:
+            search = ThroughputSearch.from_task(item)
+            spec = item.params["throughput-search"]
+            if test_mode:
+                warmup_time_period = 0
+                time_period = 1
+            else:
+                warmup_time_period = spec.get("warmup-time-period", 0)
+                time_period = spec.get("step-time-period", 60)
+            for step in range(search.max_steps):
+                step_task = ThroughputSearchStep(item, step, warmup_time_period, time_period)
+                expanded.append(step_task)
+                searches[step_task] = search
+        else:
+            for task in item:
+                if "throughput-search" in task.params:
+                    raise exceptions.SystemSetupError("A throughput search cannot run in parallel to other tasks but [%s] does." % task)
+            expanded.append(item)
+    return expanded, searches
+
+
+class SteadyStateDetector:
+    """
+    Detects when a task has reached steady state based on the samples of all clients (adaptive warmup).
+
+    Samples are aggregated in buckets of one second. Steady state is reached when the coefficient of variation of both throughput and
+    mean latency over the most recent ``window`` complete buckets is at most ``max_cv``. All samples before that point in time are
+    considered warmup and the measurement period of the task starts. If steady state is not reached within ``max_warmup_time_period``
+    seconds, the measurement period starts nevertheless.
+
+    Samples are held back until steady state has been detected so they can be relabeled.
+    """
+    DEFAULT_WINDOW = 10
+    DEFAULT_MAX_CV = 0.05
+    DEFAULT_MAX_WARMUP_TIME_PERIOD = 300
+
+    @staticmethod
+    def from_task(task):
+        spec = task.params.get("steady-state", {})
+        if task.time_period is None:
+            raise exceptions.SystemSetupError("[%s] uses an adaptive warmup and thus needs to define a time period." % task)
+        return SteadyStateDetector(task,
+                                   window=spec.get("window", SteadyStateDetector.DEFAULT_WINDOW),
+                                   max_cv=spec.get("max-cv", SteadyStateDetector.DEFAULT_MAX_CV),
+                                   max_warmup_time_period=spec.get("max-warmup-time-period",
+                                                                   SteadyStateDetector.DEFAULT_MAX_WARMUP_TIME_PERIOD))
+
+    def __init__(self, task, window, max_cv, max_warmup_time_period):
+        self.task = task
+        self.window = window
+        self.max_cv = max_cv
+        self.max_warmup_time_period = max_warmup_time_period
+        # relative time when the task has started
+        self.start = None
+        # relative time of the most recent sample
+        self.latest = None
+        # bucket index -> [total ops, sum of latencies, number of latency samples]
+        self.buckets = {}
+        self.pending_chunks = []
+        # relative time when steady state has been reached
+        self.steady_state_time = None
+        self.steady_state_reached = False
+        # bookkeeping for the master
+        self.stored = False
+        self.completion_sent = False
+
+    @property
+    def warmup_time_period(self):
+        return self.steady_state_time - self.start if self.steady_state_time is not None else None
+
+    @property
+    def measurement_finished(self):
+        return self.steady_state_time is not None and self.latest >= self.steady_state_time + self.task.time_period
+
+    def add(self, chunk):
+        """
+        :param chunk: A ``SampleChunk`` of this task.
+        :return: A list of chunks whose samples have been labeled according to the steady state and can be stored.
+        """
+        if len(chunk) == 0:
+            return []
+        for idx in range(len(chunk)):
+            relative_time = chunk.relative_time[idx]
+            if self.start is None:
+                self.start = relative_time - chunk.time_period[idx]
+            self.latest = relative_time if self.latest is None else max(self.latest, relative_time)
+            if self.steady_state_time is None:
+                bucket = self.buckets.setdefault(int(relative_time - self.start), [0, 0, 0])
+                bucket[0] += chunk.total_ops[idx]
+                latency = chunk.latency_ms[idx]
+                if not math.isnan(latency):
+                    bucket[1] += latency
+                    bucket[2] += 1
+        if self.steady_state_time is not None:
+            return self.relabel([chunk])
+        self.pending_chunks.append(chunk)
+        self.detect()
+        if self.steady_state_time is not None:
+            chunks = self.relabel(self.pending_chunks)
+            self.pending_chunks = []
+            self.buckets = {}
+            return chunks
+        return []
+
+    def finish(self):
+        """
+        Ends the detection, e.g. when the task has finished.
+
+        :return: A list of chunks that have been held back and can be stored now.
+        """
+        if self.steady_state_time is None and self.start is not None:
+            # all samples are considered warmup
+            self.steady_state_time = self.latest + 1
+        chunks = self.relabel(self.pending_chunks)
+        self.pending_chunks = []
+        self.buckets = {}
+        return chunks
+
+    def detect(self):
+        # samples of the most recent bucket may still be on their way
+        complete_buckets = int(self.latest - self.start)
+        if complete_buckets >= self.window:
+            throughput = []
+            latency = []
+            for idx in range(complete_buckets - self.window, complete_buckets):
+                total_ops, latency_sum, latency_count = self.buckets.get(idx, [0, 0, 0])
+                throughput.append(total_ops)
+                if latency_count > 0:
+                    latency.append(latency_sum / latency_count)
+            if len(latency) == self.window and \
+                    coefficient_of_variation(throughput) <= self.max_cv and coefficient_of_variation(latency) <= self.max_cv:
+                self.steady_state_time = self.start + complete_buckets
+                self.steady_state_reached = True
+                return
+        if self.latest - self.start >= self.max_warmup_time_period:
+            self.steady_state_time = self.start + self.max_warmup_time_period
+
+    def relabel(self, chunks):
+        """
+        Labels all samples before the steady state as warmup and drops all samples after the end of the measurement period. Samples
+        arrive in batches so load generators usually keep running for a few more seconds until they are asked to complete the task.
+
+        :param chunks: A list of ``SampleChunk`` instances.
+        :return: The list of non-empty chunks after relabelling.
+        """
+        warmup = metrics.SampleType.Warmup.value
+        end = self.steady_state_time + self.task.time_period
+        relabelled = []
+        for chunk in chunks:
+            chunk.retain(lambda idx: chunk.relative_time[idx] < end)
+            for idx in range(len(chunk)):
+                if chunk.relative_time[idx] < self.steady_state_time:
+                    chunk.sample_type[idx] = warmup
+            if len(chunk) > 0:
+                relabelled.append(chunk)
+        return relabelled
+
+
+def coefficient_of_variation(values):
+    mean = statistics.mean(values)
+    if mean == 0:
+        return float("inf")
+    return statistics.pstdev(values) / mean
+
+
 #######################################
 #
 # Scheduler related stuff
@@ -969,32 +2896,200 @@ class Allocator:
 
 # Runs a concrete schedule on one worker client
 # Needs to determine the runners and concrete iterations per client.
-def schedule_for(current_track, task, client_index):
+def schedule_for(current_track, task, client_index, prefetch_size=0, on_stall=None):
     """
     Calculates a client's schedule for a given task.
 
     :param current_track: The current track.
     :param task: The task that should be executed.
     :param client_index: The current client index.  Must be in the range [0, `task.clients').
+    :param prefetch_size: The number of parameters that are generated ahead of time in a background thread. 0 (default) generates
+    parameters just before each request.
+    :param on_stall: A function that is called with the waiting time in milliseconds whenever a request needs to wait for prefetched
+    parameters. Optional.
     :return: A generator for the operations the given client needs to perform for this task.
     """
     op = task.operation
     num_clients = task.clients
     sched = scheduler.scheduler_for(task.schedule, task.params)
     logger.info("Choosing [%s] for [%s]." % (sched, task))
-    runner_for_op = runner.runner_for(op.type)
+    # Several clients may run in the same load generator and runners are allowed to keep state (e.g. a scroll id) so each client needs
+    # its own runner instance.
+    runner_for_op = copy.copy(runner.runner_for(op.type))
     params_for_op = track.operation_parameters(current_track, op).partition(client_index, num_clients)
-
-    if task.warmup_time_period is not None or task.time_period is not None:
+    if op.params.get("pre-serialize", False) or op.params.get("pre-compress"):
+        params_for_op = PreparedBodyParamSource.for_operation(op, params_for_op)
+    if prefetch_size > 0:
+        logger.info("Prefetching up to [%d] parameters for [%s]." % (prefetch_size, op))
+        params_for_op = PrefetchingParamSource(params_for_op, prefetch_size, on_stall)
+
+    if "steady-state" in task.params:
+        # The master decides when the warmup is over and asks the clients to complete the task once the measurement period is over.
+        # Until then all samples are considered measurement samples.
+        max_warmup_time_period = SteadyStateDetector.from_task(task).max_warmup_time_period
+        logger.info("Creating time-period based schedule with [%s] distribution for [%s] with an adaptive warmup of at most [%s] "
+                    "seconds and a time period of [%s] seconds." % (task.schedule, op, str(max_warmup_time_period), str(task.time_period)))
+        schedule = time_period_based(sched, 0, max_warmup_time_period + task.time_period, runner_for_op, params_for_op)
+    elif task.warmup_time_period is not None or task.time_period is not None:
         warmup_time_period = task.warmup_time_period if task.warmup_time_period else 0
         logger.info("Creating time-period based schedule with [%s] distribution for [%s] with a warmup period of [%s] seconds and a "
                     "time period of [%s] seconds." % (task.schedule, op, str(warmup_time_period), str(task.time_period)))
-        return time_period_based(sched, warmup_time_period, task.time_period, runner_for_op, params_for_op)
+        schedule = time_period_based(sched, warmup_time_period, task.time_period, runner_for_op, params_for_op)
     else:
         logger.info("Creating iteration-count based schedule with [%s] distribution for [%s] with [%d] warmup iterations and "
                     "[%d] iterations." % (task.schedule, op, task.warmup_iterations, task.iterations))
-        return iteration_count_based(sched, task.warmup_iterations // num_clients, task.iterations // num_clients,
-                                     runner_for_op, params_for_op)
+        schedule = iteration_count_based(sched, task.warmup_iterations // num_clients, task.iterations // num_clients,
+                                         runner_for_op, params_for_op)
+    if prefetch_size > 0:
+        return prefetched(schedule, params_for_op)
+    else:
+        return schedule
+
+
+def until_completed(schedule, completed):
+    """
+    Stops the provided schedule early as soon as the provided event is set.
+    """
+    for item in schedule:
+        if completed.is_set():
+            return
+        yield item
+
+
+def prefetched(schedule, param_source):
+    """
+    Stops the background thread of a ``PrefetchingParamSource`` as soon as the provided schedule is finished or abandoned.
+    """
+    try:
+        yield from schedule
+    finally:
+        param_source.close()
+
+
+class PrefetchingParamSource:
+    """
+    Generates parameters of a parameter source ahead of time in a background thread so the (potentially expensive) call to ``params()``
+    does not happen between two timed requests. At most ``queue_size`` parameters are kept in memory.
+    """
+
+    def __init__(self, delegate, queue_size, on_stall=None):
+        """
+        :param delegate: The parameter source that generates the parameters.
+        :param queue_size: The maximum number of parameters that are generated ahead of time.
+        :param on_stall: A function that is called with the waiting time in milliseconds whenever ``params()`` needs to wait for the
+        background thread. Optional.
+        """
+        self.delegate = delegate
+        self.on_stall = on_stall
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        # the queue is empty initially so we need to wait anyway for the first parameters
+        self.warmed_up = False
+        self.producer = threading.Thread(target=self._produce, name="param-prefetcher", daemon=True)
+        self.producer.start()
+
+    def _produce(self):
+        while not self.stopped.is_set():
+            try:
+                # a pair of a flag whether the parameter source is exhausted or has failed and the parameters (or the error)
+                item = (False, self.delegate.params())
+            except StopIteration:
+                item = (True, None)
+            except BaseException as e:
+                item = (True, e)
+            while not self.stopped.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if item[0]:
+                return
+
+    def size(self):
+        return self.delegate.size()
+
+    def params(self):
+        try:
+            done, value = self.queue.get_nowait()
+        except queue.Empty:
+            stall_start = time.perf_counter()
+            done, value = self.queue.get()
+            if self.warmed_up and self.on_stall:
+                self.on_stall(convert.seconds_to_ms(time.perf_counter() - stall_start))
+        self.warmed_up = True
+        if done:
+            # keep the marker so subsequent calls behave identically
+            self.queue.put((done, value))
+            if value is None:
+                raise StopIteration()
+            raise value
+        return value
+
+    def close(self):
+        self.stopped.set()
+
+
+class PreparedBodyParamSource:
+    """
+    Serializes (and optionally compresses) the request body of each parameter set before it is handed to the runner so the
+    Elasticsearch client can send it as is. Bodies are serialized on every call because parameter sources are free to return new or
+    modified parameters each time. Parameter sources often return the same few bodies over and over again (e.g. for queries), so
+    compressed bodies are cached by their serialized content.
+    """
+    # maximum number of distinct serialized bodies for which the compressed body is cached
+    CACHE_SIZE = 16
+
+    def __init__(self, delegate, compression_level=None, cache_size=CACHE_SIZE):
+        """
+        :param delegate: The parameter source that generates the parameters.
+        :param compression_level: If set, bodies are also compressed with gzip with this compression level (1-9).
+        :param cache_size: The maximum number of compressed bodies to cache. Set it to zero to disable caching (e.g. for bulk bodies
+        which are (almost) never repeated but large).
+        """
+        self.delegate = delegate
+        self.compression_level = compression_level
+        self.cache_size = cache_size
+        # serialized body -> compressed body
+        self.cache = collections.OrderedDict()
+
+    @staticmethod
+    def for_operation(op, delegate):
+        compression_level = op.params.get("pre-compress")
+        if compression_level is not None and (not isinstance(compression_level, int) or not 1 <= compression_level <= 9):
+            raise exceptions.SystemSetupError("Operation [%s] defines 'pre-compress' as [%s] but it must be a compression level "
+                                              "between 1 and 9." % (op.name, str(compression_level)))
+        logger.info("Preparing request bodies for [%s] ahead of time (compression level [%s])." % (op, str(compression_level)))
+        # bulk bodies are different for each request
+        cache_size = 0 if op.type == track.OperationType.Index.name else PreparedBodyParamSource.CACHE_SIZE
+        return PreparedBodyParamSource(delegate, compression_level, cache_size)
+
+    def size(self):
+        return self.delegate.size()
+
+    def params(self):
+        params = self.delegate.params()
+        if "body" not in params:
+            return params
+        prepared_params = params.copy()
+        prepared_params["body"] = self.prepare(params["body"])
+        return prepared_params
+
+    def prepare(self, body):
+        body = client.prepare_body(body)
+        if not self.compression_level or body is None or isinstance(body, client.CompressedBody):
+            return body
+        if self.cache_size == 0:
+            return client.prepare_body(body, self.compression_level)
+        compressed = self.cache.get(body)
+        if compressed is not None:
+            self.cache.move_to_end(body)
+            return compressed
+        compressed = client.prepare_body(body, self.compression_level)
+        self.cache[body] = compressed
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return compressed
 
 
 def time_period_based(sched, warmup_time_period, time_period, runner, params):
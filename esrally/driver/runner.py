@@ -1,12 +1,19 @@
+import re
 import sys
+import gzip
+import json
+import time
 import types
 import logging
 from collections import Counter, OrderedDict
 
-from esrally import exceptions, track
+from esrally import exceptions, track, client
 
 logger = logging.getLogger("rally.driver")
 
+# Elasticsearch renders "took" as the first property of search and bulk responses (unless they are pretty-printed)
+RAW_TOOK_PATTERN = re.compile(r'\{"took":(\d+)')
+
 # Mapping from operation type to specific runner
 __RUNNERS = {}
 
@@ -100,12 +107,15 @@ class BulkIndex(Runner):
         The following keys are optional:
 
         * ``pipeline``: If present, runs the the specified ingest pipeline for this bulk.
+        * ``retry-rejected``: If present, items that Elasticsearch has rejected (HTTP status 429) are sent again with exponential back-off.
+          A hash with the optional keys ``max-retries`` (defaults to 3), ``initial-backoff`` (in seconds, defaults to 0.1) and
+          ``max-backoff`` (in seconds, defaults to 5).
         * ``detailed-results``: If ``True``, the runner will analyze the response and add detailed meta-data. Defaults to ``False``. Note
         that this has a very significant impact on performance and will very likely cause a bottleneck in the benchmark driver so please
         be very cautious enabling this feature. Our own measurements have shown a median overhead of several thousand times (execution time
          is in the single digit microsecond range when this feature is disabled and in the single digit millisecond range when this feature
-         is enabled; numbers based on a bulk size of 500 elements and no errors). For details please refer to the respective benchmarks
-         in ``benchmarks/driver``.
+         is enabled, mostly due to parsing the response; numbers based on a bulk size of 5000 elements and no errors). For details please
+         refer to the respective benchmarks in ``benchmarks/driver``.
 
 
         Returned meta data
@@ -119,6 +129,13 @@ class BulkIndex(Runner):
         * ``success``: A boolean indicating whether the bulk request has succeeded.
         * ``success-count``: Number of successfully processed items for this request (denoted in ``unit``).
         * ``error-count``: Number of failed items for this request (denoted in ``unit``).
+        * ``took``: The time in milliseconds that Elasticsearch needed to process the request. May be `None` if it could not be determined.
+
+        If ``retry-rejected`` is present the following meta data are returned in addition:
+
+        * ``rejected-count``: The number of rejections over all attempts (an item that is rejected twice counts twice).
+        * ``retries``: The number of bulk requests that have been sent to retry rejected items.
+        * ``retry-time``: The time in milliseconds that has been spent for retries, including back-off.
 
         If ``detailed-results`` is ``True`` the following meta data are returned in addition:
 
@@ -245,11 +262,24 @@ class BulkIndex(Runner):
             raise exceptions.DataError(
                 "Bulk parameter source did not provide a 'bulk-size' parameter. Please add it to your parameter source.")
 
-        if with_action_metadata:
-            # only half of the lines are documents
-            response = es.bulk(body=params["body"], params=bulk_params)
+        if detailed_results:
+            response = self.bulk(es, params["body"], params, index, with_action_metadata, bulk_params)
         else:
-            response = es.bulk(body=params["body"], index=index, doc_type=params["type"], params=bulk_params)
+            # In the common case, the response contains no errors and we do not need to look at the (potentially many) items so we
+            # avoid parsing them at all.
+            with client.raw_responses():
+                response = self.bulk(es, params["body"], params, index, with_action_metadata, bulk_params)
+
+        retry_policy = params.get("retry-rejected")
+        retry_meta_data = None
+        if retry_policy is not None:
+            if isinstance(response, str) and without_errors(response):
+                retry_meta_data = {"rejected-count": 0, "retries": 0, "retry-time": 0}
+            else:
+                if isinstance(response, str):
+                    response = json.loads(response)
+                response, retry_meta_data = self.retry_rejected(es, params, index, with_action_metadata, bulk_params, response,
+                                                                retry_policy)
 
         stats = self.detailed_stats(bulk_size, response) if detailed_results else self.simple_stats(bulk_size, response)
 
@@ -258,43 +288,122 @@ class BulkIndex(Runner):
             "weight": bulk_size,
             "unit": "docs",
             "bulk-size": bulk_size,
+            "took": took(response)
         }
         meta_data.update(stats)
+        if retry_meta_data:
+            meta_data.update(retry_meta_data)
         return meta_data
 
+    def bulk(self, es, body, params, index, with_action_metadata, bulk_params):
+        if with_action_metadata:
+            # only half of the lines are documents
+            return es.bulk(body=body, params=bulk_params)
+        else:
+            return es.bulk(body=body, index=index, doc_type=params["type"], params=bulk_params)
+
+    def retry_rejected(self, es, params, index, with_action_metadata, bulk_params, response, retry_policy):
+        """
+        Sends items that Elasticsearch has rejected again until they are accepted or the retry policy gives up.
+
+        :return: A pair of a response that contains the final result for each item of the original bulk request and the retry meta data.
+        """
+        max_retries = retry_policy.get("max-retries", 3)
+        backoff = retry_policy.get("initial-backoff", 0.1)
+        max_backoff = retry_policy.get("max-backoff", 5)
+
+        items = list(response["items"])
+        rejected = [idx for idx, item in enumerate(items) if is_rejected(item)]
+        rejected_count = len(rejected)
+        total_took = response.get("took", 0)
+        retries = 0
+        retry_start = time.perf_counter()
+        if rejected:
+            lines = bulk_lines(params["body"])
+            line_ranges = item_line_ranges(items, with_action_metadata)
+            if line_ranges[-1][1] != len(lines):
+                logger.warning("Cannot retry [%d] rejected items because the bulk request has [%d] lines for [%d] items." %
+                               (len(rejected), len(lines), len(items)))
+                rejected = []
+
+        while rejected and retries < max_retries:
+            time.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+            retries += 1
+            retry_body = join_lines([line for idx in rejected for line in lines[line_ranges[idx][0]:line_ranges[idx][1]]])
+            retry_response = self.bulk(es, retry_body, params, index, with_action_metadata, bulk_params)
+            total_took += retry_response.get("took", 0)
+            still_rejected = []
+            # the response contains the items in the same order as the request
+            for idx, item in zip(rejected, retry_response["items"]):
+                items[idx] = item
+                if is_rejected(item):
+                    still_rejected.append(idx)
+            rejected_count += len(still_rejected)
+            rejected = still_rejected
+
+        merged_response = {
+            "took": total_took,
+            "errors": response["errors"],
+            "items": items
+        }
+        retry_meta_data = {
+            "rejected-count": rejected_count,
+            "retries": retries,
+            "retry-time": (time.perf_counter() - retry_start) * 1000 if retries > 0 else 0
+        }
+        return merged_response, retry_meta_data
+
     def detailed_stats(self, bulk_size, response):
+        # Reduce each item to a tuple of operation, result, status and shard distribution in one pass and aggregate the (few) distinct
+        # tuples afterwards. This is much cheaper than updating counters and histograms per item.
+        item_keys = []
+        add_item_key = item_keys.append
+        # the first shards hash of each distinct shard distribution, in the order of their first appearance
+        shards = OrderedDict()
+        for item in response["items"]:
+            # there is only one (top-level) item
+            for op, data in item.items():
+                s = data.get("_shards")
+                if s is None:
+                    add_item_key((op, data.get("result"), data["status"], None))
+                else:
+                    shard_key = (s["total"], s["successful"], s["failed"])
+                    add_item_key((op, data.get("result"), data["status"], shard_key))
+                    if shard_key not in shards:
+                        shards[shard_key] = s
+
         ops = {}
-        shards_histogram = OrderedDict()
+        shard_counts = Counter()
         bulk_error_count = 0
-        for idx, item in enumerate(response["items"]):
-            # there is only one (top-level) item
-            op, data = next(iter(item.items()))
+        for (op, result, status, shard_key), count in Counter(item_keys).items():
             if op not in ops:
                 ops[op] = Counter()
-            ops[op]["item-count"] += 1
-            if "result" in data:
-                ops[op][data["result"]] += 1
-
-            if "_shards" in data:
-                s = data["_shards"]
-                sk = "%d-%d-%d" % (s["total"], s["successful"], s["failed"])
-                if sk not in shards_histogram:
-                    shards_histogram[sk] = {
-                        "item-count": 0,
-                        "shards": s
-                    }
-                shards_histogram[sk]["item-count"] += 1
-            if data["status"] > 299 or ("_shards" in data and data["_shards"]["failed"] > 0):
-                bulk_error_count += 1
+            ops[op]["item-count"] += count
+            if result is not None:
+                ops[op][result] += count
+            if shard_key is not None:
+                shard_counts[shard_key] += count
+            if status > 299 or (shard_key is not None and shard_key[2] > 0):
+                bulk_error_count += count
         return {
             "success": bulk_error_count == 0,
             "success-count": bulk_size - bulk_error_count,
             "error-count": bulk_error_count,
             "ops": ops,
-            "shards_histogram": list(shards_histogram.values())
+            "shards_histogram": [{"item-count": shard_counts[shard_key], "shards": s} for shard_key, s in shards.items()]
         }
 
     def simple_stats(self, bulk_size, response):
+        # the response is only returned as a string if the client supports raw responses
+        if isinstance(response, str):
+            if without_errors(response):
+                return {
+                    "success": True,
+                    "success-count": bulk_size,
+                    "error-count": 0
+                }
+            response = json.loads(response)
         bulk_error_count = 0
         if response["errors"]:
             for idx, item in enumerate(response["items"]):
@@ -311,6 +420,80 @@ class BulkIndex(Runner):
         return "bulk-index"
 
 
+def took(response):
+    """
+    :param response: A parsed response or the raw response body as a string.
+    :return: The time in milliseconds that Elasticsearch needed to process the request or ``None`` if it is not available.
+    """
+    if isinstance(response, str):
+        match = RAW_TOOK_PATTERN.match(response)
+        return int(match.group(1)) if match else None
+    return response.get("took")
+
+
+def is_rejected(item):
+    # there is only one (top-level) item
+    return next(iter(item.values()))["status"] == 429
+
+
+def bulk_lines(body):
+    """
+    :param body: The body of a bulk request as a list of lines, a string or bytes (optionally compressed).
+    :return: A list with all lines of the body (without line breaks).
+    """
+    if isinstance(body, client.CompressedBody):
+        body = gzip.decompress(body)
+    if isinstance(body, (bytes, str)):
+        lines = body.split(b"\n" if isinstance(body, bytes) else "\n")
+        # the body ends with a line break
+        if lines and not lines[-1]:
+            lines.pop()
+        return lines
+    return list(body)
+
+
+def join_lines(lines):
+    """
+    :param lines: Lines of a bulk request as returned by ``bulk_lines``.
+    :return: A body for a bulk request that contains these lines.
+    """
+    if lines and isinstance(lines[0], bytes):
+        return b"\n".join(lines) + b"\n"
+    return lines
+
+
+def item_line_ranges(items, with_action_metadata):
+    """
+    :param items: The items of a bulk response.
+    :param with_action_metadata: Whether the bulk request contains an action and meta-data line per item.
+    :return: A list with a pair of the (inclusive) start and (exclusive) end line in the bulk request for each item.
+    """
+    line_ranges = []
+    line = 0
+    for item in items:
+        # delete actions have no source line
+        lines_per_item = 2 if with_action_metadata and "delete" not in item else 1
+        line_ranges.append((line, line + lines_per_item))
+        line += lines_per_item
+    return line_ranges
+
+
+def without_errors(raw_response):
+    """
+    Checks whether a raw bulk response indicates that no errors have occurred without parsing it.
+
+    :param raw_response: The response body of a bulk request as a string.
+    :return: ``True`` iff the response is known to contain no errors. ``False`` if it contains errors or the check was inconclusive (e.g.
+    because the response has been pretty-printed).
+    """
+    # Elasticsearch renders the top-level "errors" flag before the items. Restricting the search to the part before the items is not just
+    # faster but also avoids matching the flag within an item.
+    items_start = raw_response.find('"items"')
+    if items_start == -1:
+        items_start = len(raw_response)
+    return raw_response.find('"errors":false', 0, items_start) != -1
+
+
 class ForceMerge(Runner):
     """
     Runs a force merge operation against Elasticsearch.
@@ -380,6 +563,12 @@ class Query(Runner):
                pages we will terminate earlier.
     * `items_per_page`: Number of items to retrieve per page.
 
+    The following parameters are optional for scroll queries:
+
+    * `scroll_keep_alive`: How long Elasticsearch should keep the search context alive between two pages. Defaults to "10s".
+    * `slice`: A hash with the keys `id` and `max` if this scroll is one slice of a sliced scroll. The slice needs to be defined in the
+               query body as well.
+
     """
 
     def __init__(self):
@@ -393,15 +582,21 @@ class Query(Runner):
             return self.request_body_query(es, params)
 
     def request_body_query(self, es, params):
-        es.search(index=params["index"], doc_type=params["type"], request_cache=params["use_request_cache"], body=params["body"])
-        return 1, "ops"
+        r = es.search(index=params["index"], doc_type=params["type"], request_cache=params["use_request_cache"], body=params["body"])
+        return {
+            "weight": 1,
+            "unit": "ops",
+            "took": took(r)
+        }
 
     def scroll_query(self, es, params):
         hits = 0
         retrieved_pages = 0
+        total_took = 0
         self.es = es
         # explicitly convert to int to provoke an error otherwise
         total_pages = sys.maxsize if params["pages"] == "all" else int(params["pages"])
+        keep_alive = params.get("scroll_keep_alive", "10s")
 
         for page in range(total_pages):
             if page == 0:
@@ -410,7 +605,7 @@ class Query(Runner):
                     doc_type=params["type"],
                     body=params["body"],
                     sort="_doc",
-                    scroll="10s",
+                    scroll=keep_alive,
                     size=params["items_per_page"],
                     request_cache=params["use_request_cache"])
                 # This should only happen if we concurrently create an index and start searching
@@ -420,7 +615,9 @@ class Query(Runner):
                 # r = es.scroll(body={"scroll_id": self.scroll_id, "scroll": "10s"})
                 # This is the most compatible version to perform a scroll across all supported versions of Elasticsearch
                 # (1.x does not support a proper JSON body in search scroll requests).
-                r = self.es.transport.perform_request("GET", "/_search/scroll", params={"scroll_id": self.scroll_id, "scroll": "10s"})
+                r = self.es.transport.perform_request("GET", "/_search/scroll", params={"scroll_id": self.scroll_id,
+                                                                                        "scroll": keep_alive})
+            total_took += r.get("took", 0)
             hit_count = len(r["hits"]["hits"])
             hits += hit_count
             retrieved_pages += 1
@@ -428,12 +625,17 @@ class Query(Runner):
                 # We're done prematurely. Even if we are on page index zero, we still made one call.
                 break
 
-        return {
+        meta_data = {
             "weight": retrieved_pages,
             "pages": retrieved_pages,
             "hits": hits,
             "unit": "ops",
+            "took": total_took
         }
+        if "slice" in params:
+            meta_data["slice-id"] = params["slice"]["id"]
+            meta_data["slices"] = params["slice"]["max"]
+        return meta_data
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.scroll_id and self.es:
@@ -455,8 +657,47 @@ class Query(Runner):
         return "query"
 
 
+class MultiSearch(Runner):
+    """
+    Runs a batch of searches in one multi search request against Elasticsearch.
+
+    It expects the following keys in the `params` hash:
+
+    * `body`: The multi search body, i.e. a list that contains a header and a query body for each search.
+    * `queries`: The number of searches in `body`.
+
+    The returned meta data contain the number of successful and failed searches as well as `took`, the time in milliseconds that
+    Elasticsearch needed to process the whole request. Older versions of Elasticsearch only report `took` per search. Because these run
+    concurrently, we report the maximum then.
+    """
+
+    def __call__(self, es, params):
+        response = es.msearch(body=params["body"])
+        responses = response["responses"]
+        error_count = sum(1 for r in responses if "error" in r)
+        if "took" in response:
+            took = response["took"]
+        else:
+            took = max((r["took"] for r in responses if "took" in r), default=None)
+        meta_data = {
+            # each search counts so throughput is expressed in queries per second
+            "weight": params["queries"],
+            "unit": "queries",
+            "success": error_count == 0,
+            "success-count": len(responses) - error_count,
+            "error-count": error_count
+        }
+        if took is not None:
+            meta_data["took"] = took
+        return meta_data
+
+    def __repr__(self, *args, **kwargs):
+        return "msearch"
+
+
 register_runner(track.OperationType.Index.name, BulkIndex())
 register_runner(track.OperationType.ForceMerge.name, ForceMerge())
 register_runner(track.OperationType.IndicesStats.name, IndicesStats())
 register_runner(track.OperationType.NodesStats.name, NodeStats())
 register_runner(track.OperationType.Search.name, Query())
+register_runner(track.OperationType.MultiSearch.name, MultiSearch())
@@ -180,6 +180,142 @@ class SampleType(IntEnum):
     Normal = 1
 
 
+class Histogram:
+    """
+    A compact histogram that records values into logarithmically sized buckets. Each recorded value can be restored within the given
+    relative error so memory usage only depends on the range of recorded values but not on the number of recorded values. Histograms
+    can be merged, e.g. to combine the values that have been recorded by multiple clients.
+    """
+
+    def __init__(self, relative_error=0.001):
+        """
+        :param relative_error: The maximum relative error of a value that is determined from this histogram (default: 0.1%).
+        """
+        self.relative_error = relative_error
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets = {}
+        # values that are zero or negative cannot be represented in a logarithmic bucket
+        self.zero_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def record(self, value):
+        if value > 0:
+            idx = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[idx] = self.buckets.get(idx, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """
+        Adds all values of another histogram to this one.
+
+        :param other: A histogram with the same relative error.
+        """
+        if other.relative_error != self.relative_error:
+            raise exceptions.RallyAssertionError("Cannot merge histograms with relative errors [%s] and [%s]." %
+                                                 (str(self.relative_error), str(other.relative_error)))
+        for idx, count in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count > 0 else None
+
+    def percentile(self, percentile):
+        """
+        :param percentile: A percentile between [0, 100].
+        :return: The corresponding value (within the relative error of this histogram) or None if no value has been recorded.
+        """
+        if self.count == 0:
+            return None
+        if float(percentile) >= 100:
+            return self.max
+        rank = float(percentile) / 100.0 * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0)
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if rank < seen:
+                # the bucket's midpoint has the smallest relative error for all values within the bucket
+                value = 2 * self._gamma ** idx / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def percentiles(self, percentiles):
+        """
+        :param percentiles: A list of percentiles between [0, 100].
+        :return: An ordered dictionary of the determined percentile values in the order of the provided percentiles.
+        """
+        result = collections.OrderedDict()
+        for percentile in percentiles:
+            result[percentile] = self.percentile(percentile)
+        return result
+
+    def to_dict(self):
+        buckets = sorted(self.buckets.items())
+        return {
+            "relative-error": self.relative_error,
+            "buckets": [idx for idx, _ in buckets],
+            "counts": [count for _, count in buckets],
+            "zero-count": self.zero_count,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "sum": self.sum
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls(relative_error=d["relative-error"])
+        h.buckets = dict(zip(d["buckets"], d["counts"]))
+        h.zero_count = d["zero-count"]
+        h.count = d["count"]
+        h.min = d["min"]
+        h.max = d["max"]
+        h.sum = d["sum"]
+        return h
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self, *args, **kwargs):
+        return "Histogram(count=%d, min=%s, max=%s)" % (self.count, str(self.min), str(self.max))
+
+
+def percentiles_for_sample_size(sample_size):
+    # if needed we can come up with something smarter but it'll do for now
+    if sample_size < 1:
+        raise AssertionError("Percentiles require at least one sample")
+    elif sample_size == 1:
+        return [100]
+    elif 1 < sample_size < 10:
+        return [50, 100]
+    elif 10 <= sample_size < 100:
+        return [50, 90, 100]
+    elif 100 <= sample_size < 1000:
+        return [50, 90, 99, 100]
+    elif 1000 <= sample_size < 10000:
+        return [50, 90, 99, 99.9, 100]
+    else:
+        return [50, 90, 99, 99.9, 99.99, 100]
+
+
 class MetricsStore:
     """
     Abstract metrics store
@@ -408,8 +544,29 @@ class MetricsStore:
         self._put(MetaInfoScope.node, node_name, name, value, unit, operation, operation_type, sample_type, absolute_time, relative_time,
                   meta_data)
 
+    def put_histogram_cluster_level(self, name, histogram, unit, operation=None, operation_type=None, sample_type=SampleType.Normal,
+                                    absolute_time=None, relative_time=None, meta_data=None):
+        """
+        Adds a new cluster level histogram metric. The histogram is stored as metric ``<name>_histogram`` and its value is the number of
+        values that have been recorded in the histogram.
+
+        :param name: The name of the metric.
+        :param histogram: A ``Histogram`` containing the recorded values.
+        :param unit: The unit of the recorded values (e.g. ms).
+        :param operation The operation name to which this value applies. Optional. Defaults to None.
+        :param operation_type The operation type to which this value applies. Optional. Defaults to None.
+        :param sample_type Whether this is a warmup or a normal measurement sample. Defaults to SampleType.Normal.
+        :param absolute_time The absolute timestamp in seconds since epoch when this metric record is stored. Defaults to None. The metrics
+               store will derive the timestamp automatically.
+        :param relative_time The relative timestamp in seconds since the start of the benchmark when this metric record is stored.
+               Defaults to None. The metrics store will derive the timestamp automatically.
+        :param meta_data: A dict, containing additional key-value pairs. Defaults to None.
+        """
+        self._put(MetaInfoScope.cluster, None, "%s_histogram" % name, histogram.count, unit, operation, operation_type, sample_type,
+                  absolute_time, relative_time, meta_data, histogram=histogram.to_dict())
+
     def _put(self, level, level_key, name, value, unit, operation, operation_type, sample_type, absolute_time=None, relative_time=None,
-             meta_data=None):
+             meta_data=None, histogram=None):
         if level == MetaInfoScope.cluster:
             meta = self._meta_info[MetaInfoScope.cluster].copy()
         elif level == MetaInfoScope.node:
@@ -444,6 +601,8 @@ class MetricsStore:
             doc["operation"] = operation
         if operation_type:
             doc["operation-type"] = operation_type
+        if histogram:
+            doc["histogram"] = histogram
 
         assert self.lap is not None, "Attempting to store [%s] without a lap." % doc
         self._add(doc)
@@ -459,20 +618,27 @@ class MetricsStore:
         approach, param = memento
         if approach == "mem":
             logger.info("Restoring in-memory representation of metrics store.")
-            for doc in pickle.loads(zlib.decompress(param)):
-                self._add(doc)
+            self.add_docs(pickle.loads(zlib.decompress(param)))
         elif approach == "file":
             logger.info("Restoring file representation of metrics store from [%s]." % param)
             try:
                 with open(param, mode="rt", encoding="UTF-8") as f:
-                    for doc in json.load(f):
-                        self._add(doc)
+                    self.add_docs(json.load(f))
             except IOError:
                 logger.exception("Could not restore metrics from [%s]." % param)
                 raise exceptions.DataError("Could not transfer metrics.")
         else:
             raise ValueError("Unrecognized externalization approach [%s]" % approach)
 
+    def add_docs(self, docs):
+        """
+        Adds raw metrics store documents, e.g. documents that have been removed from another metrics store.
+
+        :param docs: A list of metrics store documents.
+        """
+        for doc in docs:
+            self._add(doc)
+
     def _add(self, doc):
         """
         Adds a new document to the metrics store
@@ -541,6 +707,26 @@ class MetricsStore:
         else:
             return 0
 
+    def get_histogram(self, name, operation=None, operation_type=None, sample_type=None, lap=None):
+        """
+        Gets all histograms for the given metric name that have been stored with ``put_histogram_cluster_level`` merged into one.
+
+        :param name: The metric name to query.
+        :param operation The operation name to query. Optional.
+        :param operation_type The operation type to query. Optional.
+        :param sample_type The sample type to query. Optional. By default, all samples are considered.
+        :param lap The lap to query. Optional. By default, all laps are considered.
+        :return: A ``Histogram`` or None if no histogram has been stored for this metric.
+        """
+        merged = None
+        for d in self._get("%s_histogram" % name, operation, operation_type, sample_type, lap, lambda doc: doc["histogram"]):
+            h = Histogram.from_dict(d)
+            if merged is None:
+                merged = h
+            else:
+                merged.merge(h)
+        return merged
+
     def get_error_rate(self, operation, operation_type=None, sample_type=None, lap=None):
         """
         Gets the error rate for a specific operation.
@@ -755,6 +941,25 @@ class EsMetricsStore(MetricsStore):
         else:
             return None
 
+    def get_histogram(self, name, operation=None, operation_type=None, sample_type=None, lap=None):
+        query = {
+            "query": self._query_by_name("%s_histogram" % name, operation, operation_type, sample_type, lap),
+            # there is one histogram per lap, operation and sample type so we need more than the default number of hits
+            "size": 10000,
+            "_source": ["histogram"]
+        }
+        logger.debug("Issuing get_histogram against index=[%s], doc_type=[%s], query=[%s]" %
+                     (self._index, EsMetricsStore.METRICS_DOC_TYPE, query))
+        result = self._client.search(index=self._index, doc_type=EsMetricsStore.METRICS_DOC_TYPE, body=query)
+        merged = None
+        for hit in result["hits"]["hits"]:
+            h = Histogram.from_dict(hit["_source"]["histogram"])
+            if merged is None:
+                merged = h
+            else:
+                merged.merge(h)
+        return merged
+
     def _query_by_name(self, name, operation, operation_type, sample_type, lap):
         q = {
             "bool": {
@@ -842,6 +1047,16 @@ class InMemoryMetricsStore(MetricsStore):
     def _add(self, doc):
         self.docs.append(doc)
 
+    def remove_docs(self):
+        """
+        Removes all documents that have been added to this metrics store so far.
+
+        :return: A list of the removed documents.
+        """
+        docs = self.docs
+        self.docs = []
+        return docs
+
     def flush(self):
         pass
 
@@ -82,6 +82,14 @@ def parse_args():
             raise argparse.ArgumentTypeError("must be positive but was %s" % value)
         return value
 
+    def non_negative(conversion):
+        def check(v):
+            value = conversion(v)
+            if value < 0:
+                raise argparse.ArgumentTypeError("must be non-negative but was %s" % value)
+            return value
+        return check
+
     # try to preload configurable defaults, but this does not work together with `--configuration-name` (which is undocumented anyway)
     cfg = config.Config()
     if cfg.config_present():
@@ -243,6 +251,71 @@ def parse_args():
             help="runs the given track in 'test mode'. Meant to check a track for errors but not for real benchmarks (default: false).",
             default=False,
             action="store_true")
+        p.add_argument(
+            "--load-driver-execution-mode",
+            help="define how the load driver runs clients: 'thread' runs each client in its own thread, 'asyncio' runs all clients of a "
+                 "load driver process as coroutines on an event loop (default: thread).",
+            choices=["thread", "asyncio"],
+            default="thread")
+        p.add_argument(
+            "--load-driver-hosts",
+            help="define a comma-separated list of hosts on which the load driver generates load. Remote hosts need to run the "
+                 "Rally daemon (default: localhost).",
+            default="localhost")
+        p.add_argument(
+            "--load-driver-workers",
+            type=positive_number,
+            help="number of worker processes per load driver host that run all clients (default: number of physical CPU cores).",
+            default=None)
+        p.add_argument(
+            "--load-driver-latency-recording",
+            help="define how the load driver records latency and service time: 'sample' keeps every sample, 'histogram' records them in "
+                 "histograms which needs much less memory for long-running benchmarks (default: sample).",
+            choices=["sample", "histogram"],
+            default="sample")
+        p.add_argument(
+            "--load-driver-task-start-delay",
+            type=non_negative(float),
+            help="time in seconds that the load driver waits before all clients start the next task (default: 0.5).",
+            default=0.5)
+        p.add_argument(
+            "--load-driver-load-model",
+            help="define whether clients of throughput-throttled tasks wait for a response before they issue the next request (closed) "
+                 "or issue requests at the scheduled time regardless of outstanding responses (open) (default: closed).",
+            choices=["closed", "open"],
+            default="closed")
+        p.add_argument(
+            "--load-driver-max-in-flight",
+            type=positive_number,
+            help="maximum number of outstanding requests per client with the open load model (default: 32).",
+            default=32)
+        p.add_argument(
+            "--load-driver-prefetch-params",
+            type=non_negative(int),
+            help="number of request parameters per client that are generated ahead of time in a background thread. 0 generates them "
+                 "just before each request (default: 0).",
+            default=0)
+        p.add_argument(
+            "--load-driver-warm-connections",
+            type=non_negative(int),
+            help="number of connections per client and node that the load driver opens before the benchmark starts (default: 1).",
+            default=1)
+        p.add_argument(
+            "--load-driver-record-overhead",
+            help="record how much time the load driver itself spends per request, e.g. to generate parameters or to store samples "
+                 "(default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--load-driver-raw-samples",
+            help="keep all raw samples and write them to a CSV file in the race directory at the end of each lap (default: false).",
+            default=False,
+            action="store_true")
+        p.add_argument(
+            "--load-driver-live-metrics",
+            help="write request metrics to the Elasticsearch metrics store periodically while the benchmark is running (default: false).",
+            default=False,
+            action="store_true")
 
     for p in [parser, list_parser, race_parser]:
         p.add_argument(
@@ -269,6 +342,12 @@ def parse_args():
             help="Enables a profiler for analyzing the performance of calls in Rally's driver (default: false)",
             default=False,
             action="store_true")
+        p.add_argument(
+            "--driver-profiling-mode",
+            help="Defines how the driver profiler works: 'cprofile' traces all calls of each client, 'sampling' periodically samples "
+                 "the stacks of all clients and writes them as collapsed stacks per task (default: cprofile).",
+            choices=["cprofile", "sampling"],
+            default="cprofile")
 
     ###############################################################################
     #
@@ -585,6 +664,19 @@ def main():
     ################################
     cfg.add(config.Scope.applicationOverride, "benchmarks", "cluster.health", args.cluster_health)
     cfg.add(config.Scope.applicationOverride, "driver", "profiling", args.enable_driver_profiling)
+    cfg.add(config.Scope.applicationOverride, "driver", "profiling.mode", args.driver_profiling_mode)
+    cfg.add(config.Scope.applicationOverride, "driver", "execution.mode", args.load_driver_execution_mode)
+    cfg.add(config.Scope.applicationOverride, "driver", "hosts", csv_to_list(args.load_driver_hosts))
+    cfg.add(config.Scope.applicationOverride, "driver", "worker.count", args.load_driver_workers)
+    cfg.add(config.Scope.applicationOverride, "driver", "latency.recording", args.load_driver_latency_recording)
+    cfg.add(config.Scope.applicationOverride, "driver", "load.model", args.load_driver_load_model)
+    cfg.add(config.Scope.applicationOverride, "driver", "max.in.flight.requests", args.load_driver_max_in_flight)
+    cfg.add(config.Scope.applicationOverride, "driver", "params.prefetch.size", args.load_driver_prefetch_params)
+    cfg.add(config.Scope.applicationOverride, "driver", "overhead.recording", args.load_driver_record_overhead)
+    cfg.add(config.Scope.applicationOverride, "driver", "connections.warmup.count", args.load_driver_warm_connections)
+    cfg.add(config.Scope.applicationOverride, "driver", "raw.samples.enabled", args.load_driver_raw_samples)
+    cfg.add(config.Scope.applicationOverride, "driver", "live.metrics.enabled", args.load_driver_live_metrics)
+    cfg.add(config.Scope.applicationOverride, "driver", "task.start.delay", args.load_driver_task_start_delay)
     if sub_command != "list":
         # Also needed by mechanic (-> telemetry) - duplicate by module?
         cfg.add(config.Scope.applicationOverride, "client", "hosts", convert_hosts(csv_to_list(args.target_hosts)))
@@ -9,6 +9,9 @@ from esrally.utils import convert, io as rio, console
 
 logger = logging.getLogger("rally.reporting")
 
+# phases of a request for which the load driver records its overhead (in the order in which they happen)
+DRIVER_OVERHEAD_PHASES = ["params", "serialization", "deserialization", "normalization", "sampling"]
+
 
 def calculate_results(metrics_store, race, lap=None):
     calc = StatsCalculator(metrics_store, race.challenge, lap)
@@ -98,7 +101,10 @@ class StatsCalculator:
                     self.summary_stats("throughput", op),
                     self.single_latency(op),
                     self.single_latency(op, metric_name="service_time"),
-                    self.error_rate(op)
+                    self.error_rate(op),
+                    self.max_sustainable_throughput(op),
+                    self.driver_overhead(op),
+                    self.single_latency(op, metric_name="server_time")
                 )
 
         logger.debug("Gathering indexing metrics.")
@@ -171,7 +177,32 @@ class StatsCalculator:
             }
 
     def error_rate(self, operation_name):
-        return self.store.get_error_rate(operation=operation_name, sample_type=metrics.SampleType.Normal, lap=self.lap)
+        sample_type = metrics.SampleType.Normal
+        service_time = self.store.get_histogram("service_time", operation=operation_name, sample_type=sample_type, lap=self.lap)
+        if service_time and service_time.count > 0:
+            # the load driver has recorded histograms instead of individual samples
+            errors = self.store.get("error_count", operation=operation_name, sample_type=sample_type, lap=self.lap)
+            return sum(errors) / service_time.count
+        return self.store.get_error_rate(operation=operation_name, sample_type=sample_type, lap=self.lap)
+
+    def max_sustainable_throughput(self, operation_name):
+        # only available if the task has run a throughput search
+        value = self.store.get_one("max_sustainable_throughput", operation=operation_name, lap=self.lap)
+        if value is None:
+            return None
+        return {
+            "value": value,
+            "unit": self.store.get_unit("max_sustainable_throughput", operation=operation_name)
+        }
+
+    def driver_overhead(self, operation_name):
+        # only available if the load driver has recorded its overhead
+        overhead = {}
+        for phase in DRIVER_OVERHEAD_PHASES:
+            value = self.store.get_one("driver_overhead_%s" % phase, operation=operation_name, lap=self.lap)
+            if value is not None:
+                overhead[phase] = value
+        return overhead if overhead else None
 
     def median(self, metric_name, operation_name=None, operation_type=None, sample_type=None):
         return self.store.get_median(metric_name, operation=operation_name, operation_type=operation_type, sample_type=sample_type,
@@ -186,33 +217,24 @@ class StatsCalculator:
                                                      sample_type=sample_type,
                                                      percentiles=self.percentiles_for_sample_size(sample_size),
                                                      lap=self.lap)
-            # safely encode so we don't have any dots in field names
-            safe_percentiles = collections.OrderedDict()
-            for k, v in percentiles.items():
-                safe_percentiles[self.safe_float_key(k)] = v
-            return safe_percentiles
         else:
-            return {}
+            # the load driver may have recorded a histogram instead of individual samples
+            histogram = self.store.get_histogram(metric_name, operation=operation, sample_type=sample_type, lap=self.lap)
+            if histogram and histogram.count > 0:
+                percentiles = histogram.percentiles(self.percentiles_for_sample_size(histogram.count))
+            else:
+                return {}
+        # safely encode so we don't have any dots in field names
+        safe_percentiles = collections.OrderedDict()
+        for k, v in percentiles.items():
+            safe_percentiles[self.safe_float_key(k)] = v
+        return safe_percentiles
 
     def safe_float_key(self, k):
         return str(k).replace(".", "_")
 
     def percentiles_for_sample_size(self, sample_size):
-        # if needed we can come up with something smarter but it'll do for now
-        if sample_size < 1:
-            raise AssertionError("Percentiles require at least one sample")
-        elif sample_size == 1:
-            return [100]
-        elif 1 < sample_size < 10:
-            return [50, 100]
-        elif 10 <= sample_size < 100:
-            return [50, 90, 100]
-        elif 100 <= sample_size < 1000:
-            return [50, 90, 99, 100]
-        elif 1000 <= sample_size < 10000:
-            return [50, 90, 99, 99.9, 100]
-        else:
-            return [50, 90, 99, 99.9, 99.99, 100]
+        return metrics.percentiles_for_sample_size(sample_size)
 
 
 class Stats:
@@ -262,8 +284,17 @@ class Stats:
                         all_results.append({"operation": item["operation"], "name": "latency", "value": item["latency"]})
                     if "service_time" in item:
                         all_results.append({"operation": item["operation"], "name": "service_time", "value": item["service_time"]})
+                    if item.get("server_time"):
+                        all_results.append({"operation": item["operation"], "name": "server_time", "value": item["server_time"]})
                     if "error_rate" in item:
                         all_results.append({"operation": item["operation"], "name": "error_rate", "value": {"single": item["error_rate"]}})
+                    if item.get("max_sustainable_throughput"):
+                        all_results.append({"operation": item["operation"], "name": "max_sustainable_throughput",
+                                            "value": {"single": item["max_sustainable_throughput"]["value"]}})
+                    if item.get("driver_overhead"):
+                        for phase, overhead in item["driver_overhead"].items():
+                            all_results.append({"operation": item["operation"], "name": "driver_overhead_%s" % phase,
+                                                "value": {"single": overhead}})
             elif value is not None:
                 result = {
                     "name": metric,
@@ -278,14 +309,22 @@ class Stats:
     def v(self, d, k, default=None):
         return d.get(k, default) if d else default
 
-    def add_op_metrics(self, operation, throughput, latency, service_time, error_rate):
-        self.op_metrics.append({
+    def add_op_metrics(self, operation, throughput, latency, service_time, error_rate, max_sustainable_throughput=None,
+                       driver_overhead=None, server_time=None):
+        op_metrics = {
             "operation": operation,
             "throughput": throughput,
             "latency": latency,
             "service_time": service_time,
             "error_rate": error_rate
-        })
+        }
+        if max_sustainable_throughput:
+            op_metrics["max_sustainable_throughput"] = max_sustainable_throughput
+        if driver_overhead:
+            op_metrics["driver_overhead"] = driver_overhead
+        if server_time:
+            op_metrics["server_time"] = server_time
+        self.op_metrics.append(op_metrics)
 
     def operations(self):
         return [v["operation"] for v in self.op_metrics]
@@ -377,7 +416,9 @@ class SummaryReporter:
             metrics_table += self.report_throughput(record, operation)
             metrics_table += self.report_latency(record, operation)
             metrics_table += self.report_service_time(record, operation)
+            metrics_table += self.report_server_time(record, operation)
             metrics_table += self.report_error_rate(record, operation)
+            metrics_table += self.report_driver_overhead(record, operation)
             self.add_warnings(warnings, record, operation)
 
         meta_info_table += self.report_meta_info()
@@ -413,11 +454,16 @@ class SummaryReporter:
         median = values["throughput"]["median"]
         max = values["throughput"]["max"]
         unit = values["throughput"]["unit"]
-        return [
+        lines = [
             [self.lap, "Min Throughput", operation, min, unit],
             [self.lap, "Median Throughput", operation, median, unit],
             [self.lap, "Max Throughput", operation, max, unit]
         ]
+        max_sustainable_throughput = values.get("max_sustainable_throughput")
+        if max_sustainable_throughput:
+            lines.append([self.lap, "Max Sustainable Throughput", operation, max_sustainable_throughput["value"],
+                          max_sustainable_throughput["unit"]])
+        return lines
 
     def report_latency(self, values, operation):
         lines = []
@@ -435,6 +481,15 @@ class SummaryReporter:
                 lines.append([self.lap, "%sth percentile service time" % self.decode_percentile_key(percentile), operation, value, "ms"])
         return lines
 
+    def report_server_time(self, values, operation):
+        lines = []
+        # only available if Elasticsearch has reported how long it took to process requests
+        server_time = values.get("server_time")
+        if server_time:
+            for percentile, value in server_time.items():
+                lines.append([self.lap, "%sth percentile server time" % self.decode_percentile_key(percentile), operation, value, "ms"])
+        return lines
+
     def decode_percentile_key(self, k):
         return k.replace("_", ".")
 
@@ -445,6 +500,15 @@ class SummaryReporter:
             lines.append([self.lap, "error rate", operation, "%.2f" % (error_rate * 100.0), "%"])
         return lines
 
+    def report_driver_overhead(self, values, operation):
+        lines = []
+        overhead = values.get("driver_overhead")
+        if overhead:
+            for phase in DRIVER_OVERHEAD_PHASES:
+                if phase in overhead:
+                    lines.append([self.lap, "Mean driver overhead (%s)" % phase, operation, overhead[phase], "ms"])
+        return lines
+
     def report_total_times(self, stats):
         total_times = []
         unit = "min"
@@ -572,6 +636,7 @@ class ComparisonReporter:
                 metrics_table += self.report_throughput(baseline_stats, contender_stats, op)
                 metrics_table += self.report_latency(baseline_stats, contender_stats, op)
                 metrics_table += self.report_service_time(baseline_stats, contender_stats, op)
+                metrics_table += self.report_server_time(baseline_stats, contender_stats, op)
                 metrics_table += self.report_error_rate(baseline_stats, contender_stats, op)
         return metrics_table
 
@@ -630,6 +695,21 @@ class ComparisonReporter:
                                                         operation, "ms", treat_increase_as_improvement=False))
         return lines
 
+    def report_server_time(self, baseline_stats, contender_stats, operation):
+        lines = []
+
+        # older results do not contain the server time
+        baseline_server_time = baseline_stats.metrics(operation).get("server_time", {})
+        contender_server_time = contender_stats.metrics(operation).get("server_time", {})
+
+        for percentile, baseline_value in baseline_server_time.items():
+            if percentile in contender_server_time:
+                contender_value = contender_server_time[percentile]
+                self.append_if_present(lines, self.line("%sth percentile server time" %
+                                                        self.decode_percentile_key(percentile), baseline_value, contender_value,
+                                                        operation, "ms", treat_increase_as_improvement=False))
+        return lines
+
     def decode_percentile_key(self, k):
         return k.replace("_", ".")
 
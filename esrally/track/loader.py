@@ -350,6 +350,9 @@ def post_process_for_test_mode(t):
                 if leaf_task.warmup_time_period is not None and leaf_task.warmup_time_period > 0:
                     leaf_task.warmup_time_period = 0
                     logger.info("Resetting warmup time period for [%s] to [%d] seconds." % (str(leaf_task), leaf_task.warmup_time_period))
+                if "steady-state" in leaf_task.params:
+                    leaf_task.params["steady-state"]["max-warmup-time-period"] = 0
+                    logger.info("Disabling adaptive warmup for [%s]." % str(leaf_task))
                 if leaf_task.time_period is not None and leaf_task.time_period > 10:
                     leaf_task.time_period = 10
                     logger.info("Resetting measurement time period for [%s] to [%d] seconds." % (str(leaf_task), leaf_task.time_period))
@@ -1,3 +1,4 @@
+import copy
 import logging
 import random
 import time
@@ -127,6 +128,8 @@ class SearchParamSource(ParamSource):
         query_body = params.get("body", None)
         pages = params.get("pages", None)
         items_per_page = params.get("results-per-page", None)
+        scroll_keep_alive = params.get("scroll-keep-alive", None)
+        self.sliced_scroll = params.get("sliced-scroll", False)
 
         self.query_params = {
             "index": index_name,
@@ -142,11 +145,85 @@ class SearchParamSource(ParamSource):
             self.query_params["pages"] = pages
         if items_per_page:
             self.query_params["items_per_page"] = items_per_page
+        if scroll_keep_alive:
+            self.query_params["scroll_keep_alive"] = scroll_keep_alive
+        if self.sliced_scroll and not pages:
+            raise exceptions.InvalidSyntax("'sliced-scroll' requires 'pages'")
+
+    def partition(self, partition_index, total_partitions):
+        # Elasticsearch requires at least two slices
+        if not self.sliced_scroll or total_partitions < 2:
+            return self
+        # each client scrolls over its own slice of the results
+        query_slice = {
+            "id": partition_index,
+            "max": total_partitions
+        }
+        partition = copy.copy(self)
+        partition.query_params = self.query_params.copy()
+        partition.query_params["body"] = dict(self.query_params["body"] or {}, slice=query_slice)
+        partition.query_params["slice"] = query_slice
+        return partition
 
     def params(self):
         return self.query_params
 
 
+class MultiSearchParamSource(ParamSource):
+    def __init__(self, indices, params):
+        super().__init__(indices, params)
+        if len(indices) == 1 and len(indices[0].types) == 1:
+            default_index = indices[0].name
+            default_type = indices[0].types[0].name
+        else:
+            default_index = None
+            default_type = None
+
+        index_name = params.get("index", default_index)
+        type_name = params.get("type", default_type)
+        request_cache = params.get("cache", None)
+        if "bodies" in params:
+            query_bodies = params["bodies"]
+        elif "body" in params:
+            query_bodies = [params["body"]]
+        else:
+            raise exceptions.InvalidSyntax("Either 'body' or 'bodies' is mandatory")
+        self.queries_per_request = params.get("queries-per-request", 10)
+
+        if not index_name:
+            raise exceptions.InvalidSyntax("'index' is mandatory")
+        if not query_bodies:
+            raise exceptions.InvalidSyntax("'bodies' must not be empty")
+        if not isinstance(self.queries_per_request, int) or self.queries_per_request < 1:
+            raise exceptions.InvalidSyntax("'queries-per-request' must be a positive integer but was [%s]" % str(self.queries_per_request))
+
+        header = {"index": index_name}
+        if type_name:
+            header["type"] = type_name
+        if request_cache is not None:
+            header["request_cache"] = request_cache
+        self.searches = [(header, query_body) for query_body in query_bodies]
+        # position of the first query of the next request within ``searches``
+        self.offset = 0
+        # requests are built only once per distinct offset
+        self.requests = {}
+
+    def params(self):
+        offset = self.offset
+        self.offset = (offset + self.queries_per_request) % len(self.searches)
+        try:
+            return self.requests[offset]
+        except KeyError:
+            body = []
+            for i in range(offset, offset + self.queries_per_request):
+                body.extend(self.searches[i % len(self.searches)])
+            self.requests[offset] = {
+                "body": body,
+                "queries": self.queries_per_request
+            }
+            return self.requests[offset]
+
+
 class IndexIdConflict(Enum):
     """
     Determines which id conflicts to simulate during indexing.
@@ -216,6 +293,17 @@ class BulkIndexParamSource(ParamSource):
                 raise exceptions.InvalidSyntax("'batch-size' must be a multiple of 'bulk-size'")
         except ValueError:
             raise exceptions.InvalidSyntax("'batch-size' must be numeric")
+
+        retry_policy = params.get("retry-rejected")
+        if retry_policy is not None:
+            if not isinstance(retry_policy, dict):
+                raise exceptions.InvalidSyntax("'retry-rejected' must be a hash but was [%s]" % str(retry_policy))
+            for key in ["max-retries", "initial-backoff", "max-backoff"]:
+                value = retry_policy.get(key, 0)
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+                    raise exceptions.InvalidSyntax("'%s' in 'retry-rejected' must be a non-negative number but was [%s]" %
+                                                   (key, str(value)))
+
         if len(indices) == 1 and len(indices[0].types) == 1:
             default_index = indices[0].name
         else:
@@ -565,6 +653,7 @@ class IndexDataReader:
 
 register_param_source_for_operation(track.OperationType.Index, BulkIndexParamSource)
 register_param_source_for_operation(track.OperationType.Search, SearchParamSource)
+register_param_source_for_operation(track.OperationType.MultiSearch, MultiSearchParamSource)
 
 # Also register by name, so users can use it too
 register_param_source_for_name("file-reader", BulkIndexParamSource)
@@ -34,6 +34,12 @@ install_requires = [
     "certifi"
 ]
 
+# optional dependencies
+extras_require = {
+    # speeds up post-processing of samples in the load driver
+    "numpy": ["numpy"]
+}
+
 tests_require = [
     "pytest==3.0.6",
     "pytest-benchmark==3.0.0"
@@ -55,6 +61,7 @@ setup(name="esrally",
       include_package_data=True,
       package_data={"": ["*.json", "*.yml"]},
       install_requires=install_requires,
+      extras_require=extras_require,
       test_suite="tests",
       tests_require=tests_require,
       setup_requires=[
@@ -0,0 +1,104 @@
+import gzip
+import http.server
+import json
+import socketserver
+import threading
+from unittest import TestCase
+
+from esrally import client
+
+
+class ClientConnectionTests(TestCase):
+    class KeepAliveHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if "Content-Length" in self.headers:
+                self.do_POST()
+            else:
+                self.respond(b'{"tagline": "You Know, for Search"}')
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            # echo the request body so tests can check what the server has received
+            self.respond(json.dumps({"received": body.decode("utf-8")}).encode("utf-8"))
+
+        def respond(self, body):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class ThreadingHttpServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        daemon_threads = True
+
+    def setUp(self):
+        self.server = ClientConnectionTests.ThreadingHttpServer(("127.0.0.1", 0), ClientConnectionTests.KeepAliveHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        hosts = [{"host": "127.0.0.1", "port": self.server.server_address[1]}]
+        self.es = client.EsClientFactory(hosts, {}).create()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_counts_new_and_reused_connections(self):
+        self.es.info()
+        self.es.info()
+
+        requests, new_connections, connect_time = client.connection_stats(self.es)
+        self.assertEqual(2, requests)
+        self.assertEqual(1, new_connections)
+        self.assertTrue(connect_time > 0)
+
+    def test_warm_up_opens_connections_in_advance(self):
+        client.warm_up(self.es, 3)
+
+        _, new_connections, _ = client.connection_stats(self.es)
+        self.assertEqual(3, new_connections)
+
+        self.es.info()
+        requests, new_connections, _ = client.connection_stats(self.es)
+        self.assertEqual(1, requests)
+        # the request has used one of the prepared connections
+        self.assertEqual(3, new_connections)
+
+    def test_sends_prepared_bodies_as_is(self):
+        body = client.prepare_body({"query": {"match_all": {}}})
+        self.assertEqual(b'{"query": {"match_all": {}}}', body)
+        self.assertEqual({"received": '{"query": {"match_all": {}}}'}, self.es.search(index="test", body=body))
+
+        bulk = client.prepare_body(['{"index": {}}', '{"title": "Rally"}'], compression_level=1)
+        self.assertIsInstance(bulk, client.CompressedBody)
+        self.assertEqual({"received": '{"index": {}}\n{"title": "Rally"}\n'}, self.es.bulk(index="test", doc_type="docs", body=bulk))
+
+    def test_returns_raw_responses_on_request(self):
+        with client.raw_responses():
+            self.assertEqual('{"tagline": "You Know, for Search"}', self.es.info())
+        self.assertEqual({"tagline": "You Know, for Search"}, self.es.info())
+
+    def test_counts_request_and_response_bytes(self):
+        with client.counting_bytes() as byte_counts:
+            self.es.search(index="test", body={"query": {"match_all": {}}})
+            self.es.info()
+
+        self.assertEqual(2, byte_counts.requests)
+        self.assertEqual(len(b'{"query": {"match_all": {}}}'), byte_counts.request_bytes)
+        self.assertEqual(len(b'{"received": "{\\"query\\": {\\"match_all\\": {}}}"}') +
+                         len(b'{"tagline": "You Know, for Search"}'), byte_counts.response_bytes)
+
+        # nothing is counted outside of the context
+        self.es.info()
+        self.assertEqual(2, byte_counts.requests)
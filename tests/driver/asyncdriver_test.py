@@ -0,0 +1,123 @@
+import threading
+import time
+import unittest.mock as mock
+from unittest import TestCase
+
+from esrally import metrics, track
+from esrally.driver import asyncdriver, driver
+from esrally.track import params
+
+
+class AsyncDriverTestParamSource:
+    def __init__(self, indices=None, params=None):
+        if params is None:
+            params = {}
+        self._indices = indices
+        self._params = params
+
+    def partition(self, partition_index, total_partitions):
+        return self
+
+    def size(self):
+        return self._params["size"] if "size" in self._params else 1
+
+    def params(self):
+        return self._params
+
+
+class AsyncExecutorTests(TestCase):
+    def setUp(self):
+        params.register_param_source_for_name("async-driver-test-param-source", AsyncDriverTestParamSource)
+        self.test_track = track.Track(name="unittest", short_description="unittest track",
+                                      source_root_url="http://example.org",
+                                      indices=None,
+                                      challenges=None)
+
+    def bulk_task(self, **kwargs):
+        return track.Task(track.Operation("bulk", track.OperationType.Index.name, params={
+            "body": ["action_metadata_line", "index_line"],
+            "action_metadata_present": True,
+            "bulk-size": 1
+        }, param_source="async-driver-test-param-source"), **kwargs)
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_clients_concurrently(self, es):
+        es.bulk.return_value = {
+            "errors": False
+        }
+        task = self.bulk_task(warmup_iterations=0, iterations=20, clients=2)
+        samplers = [driver.Sampler(client_id=client_id, task=task, start_timestamp=0) for client_id in range(2)]
+        jobs = [(client_id, es, [(task, samplers[client_id])]) for client_id in range(2)]
+
+        asyncdriver.execute_clients(threading.Event(), self.test_track, jobs)
+
+        for client_id, sampler in enumerate(samplers):
+            samples = sampler.samples
+            # 20 iterations are split across two clients
+            self.assertEqual(10, len(samples))
+            for sample in samples:
+                self.assertEqual(client_id, sample.client_id)
+                self.assertEqual(task, sample.task)
+                self.assertEqual(metrics.SampleType.Normal, sample.sample_type)
+                self.assertEqual(1, sample.total_ops)
+                self.assertEqual("docs", sample.total_ops_unit)
+        self.assertEqual(20, es.bulk.call_count)
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_clients_throughput_throttled(self, es):
+        es.bulk.return_value = {
+            "errors": False
+        }
+        # in one second we should get 100 [ops/s] / 2 [clients] = 50 samples per client
+        task = self.bulk_task(warmup_time_period=0.5, time_period=0.5, clients=2, params={"target-throughput": 100, "clients": 2})
+        samplers = [driver.Sampler(client_id=client_id, task=task, start_timestamp=0) for client_id in range(2)]
+        jobs = [(client_id, es, [(task, samplers[client_id])]) for client_id in range(2)]
+
+        asyncdriver.execute_clients(threading.Event(), self.test_track, jobs)
+
+        for sampler in samplers:
+            samples = sampler.samples
+            sample_size = len(samples)
+            self.assertTrue(48 <= sample_size <= 52, msg="Expected sample size to be between 48 and 52 but was %d" % sample_size)
+            for sample in samples[1:]:
+                self.assertTrue(0 <= sample.schedule_lag_ms < 50, msg="Unexpected schedule lag [%s] ms" % sample.schedule_lag_ms)
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_clients_with_open_load_model(self, es):
+        def bulk(*args, **kwargs):
+            time.sleep(0.05)
+            return {"errors": False}
+
+        es.bulk.side_effect = bulk
+        # 100 requests arrive within one second but two requests in flight only allow 40 requests per second
+        task = self.bulk_task(warmup_time_period=0, time_period=1, clients=1, params={"target-throughput": 100, "clients": 1})
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+
+        asyncdriver.execute_clients(threading.Event(), self.test_track, [(0, es, [(task, sampler)])], max_in_flight=2)
+
+        samples = sampler.samples
+        dropped = sampler.counters.get(("dropped_requests", None, metrics.SampleType.Normal), 0)
+        self.assertTrue(95 <= len(samples) + dropped <= 105, msg="Unexpected number of requests [%d]" % (len(samples) + dropped))
+        self.assertTrue(dropped > 0)
+        self.assertTrue(len(samples) > 20, msg="Expected more than 20 samples but got %d" % len(samples))
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_cancel_execute_clients(self, es):
+        task = self.bulk_task(warmup_iterations=0, iterations=10, clients=1)
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+        cancel = threading.Event()
+        cancel.set()
+
+        asyncdriver.execute_clients(cancel, self.test_track, [(0, es, [(task, sampler)])])
+
+        self.assertEqual(0, len(sampler.samples))
+        es.bulk.assert_not_called()
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_execute_clients_aborts_on_error(self, es):
+        es.bulk.side_effect = ValueError("expected unit test exception")
+        task = self.bulk_task(warmup_iterations=0, iterations=10, clients=1)
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+
+        with self.assertRaises(ValueError):
+            asyncdriver.execute_clients(threading.Event(), self.test_track, [(0, es, [(task, sampler)])])
@@ -1,9 +1,11 @@
 import unittest.mock as mock
 import threading
+import time
 import collections
+import datetime
 from unittest import TestCase
 
-from esrally import metrics, track, exceptions
+from esrally import config, metrics, track, exceptions
 from esrally.driver import driver
 from esrally.track import params
 from esrally.utils import io
@@ -26,6 +28,19 @@ class DriverTestParamSource:
         return self._params
 
 
+def create_metrics_store():
+    """
+    :return: A tuple of a minimal config and an opened in-memory metrics store for it.
+    """
+    cfg = config.Config()
+    cfg.add(config.Scope.application, "system", "env.name", "unittest")
+    metrics_store = metrics.InMemoryMetricsStore(cfg)
+    metrics_store.open(invocation=datetime.datetime.now(), track_name="unittest", challenge_name="unittest", car_name="unittest",
+                       create=True)
+    metrics_store.lap = 1
+    return cfg, metrics_store
+
+
 class ScheduleTestCase(TestCase):
     def assert_schedule(self, expected_schedule, schedule):
         idx = 0
@@ -162,6 +177,198 @@ class AllocatorTests(TestCase):
         self.assertEqual([{op1, op2, op3}], allocator.operations_per_joinpoint)
 
 
+class ClientAllocationsTests(TestCase):
+    def setUp(self):
+        params.register_param_source_for_name("driver-test-param-source", DriverTestParamSource)
+
+    def test_allocations_for_multiple_clients(self):
+        op1 = track.Operation("index", track.OperationType.Index, param_source="driver-test-param-source")
+        op2 = track.Operation("search", track.OperationType.Search, param_source="driver-test-param-source")
+        op3 = track.Operation("stats", track.OperationType.NodesStats, param_source="driver-test-param-source")
+        task1 = track.Task(op1, clients=2)
+        task2 = track.Task(op2)
+        task3 = track.Task(op3, clients=2)
+
+        allocator = driver.Allocator([task1, track.Parallel([task2]), task3])
+        allocations = allocator.allocations
+
+        client_allocations = driver.ClientAllocations()
+        client_allocations.add(0, allocations[0])
+        client_allocations.add(1, allocations[1])
+
+        self.assertEqual(2, len(client_allocations))
+        self.assertEqual([0, 1], client_allocations.client_ids)
+
+        self.assertTrue(client_allocations.is_join_point(0))
+        self.assertFalse(client_allocations.is_join_point(1))
+        self.assertEqual(2, client_allocations.next_join_point_index(1))
+        self.assertEqual([(0, [task1]), (1, [task1])], client_allocations.tasks(1, 2))
+
+        self.assertEqual(4, client_allocations.next_join_point_index(3))
+        # the second client does not participate in this step
+        self.assertEqual([(0, [task2]), (1, [])], client_allocations.tasks(3, 4))
+        self.assertEqual(driver.JoinPoint(2), client_allocations.join_point(4))
+
+
+class WorkerAllocationTests(TestCase):
+    def test_distributes_clients_round_robin_across_workers(self):
+        allocations = [["client-%d" % client_id] for client_id in range(5)]
+
+        workers = driver.allocations_for_workers(allocations, worker_count=2)
+
+        self.assertEqual(2, len(workers))
+        self.assertEqual([0, 2, 4], workers[0].client_ids)
+        self.assertEqual([1, 3], workers[1].client_ids)
+        self.assertEqual([(0, ["client-0"]), (2, ["client-2"]), (4, ["client-4"])], workers[0].tasks(0, 1))
+
+    def test_never_starts_more_workers_than_clients(self):
+        allocations = [["client-%d" % client_id] for client_id in range(2)]
+
+        workers = driver.allocations_for_workers(allocations, worker_count=8)
+
+        self.assertEqual(2, len(workers))
+        self.assertEqual([0], workers[0].client_ids)
+        self.assertEqual([1], workers[1].client_ids)
+
+    def test_rejects_invalid_worker_count(self):
+        with self.assertRaises(exceptions.SystemSetupError) as ctx:
+            driver.allocations_for_workers([["client-0"]], worker_count=0)
+        self.assertEqual("The number of load driver workers must be positive but was [0].", ctx.exception.args[0])
+
+    @mock.patch("esrally.utils.sysstats.logical_cpu_cores")
+    @mock.patch("esrally.utils.sysstats.physical_cpu_cores")
+    def test_default_worker_count(self, physical_cpu_cores, logical_cpu_cores):
+        physical_cpu_cores.return_value = 4
+        logical_cpu_cores.return_value = 8
+        self.assertEqual(4, driver.default_worker_count())
+
+        physical_cpu_cores.return_value = None
+        self.assertEqual(8, driver.default_worker_count())
+
+
+class LoadDriverHostsTests(TestCase):
+    def test_distributes_workers_round_robin_across_hosts(self):
+        hosts = driver.hosts_for_workers(["10.5.5.10", "10.5.5.11"], worker_count=5)
+
+        self.assertEqual(["10.5.5.10", "10.5.5.11", "10.5.5.10", "10.5.5.11", "10.5.5.10"], hosts)
+
+    def test_requires_at_least_one_host(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            driver.hosts_for_workers([], worker_count=2)
+
+    def test_places_load_generators_on_hosts(self):
+        self.assertEqual({"coordinator": True}, driver.load_generator_requirements("localhost"))
+        self.assertEqual({"coordinator": True}, driver.load_generator_requirements("127.0.0.1"))
+        self.assertEqual({"ip": "10.5.5.10"}, driver.load_generator_requirements("10.5.5.10"))
+
+
+class ThroughputSearchTests(TestCase):
+    def search_task(self, **search_spec):
+        return track.Task(track.Operation("search", track.OperationType.Search.name), clients=2,
+                          params={"clients": 2, "target-throughput": 10, "throughput-search": search_spec})
+
+    def test_step_search_stops_when_slo_is_breached(self):
+        search = driver.ThroughputSearch.from_task(self.search_task(**{"initial-throughput": 100, "throughput-step": 50,
+                                                                       "max-latency": 20}))
+        self.assertEqual(100, search.next_target())
+        search.add_step(100, throughput=100, throughput_unit="ops/s", latency=10, error_rate=0.0)
+        self.assertEqual(150, search.next_target())
+        search.add_step(150, throughput=148, throughput_unit="ops/s", latency=15, error_rate=0.0)
+        self.assertEqual(200, search.next_target())
+        search.add_step(200, throughput=170, throughput_unit="ops/s", latency=80, error_rate=0.0)
+
+        self.assertIsNone(search.next_target())
+        self.assertEqual(148, search.best_step["throughput"])
+        self.assertEqual(150, search.best_step["target_throughput"])
+
+    def test_step_search_respects_error_rate_and_max_throughput(self):
+        search = driver.ThroughputSearch.from_task(self.search_task(**{"initial-throughput": 100, "throughput-step": 100,
+                                                                       "max-throughput": 200, "max-latency": 20}))
+        search.add_step(100, throughput=100, throughput_unit="ops/s", latency=10, error_rate=0.0)
+        search.add_step(200, throughput=200, throughput_unit="ops/s", latency=10, error_rate=0.0)
+        # exceeds max-throughput
+        self.assertIsNone(search.next_target())
+
+        search = driver.ThroughputSearch.from_task(self.search_task(**{"initial-throughput": 100, "throughput-step": 100,
+                                                                       "max-latency": 20}))
+        search.add_step(100, throughput=100, throughput_unit="ops/s", latency=10, error_rate=0.5)
+        self.assertIsNone(search.next_target())
+        self.assertIsNone(search.best_step)
+
+    def test_binary_search_narrows_range(self):
+        search = driver.ThroughputSearch.from_task(self.search_task(**{"strategy": "binary", "max-throughput": 1000,
+                                                                       "throughput-step": 200, "max-latency": 20}))
+        self.assertEqual(500, search.next_target())
+        search.add_step(500, throughput=500, throughput_unit="ops/s", latency=10, error_rate=0.0)
+        self.assertEqual(750, search.next_target())
+        search.add_step(750, throughput=700, throughput_unit="ops/s", latency=50, error_rate=0.0)
+        self.assertEqual(625, search.next_target())
+        search.add_step(625, throughput=620, throughput_unit="ops/s", latency=15, error_rate=0.0)
+        # range [625, 750] is smaller than the precision
+        self.assertIsNone(search.next_target())
+        self.assertEqual(620, search.best_step["throughput"])
+
+    def test_rejects_invalid_search(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            driver.ThroughputSearch.from_task(self.search_task(**{"initial-throughput": 100, "max-latency": 20}))
+        with self.assertRaises(exceptions.SystemSetupError):
+            driver.ThroughputSearch.from_task(self.search_task(**{"strategy": "random", "max-latency": 20}))
+
+    def test_expands_search_into_steps(self):
+        before = track.Task(track.Operation("index", track.OperationType.Index.name))
+        search_task = self.search_task(**{"initial-throughput": 100, "throughput-step": 50, "max-latency": 20, "max-steps": 3,
+                                          "step-time-period": 30})
+
+        schedule, searches = driver.expand_throughput_searches([before, search_task])
+
+        self.assertEqual(4, len(schedule))
+        self.assertEqual(before, schedule[0])
+        steps = schedule[1:]
+        self.assertEqual([0, 1, 2], [step.step for step in steps])
+        # each step is a distinct task
+        self.assertEqual(3, len(set(steps)))
+        for step in steps:
+            self.assertEqual(30, step.time_period)
+            self.assertEqual(2, step.clients)
+            self.assertNotIn("target-throughput", step.params)
+            self.assertIs(searches[steps[0]], searches[step])
+        self.assertEqual(3, len(searches))
+
+    def test_master_evaluates_steps_and_stores_results(self):
+        cfg, metrics_store = create_metrics_store()
+        search_task = self.search_task(**{"initial-throughput": 100, "throughput-step": 50, "max-latency": 20, "max-steps": 2})
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search_task])
+        d = driver.Driver()
+        d.config = cfg
+        d.track = track.Track(name="unittest", short_description="unittest track", challenges=[challenge])
+        d.challenge = challenge
+        d.metrics_store = metrics_store
+        d.schedule, d.throughput_searches = driver.expand_throughput_searches(challenge.schedule)
+        first_step = d.schedule[0]
+        d.search_targets[first_step] = 100
+
+        chunk = driver.SampleChunk(0, first_step, capacity=20)
+        for i in range(20):
+            chunk.append(1470838595 + i * 0.1, i * 0.1, metrics.SampleType.Normal, {"success": True}, 10, 8, 10, "ops", 0.1, (i + 1) / 20)
+        d.update_samples(driver.UpdateSamples(0, [chunk]))
+        d.evaluate_throughput_searches([first_step])
+
+        step = d.throughput_searches[first_step].steps[0]
+        self.assertEqual(100, step["target_throughput"])
+        self.assertAlmostEqual(10.0, step["latency"], delta=0.1)
+        self.assertEqual(0.0, step["error_rate"])
+        self.assertTrue(step["slo_met"])
+
+        d.post_process_samples()
+        self.assertEqual(step["throughput"], metrics_store.get_one("max_sustainable_throughput", operation="search"))
+        self.assertEqual(1, len(metrics_store.get("throughput_search_latency", operation="search")))
+
+    def test_rejects_search_in_parallel_task(self):
+        parallel = track.Parallel([self.search_task(**{"initial-throughput": 100, "throughput-step": 50, "max-latency": 20})])
+        with self.assertRaises(exceptions.SystemSetupError):
+            driver.expand_throughput_searches([parallel])
+
+
 class IndexManagementTests(TestCase):
     @mock.patch("elasticsearch.Elasticsearch")
     def test_setup_auto_managed_index(self, es):
@@ -271,6 +478,261 @@ class MetricsAggregationTests(TestCase):
         # self.assertEqual((1470838600.5, 26.5, metrics.SampleType.Normal, 10000), throughput[6])
 
 
+class ThroughputCalculationTests(TestCase):
+    def random_samples(self, task):
+        import random
+        samples = driver.ThroughputSamples(task)
+        start = 1470838595
+        for client_id in range(4):
+            t = start + random.random()
+            for i in range(2000):
+                t += random.random() / 100
+                sample_type = metrics.SampleType.Warmup if i < 500 else metrics.SampleType.Normal
+                samples.add(driver.Sample(client_id, t, t - start, task, sample_type, None, -1, -1, random.randint(0, 5000), "docs",
+                                          t - start, i / 2000))
+        return samples
+
+    def test_vectorized_and_iterative_calculation_are_identical(self):
+        if not driver.numpy_available:
+            self.skipTest("NumPy is not installed")
+        task = track.Task(track.Operation("index", track.OperationType.Index))
+        samples = self.random_samples(task)
+
+        expected = driver._iterative_task_throughput(samples, bucket_interval_secs=1)
+        actual = driver._vectorized_task_throughput(samples, bucket_interval_secs=1)
+
+        self.assertTrue(len(expected) > 10)
+        self.assertEqual(expected, actual)
+
+    def test_calculates_throughput_without_numpy(self):
+        op = track.Operation("index", track.OperationType.Index)
+        samples = [
+            driver.Sample(0, 1470838595, 21, op, metrics.SampleType.Warmup, None, -1, -1, 3000, "docs", 1, 1),
+            driver.Sample(0, 1470838595.5, 21.5, op, metrics.SampleType.Normal, None, -1, -1, 2500, "docs", 1, 1),
+        ]
+        with mock.patch("esrally.driver.driver.numpy_available", False):
+            aggregated = driver.calculate_global_throughput(samples)
+
+        self.assertEqual([(1470838595, 21, metrics.SampleType.Warmup, 3000, "docs/s"),
+                          (1470838595.5, 21.5, metrics.SampleType.Normal, 3666.6666666666665, "docs/s")], aggregated[op])
+
+
+class IncrementalAggregationTests(TestCase):
+    def setUp(self):
+        cfg, self.metrics_store = create_metrics_store()
+        self.task = track.Task(track.Operation("index", track.OperationType.Index, meta_data={"source": "op"}))
+        self.challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[self.task])
+        self.driver = driver.Driver()
+        self.driver.config = cfg
+        self.driver.track = track.Track(name="unittest", short_description="unittest track", challenges=[self.challenge])
+        self.driver.challenge = self.challenge
+        self.driver.metrics_store = self.metrics_store
+
+    def chunk(self, client_id, start):
+        chunk = driver.SampleChunk(client_id, self.task, capacity=3)
+        for i in range(3):
+            chunk.append(start + i, i, metrics.SampleType.Normal, {"success": i != 1, "bulk-size": 500}, 10, 8, 500, "docs", i + 1,
+                         (i + 1) / 3)
+        return chunk
+
+    def test_stores_server_time_if_available(self):
+        chunk = driver.SampleChunk(0, self.task, capacity=2)
+        chunk.append(1470838595, 0, metrics.SampleType.Normal, {"success": True, "took": 6}, 10, 8, 500, "docs", 1, 0.5)
+        chunk.append(1470838596, 1, metrics.SampleType.Normal, {"success": True}, 10, 8, 500, "docs", 2, 1.0)
+
+        self.driver.update_samples(driver.UpdateSamples(0, [chunk]))
+
+        self.assertEqual([6], self.metrics_store.get("server_time", operation="index"))
+        self.assertEqual(2, len(self.metrics_store.get("service_time", operation="index")))
+
+    def test_aggregates_samples_when_they_arrive(self):
+        self.driver.update_samples(driver.UpdateSamples(0, [self.chunk(client_id=0, start=1470838595)]))
+        self.driver.update_samples(driver.UpdateSamples(1, [self.chunk(client_id=1, start=1470838595.5)]))
+
+        # latency and service time are not aggregated but stored per request immediately
+        self.assertEqual(6, len(self.metrics_store.get("latency", operation="index")))
+        self.assertEqual(6, len(self.metrics_store.get("service_time", operation="index")))
+        self.assertEqual([], self.metrics_store.get("throughput", operation="index"))
+        self.assertEqual(1 / 3, self.metrics_store.get_error_rate(operation="index"))
+        self.assertEqual({(self.task, metrics.SampleType.Normal): 2}, self.driver.error_counts)
+        self.assertEqual(6, len(self.driver.throughput_samples[self.task]))
+        # raw samples are not kept by default
+        self.assertEqual([], self.driver.raw_samples)
+        self.assertEqual(1.0, self.driver.most_recent_sample_per_client[1].percent_completed)
+
+        self.driver.post_process_samples()
+
+        throughput = self.metrics_store.get("throughput", operation="index")
+        self.assertTrue(len(throughput) > 0)
+        self.assertEqual("docs/s", self.metrics_store.get_unit("throughput", operation="index"))
+        doc = self.metrics_store.docs[0]
+        self.assertEqual({"source": "op", "success": True, "bulk-size": 500}, doc["meta"])
+
+    def test_stores_counters(self):
+        self.driver.update_samples(driver.UpdateSamples(0, [], counters=[
+            (self.task, "dropped_requests", None, metrics.SampleType.Normal, 3),
+            (self.task, "param_source_stall_time", "ms", metrics.SampleType.Normal, 1.5)
+        ]))
+        self.driver.update_samples(driver.UpdateSamples(1, [], counters=[
+            (self.task, "dropped_requests", None, metrics.SampleType.Normal, 2)
+        ]))
+
+        self.driver.post_process_samples()
+
+        self.assertEqual(5, self.metrics_store.get_one("dropped_requests", operation="index", sample_type=metrics.SampleType.Normal))
+        self.assertEqual(1.5, self.metrics_store.get_one("param_source_stall_time", operation="index"))
+        self.assertEqual("ms", self.metrics_store.get_unit("param_source_stall_time", operation="index"))
+
+    def test_stores_rejection_rate(self):
+        self.driver.update_samples(driver.UpdateSamples(0, [], counters=[
+            (self.task, "bulk_items", None, metrics.SampleType.Normal, 400),
+            (self.task, "rejected_items", "docs", metrics.SampleType.Normal, 10),
+            (self.task, "bulk_retries", None, metrics.SampleType.Normal, 3)
+        ]))
+
+        self.driver.post_process_samples()
+
+        self.assertEqual(0.025, self.metrics_store.get_one("rejection_rate", operation="index"))
+        self.assertEqual(10, self.metrics_store.get_one("rejected_items", operation="index"))
+        self.assertEqual(3, self.metrics_store.get_one("bulk_retries", operation="index"))
+        self.assertIsNone(self.metrics_store.get_one("bulk_items", operation="index"))
+
+    def test_merges_sampled_stacks(self):
+        self.driver.update_samples(driver.UpdateSamples(0, [], stacks=[("index", "main;run", 3), ("index", "main;wait", 1)]))
+        self.driver.update_samples(driver.UpdateSamples(1, [], stacks=[("index", "main;run", 2)]))
+
+        self.assertEqual({"main;run": 5, "main;wait": 1}, dict(self.driver.stacks["index"]))
+
+    def test_stores_mean_driver_overhead_per_request(self):
+        self.driver.update_samples(driver.UpdateSamples(0, [], counters=[
+            (self.task, "driver_overhead_requests", None, metrics.SampleType.Normal, 4),
+            (self.task, "driver_overhead_sampling", "ns", metrics.SampleType.Normal, 6000000)
+        ]))
+
+        self.driver.post_process_samples()
+
+        self.assertEqual(1.5, self.metrics_store.get_one("driver_overhead_sampling", operation="index"))
+        self.assertEqual("ms", self.metrics_store.get_unit("driver_overhead_sampling", operation="index"))
+        self.assertIsNone(self.metrics_store.get_one("driver_overhead_requests", operation="index"))
+
+
+class ClockSynchronizationTests(TestCase):
+    def test_estimates_offset_based_on_smallest_round_trip_time(self):
+        estimator = driver.ClockOffsetEstimator()
+        # the answer has been delayed on the way back
+        estimator.add(master_sent=100.0, load_generator_timestamp=150.001, master_received=100.010)
+        estimator.add(master_sent=100.020, load_generator_timestamp=150.021, master_received=100.022)
+        estimator.add(master_sent=100.030, load_generator_timestamp=150.031, master_received=100.040)
+
+        self.assertEqual(3, len(estimator))
+        self.assertAlmostEqual(0.002, estimator.round_trip_time)
+        self.assertAlmostEqual(50.0, estimator.offset)
+
+    def test_starts_next_task_after_all_load_generators_have_answered(self):
+        cfg, metrics_store = create_metrics_store()
+        cfg.add(config.Scope.application, "track", "test.mode.enabled", False)
+        cfg.add(config.Scope.application, "driver", "task.start.delay", 0.25)
+
+        d = driver.Driver()
+        d.config = cfg
+        d.metrics_store = metrics_store
+        d.drivers = ["load-generator-0", "load-generator-1"]
+        d.clock_offsets = {0: driver.ClockOffsetEstimator(), 1: driver.ClockOffsetEstimator()}
+        d.send = mock.Mock()
+
+        for _ in range(driver.Driver.CLOCK_SYNC_PINGS):
+            pong = driver.Pong(0, master_timestamp=time.perf_counter())
+            pong.load_generator_timestamp += 10
+            d.pong_received(pong)
+        # we're still waiting for the second load generator
+        self.assertFalse(any([isinstance(c[0][1], driver.Drive) for c in d.send.call_args_list]))
+
+        for _ in range(driver.Driver.CLOCK_SYNC_PINGS):
+            d.pong_received(driver.Pong(1, master_timestamp=time.perf_counter()))
+
+        drives = [(c[0][0], c[0][1]) for c in d.send.call_args_list if isinstance(c[0][1], driver.Drive)]
+        self.assertEqual(["load-generator-0", "load-generator-1"], [target for target, _ in drives])
+        # the clock of the first load generator is roughly ten seconds ahead
+        self.assertAlmostEqual(10.0, drives[0][1].client_start_timestamp - drives[1][1].client_start_timestamp, delta=1.0)
+        self.assertEqual(2, len(metrics_store.get("load_generator_clock_offset")))
+
+
+class MetricsStreamerTests(TestCase):
+    class ManualClock:
+        def __init__(self):
+            self.now = 0
+
+        def __call__(self):
+            return self.now
+
+    def setUp(self):
+        _, self.source = create_metrics_store()
+        self.target = mock.create_autospec(metrics.EsMetricsStore)
+        self.clock = MetricsStreamerTests.ManualClock()
+        self.streamer = driver.MetricsStreamer(self.source, self.target, flush_interval=10, clock=self.clock)
+
+    def test_transfers_documents_after_flush_interval(self):
+        self.source.put_value_cluster_level("latency", 10, "ms")
+        self.clock.now = 5
+        self.streamer.maybe_flush()
+        self.assertEqual(1, len(self.source.docs))
+
+        self.clock.now = 10
+        self.streamer.maybe_flush()
+        # transferred documents are removed from the in-memory metrics store
+        self.assertEqual(0, len(self.source.docs))
+
+        self.source.put_value_cluster_level("latency", 20, "ms")
+        self.streamer.close()
+
+        self.assertEqual(2, self.target.add_docs.call_count)
+        self.assertEqual(2, self.target.flush.call_count)
+        self.assertEqual([10], [d["value"] for d in self.target.add_docs.call_args_list[0][0][0]])
+        self.assertEqual([20], [d["value"] for d in self.target.add_docs.call_args_list[1][0][0]])
+
+    def test_skips_empty_batches(self):
+        self.streamer.flush()
+        self.streamer.close()
+
+        self.target.add_docs.assert_not_called()
+
+    def test_surfaces_errors_of_metrics_store(self):
+        self.target.flush.side_effect = exceptions.RallyError("metrics store is unavailable")
+        self.source.put_value_cluster_level("latency", 10, "ms")
+
+        with self.assertRaises(exceptions.RallyError):
+            self.streamer.close()
+
+
+class RampUpTests(TestCase):
+    def task(self, **params):
+        return track.Task(track.Operation("search", track.OperationType.Search.name), clients=4, params=params)
+
+    def test_no_delay_without_ramp_up(self):
+        self.assertEqual(0, driver.ramp_up_delay(self.task(), client_id=3))
+
+    def test_linear_ramp_up(self):
+        task = self.task(**{"ramp-up-time-period": 8})
+        self.assertEqual([0, 2, 4, 6], [driver.ramp_up_delay(task, client_id) for client_id in range(4)])
+
+    def test_quadratic_ramp_up(self):
+        task = self.task(**{"ramp-up-time-period": 16, "ramp-up-curve": "quadratic"})
+        self.assertEqual([0, 1, 4, 9], [driver.ramp_up_delay(task, client_id) for client_id in range(4)])
+
+    def test_rejects_unknown_curve(self):
+        with self.assertRaises(exceptions.SystemSetupError):
+            driver.ramp_up_delay(self.task(**{"ramp-up-time-period": 10, "ramp-up-curve": "cubic"}), client_id=1)
+
+    def test_marks_samples_during_ramp_up_as_warmup(self):
+        schedule = [(0, metrics.SampleType.Normal, 0.5, None, None), (0, metrics.SampleType.Normal, 1.0, None, None)]
+
+        ramped_up = list(driver.with_ramp_up(schedule, ramp_up_end=time.perf_counter() + 60))
+        self.assertEqual([metrics.SampleType.Warmup, metrics.SampleType.Warmup], [sample_type for _, sample_type, _, _, _ in ramped_up])
+
+        finished = list(driver.with_ramp_up(schedule, ramp_up_end=time.perf_counter()))
+        self.assertEqual([metrics.SampleType.Normal, metrics.SampleType.Normal], [sample_type for _, sample_type, _, _, _ in finished])
+
+
 class SchedulerTests(ScheduleTestCase):
     def setUp(self):
         params.register_param_source_for_name("driver-test-param-source", DriverTestParamSource)
@@ -357,6 +819,352 @@ class SchedulerTests(ScheduleTestCase):
             self.assertEqual({"body": ["a"], "size": 11}, params)
 
 
+class PrefetchingParamSourceTests(TestCase):
+    class CountingParamSource:
+        def __init__(self, size, delay=0):
+            self.current = 0
+            self._size = size
+            self.delay = delay
+
+        def size(self):
+            return self._size
+
+        def params(self):
+            if self.current == self._size:
+                raise StopIteration()
+            time.sleep(self.delay)
+            self.current += 1
+            return {"id": self.current}
+
+    def test_prefetches_params_in_order(self):
+        stalls = []
+        source = driver.PrefetchingParamSource(PrefetchingParamSourceTests.CountingParamSource(size=20), queue_size=5,
+                                               on_stall=stalls.append)
+        self.assertEqual(20, source.size())
+        # give the producer time to fill the queue
+        time.sleep(0.1)
+        self.assertEqual(5, source.queue.qsize())
+
+        self.assertEqual([{"id": i} for i in range(1, 21)], [source.params() for _ in range(20)])
+        with self.assertRaises(StopIteration):
+            source.params()
+        # the source stays exhausted
+        with self.assertRaises(StopIteration):
+            source.params()
+        source.close()
+
+    def test_reports_stalls(self):
+        stalls = []
+        source = driver.PrefetchingParamSource(PrefetchingParamSourceTests.CountingParamSource(size=3, delay=0.05), queue_size=1,
+                                               on_stall=stalls.append)
+        for _ in range(3):
+            source.params()
+        source.close()
+
+        # waiting for the first parameters is expected and not reported
+        self.assertEqual(2, len(stalls))
+        for stall_time_ms in stalls:
+            self.assertTrue(stall_time_ms > 0)
+
+    def test_propagates_errors(self):
+        class FailingParamSource:
+            def params(self):
+                raise exceptions.DataError("corrupt data file")
+
+        source = driver.PrefetchingParamSource(FailingParamSource(), queue_size=10)
+        with self.assertRaisesRegex(exceptions.DataError, "corrupt data file"):
+            source.params()
+        source.close()
+
+    def test_schedule_with_prefetched_params(self):
+        params.register_param_source_for_name("driver-test-param-source", DriverTestParamSource)
+        test_track = track.Track(name="unittest", short_description="unittest track", source_root_url="http://example.org",
+                                 indices=None, challenges=None)
+        task = track.Task(track.Operation("search", track.OperationType.Search.name, params={"size": 3},
+                                          param_source="driver-test-param-source"), warmup_iterations=1, iterations=2, clients=1)
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+
+        schedule = list(driver.schedule_for(test_track, task, 0, prefetch_size=10, on_stall=sampler.add_param_source_stall))
+
+        self.assertEqual([metrics.SampleType.Warmup, metrics.SampleType.Normal, metrics.SampleType.Normal],
+                         [sample_type for _, sample_type, _, _, _ in schedule])
+        self.assertEqual([{"size": 3}] * 3, [p for _, _, _, _, p in schedule])
+
+
+class PreparedBodyParamSourceTests(TestCase):
+    def test_serializes_current_body(self):
+        class StaticParamSource:
+            def __init__(self):
+                self.static_params = {"index": "test", "body": {"query": {"match_all": {}}}}
+
+            def params(self):
+                return self.static_params
+
+        delegate = StaticParamSource()
+        source = driver.PreparedBodyParamSource(delegate)
+        self.assertEqual({"index": "test", "body": b'{"query": {"match_all": {}}}'}, source.params())
+        # parameter sources may modify their parameters in place
+        delegate.static_params["body"] = {"query": {"term": {"field": "value"}}}
+        self.assertEqual({"index": "test", "body": b'{"query": {"term": {"field": "value"}}}'}, source.params())
+
+    def test_compresses_alternating_bodies_once(self):
+        import gzip
+
+        class AlternatingParamSource:
+            def __init__(self):
+                self.static_params = [{"body": {"query": {"match_all": {}}}}, {"body": {"query": {"term": {"field": "value"}}}}]
+                self.calls = 0
+
+            def params(self):
+                params = self.static_params[self.calls % 2]
+                self.calls += 1
+                return params
+
+        source = driver.PreparedBodyParamSource(AlternatingParamSource(), compression_level=1)
+        first = source.params()["body"]
+        second = source.params()["body"]
+        self.assertEqual(b'{"query": {"match_all": {}}}', gzip.decompress(first))
+        self.assertEqual(b'{"query": {"term": {"field": "value"}}}', gzip.decompress(second))
+        self.assertIs(first, source.params()["body"])
+        self.assertIs(second, source.params()["body"])
+        self.assertEqual(2, len(source.cache))
+
+    def test_compresses_bodies(self):
+        import gzip
+        from esrally import client
+        op = track.Operation("index", track.OperationType.Index.name, params={"pre-compress": 1})
+        bulks = iter([{"body": ["{\"index\": {}}", "{\"field\": 1}"]}, {"body": ["{\"index\": {}}", "{\"field\": 2}"]}])
+
+        class BulkParamSource:
+            def params(self):
+                return next(bulks)
+
+        source = driver.PreparedBodyParamSource.for_operation(op, BulkParamSource())
+        for value in [1, 2]:
+            body = source.params()["body"]
+            self.assertIsInstance(body, client.CompressedBody)
+            self.assertEqual(("{\"index\": {}}\n{\"field\": %d}\n" % value).encode("utf-8"), gzip.decompress(body))
+        # bulk bodies are not cached
+        self.assertEqual(0, len(source.cache))
+
+    def test_rejects_invalid_compression_level(self):
+        op = track.Operation("index", track.OperationType.Index.name, params={"pre-compress": 10})
+        with self.assertRaisesRegex(exceptions.SystemSetupError, "compression level between 1 and 9"):
+            driver.PreparedBodyParamSource.for_operation(op, None)
+
+
+class SteadyStateTests(TestCase):
+    def setUp(self):
+        self.task = track.Task(track.Operation("search", track.OperationType.Search), warmup_time_period=None, time_period=20,
+                               params={"steady-state": {"window": 5, "max-cv": 0.05, "max-warmup-time-period": 30}})
+
+    def chunk(self, latencies, start=0):
+        # one sample per second
+        chunk = driver.SampleChunk(0, self.task, capacity=len(latencies))
+        for i, latency in enumerate(latencies):
+            t = start + i + 0.5
+            chunk.append(100 + t, t, metrics.SampleType.Normal, {"success": True}, latency, latency, 1, "ops", t, 0.0)
+        return chunk
+
+    def test_detects_steady_state(self):
+        detector = driver.SteadyStateDetector.from_task(self.task)
+        self.assertEqual(5, detector.window)
+        # latency decreases until the benchmark candidate has warmed up
+        self.assertEqual([], detector.add(self.chunk([100, 80, 60, 40, 20, 10, 10, 10, 10])))
+        self.assertIsNone(detector.steady_state_time)
+
+        chunks = detector.add(self.chunk([10, 10], start=9))
+
+        self.assertEqual(2, len(chunks))
+        self.assertTrue(detector.steady_state_reached)
+        self.assertEqual(10, detector.warmup_time_period)
+        samples = [sample for chunk in chunks for sample in chunk]
+        self.assertEqual([metrics.SampleType.Warmup] * 10 + [metrics.SampleType.Normal], [sample.sample_type for sample in samples])
+        self.assertFalse(detector.measurement_finished)
+
+        # samples are not held back anymore
+        # the sample at 30.5 seconds is after the end of the measurement period
+        chunks = detector.add(self.chunk([10] * 20, start=11))
+        self.assertEqual([metrics.SampleType.Normal] * 19, [sample.sample_type for sample in chunks[0]])
+        self.assertEqual(29.5, chunks[0][-1].relative_time)
+        self.assertTrue(detector.measurement_finished)
+
+        # late samples are dropped entirely
+        self.assertEqual([], detector.add(self.chunk([10, 10], start=31)))
+
+    def test_starts_measurement_after_max_warmup_time_period(self):
+        detector = driver.SteadyStateDetector.from_task(self.task)
+
+        chunks = detector.add(self.chunk([10, 50] * 16))
+
+        self.assertFalse(detector.steady_state_reached)
+        self.assertEqual(30, detector.warmup_time_period)
+        samples = [sample for chunk in chunks for sample in chunk]
+        self.assertEqual([metrics.SampleType.Warmup] * 30 + [metrics.SampleType.Normal] * 2, [sample.sample_type for sample in samples])
+
+    def test_considers_all_samples_warmup_if_task_finishes_early(self):
+        detector = driver.SteadyStateDetector.from_task(self.task)
+        self.assertEqual([], detector.add(self.chunk([100, 10, 50])))
+
+        chunks = detector.finish()
+
+        self.assertFalse(detector.steady_state_reached)
+        self.assertEqual([metrics.SampleType.Warmup] * 3, [sample.sample_type for sample in chunks[0]])
+
+    def test_requires_time_period(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search), iterations=100, params={"steady-state": {}})
+        with self.assertRaisesRegex(exceptions.SystemSetupError, "needs to define a time period"):
+            driver.SteadyStateDetector.from_task(task)
+
+    def test_stops_schedule_when_completed(self):
+        completed = threading.Event()
+        schedule = driver.until_completed(iter(range(10)), completed)
+
+        self.assertEqual([0, 1], [next(schedule), next(schedule)])
+        completed.set()
+        self.assertEqual([], list(schedule))
+
+
+class StackSamplerTests(TestCase):
+    def test_samples_only_registered_threads(self):
+        registered = threading.Event()
+        done = threading.Event()
+
+        def busy_client():
+            stack_sampler.register(threading.get_ident(), "index-append")
+            registered.set()
+            done.wait()
+
+        stack_sampler = driver.StackSampler()
+        t = threading.Thread(target=busy_client)
+        t.start()
+        registered.wait()
+        stack_sampler.sample()
+        stack_sampler.sample()
+        done.set()
+        t.join()
+
+        stacks = stack_sampler.stacks
+        self.assertEqual(1, len(stacks))
+        label, stack, count = stacks[0]
+        self.assertEqual("index-append", label)
+        self.assertEqual(2, count)
+        frames = stack.split(";")
+        # the outermost frame comes first
+        self.assertTrue(frames[0].startswith("_bootstrap "), msg=frames[0])
+        self.assertIn("busy_client (%s:" % __file__, stack)
+        # all samples have been retrieved
+        self.assertEqual([], stack_sampler.stacks)
+
+    def test_merges_samples_of_all_threads_with_the_same_label(self):
+        stack_sampler = driver.StackSampler(interval=0.001)
+        stack_sampler.register(threading.get_ident(), "search")
+        stack_sampler.start()
+        time.sleep(0.1)
+        stack_sampler.stop()
+        stack_sampler.unregister(threading.get_ident())
+
+        stacks = stack_sampler.stacks
+        self.assertTrue(len(stacks) > 0)
+        self.assertEqual({"search"}, {label for label, _, _ in stacks})
+        self.assertTrue(sum([count for _, _, count in stacks]) > 10)
+
+
+class SamplerTests(TestCase):
+    def test_does_not_drop_samples_if_chunk_is_full(self):
+        task = track.Task(track.Operation("index", track.OperationType.Index))
+        sampler = driver.Sampler(client_id=3, task=task, start_timestamp=0, chunk_size=4)
+
+        for i in range(10):
+            sampler.add(metrics.SampleType.Normal, {"success": i % 2 == 0}, i * 2, i, 5000, "docs", i, (i + 1) / 10)
+
+        chunks = sampler.chunks
+        self.assertEqual([4, 4, 2], [len(chunk) for chunk in chunks])
+        samples = [sample for chunk in chunks for sample in chunk]
+        self.assertEqual(10, len(samples))
+        self.assertEqual(list(range(10)), [s.service_time_ms for s in samples])
+        self.assertEqual([i * 2 for i in range(10)], [s.latency_ms for s in samples])
+        self.assertEqual([i % 2 == 0 for i in range(10)], [s.success for s in samples])
+        self.assertEqual(3, samples[-1].client_id)
+        self.assertEqual(task, samples[-1].task)
+        self.assertEqual(metrics.SampleType.Normal, samples[-1].sample_type)
+        self.assertEqual(5000, samples[-1].total_ops)
+        self.assertEqual("docs", samples[-1].total_ops_unit)
+        self.assertEqual({"success": False}, samples[-1].request_meta_data)
+        self.assertEqual(1.0, chunks[-1][-1].percent_completed)
+        # all chunks have been retrieved
+        self.assertEqual(0, len(sampler.chunks))
+
+    def test_counts_rejected_bulk_items(self):
+        task = track.Task(track.Operation("index", track.OperationType.Index))
+        sampler = driver.Sampler(client_id=0, task=task, start_timestamp=0)
+
+        sampler.add(metrics.SampleType.Normal, {"success": True, "bulk-size": 100, "rejected-count": 5, "retries": 2, "retry-time": 30},
+                    50, 45, 100, "docs", 1, 0.5)
+        sampler.add(metrics.SampleType.Normal, {"success": True, "bulk-size": 100, "rejected-count": 0, "retries": 0, "retry-time": 0},
+                    10, 8, 100, "docs", 2, 1.0)
+        # requests without a retry policy are not counted
+        sampler.add(metrics.SampleType.Normal, {"success": True, "bulk-size": 100}, 10, 8, 100, "docs", 3, 1.0)
+
+        self.assertEqual({
+            ("bulk_items", None, metrics.SampleType.Normal): 200,
+            ("rejected_items", "docs", metrics.SampleType.Normal): 5,
+            ("bulk_retries", None, metrics.SampleType.Normal): 2,
+            ("bulk_retry_time", "ms", metrics.SampleType.Normal): 30
+        }, sampler.counters)
+
+    def test_transfers_only_used_part_of_chunk(self):
+        import pickle
+
+        task = track.Task(track.Operation("index", track.OperationType.Index))
+        chunk = driver.SampleChunk(client_id=0, task=task, capacity=1000)
+        chunk.append(10.0, 1.0, metrics.SampleType.Warmup, {"success": True}, 5.0, 4.0, 1, "docs", 1.0, 0.5)
+
+        restored = pickle.loads(pickle.dumps(chunk))
+
+        self.assertEqual(1, len(restored))
+        self.assertEqual(1, len(restored.latency_ms))
+        self.assertEqual(metrics.SampleType.Warmup, restored[0].sample_type)
+        self.assertEqual(5.0, restored[0].latency_ms)
+        with self.assertRaises(IndexError):
+            restored[1]
+
+
+class HistogramSamplerTests(TestCase):
+    def test_records_histograms_and_aggregated_throughput(self):
+        task = track.Task(track.Operation("search", track.OperationType.Search))
+        sampler = driver.HistogramSampler(client_id=1, task=task, start_timestamp=0)
+
+        sampler.add(metrics.SampleType.Warmup, {"success": True}, 20, 10, 1, "ops", 0.1, 0.1)
+        for i in range(1, 5):
+            sampler.add(metrics.SampleType.Normal, {"success": i != 2, "took": i}, 10 + i, i, 1, "ops", 0.1 + i / 10, 0.1 + i / 5)
+
+        samples = sampler.samples
+        # all requests have been issued within the same second
+        self.assertEqual(2, len(samples))
+        self.assertEqual(metrics.SampleType.Warmup, samples[0].sample_type)
+        self.assertEqual(1, samples[0].total_ops)
+        self.assertEqual(metrics.SampleType.Normal, samples[1].sample_type)
+        self.assertEqual(4, samples[1].total_ops)
+        self.assertAlmostEqual(0.5, samples[1].time_period)
+        self.assertAlmostEqual(0.9, samples[1].percent_completed)
+        self.assertIsNone(samples[1].latency_ms)
+
+        histograms = {h.sample_type: h for h in sampler.histograms}
+        self.assertEqual(1, histograms[metrics.SampleType.Warmup].latency.count)
+        normal = histograms[metrics.SampleType.Normal]
+        self.assertEqual(task, normal.task)
+        self.assertEqual(4, normal.service_time.count)
+        self.assertEqual(14, normal.latency.max)
+        self.assertEqual(4, normal.server_time.max)
+        self.assertEqual(0, histograms[metrics.SampleType.Warmup].server_time.count)
+        self.assertEqual(1, normal.error_count)
+
+        # everything has been retrieved
+        self.assertEqual(0, len(sampler.samples))
+        self.assertEqual(0, len(sampler.histograms))
+
+
 class ExecutorTests(TestCase):
     class NoopContextManager:
         def __init__(self, mock):
@@ -457,6 +1265,71 @@ class ExecutorTests(TestCase):
             upper_bound = bounds[1]
             self.assertTrue(lower_bound <= sample_size <= upper_bound,
                             msg="Expected sample size to be between %d and %d but was %d" % (lower_bound, upper_bound, sample_size))
+            # the first request is sent immediately, all others according to the schedule
+            self.assertIsNone(samples[0].schedule_lag_ms)
+            for sample in samples[1:]:
+                self.assertTrue(0 <= sample.schedule_lag_ms < 50, msg="Unexpected schedule lag [%s] ms" % sample.schedule_lag_ms)
+
+    def test_execute_schedule_records_driver_overhead(self):
+        class Serializer:
+            def dumps(self, data):
+                return "serialized"
+
+            def loads(self, s, mimetype=None):
+                return {"deserialized": s}
+
+        es = mock.Mock()
+        es.transport.serializer = Serializer()
+        es.transport.deserializer = Serializer()
+
+        def run(es, params):
+            es.transport.serializer.dumps({})
+            es.transport.deserializer.loads("{}", "application/json")
+            return {"weight": 5, "unit": "docs"}
+
+        runner = self.context_managed(run)
+        schedule = [(0, metrics.SampleType.Normal, (i + 1) / 3, runner, {}) for i in range(3)]
+        sampler = driver.Sampler(client_id=0, task=None, start_timestamp=0)
+        overhead = driver.DriverOverhead(sampler)
+
+        overhead.instrument(es)
+        driver.execute_schedule(threading.Event(), 0, "operation_name", overhead.timed(schedule), es, sampler, overhead=overhead)
+        overhead.uninstrument(es)
+
+        self.assertIsInstance(es.transport.serializer, Serializer)
+        self.assertEqual(3, len(sampler.samples))
+        counters = sampler.counters
+        self.assertEqual(3, counters[("driver_overhead_requests", None, metrics.SampleType.Normal)])
+        for phase in ["params", "serialization", "deserialization", "normalization", "sampling"]:
+            self.assertGreaterEqual(counters[("driver_overhead_%s" % phase, "ns", metrics.SampleType.Normal)], 0)
+
+    def test_wait_until_sleeps_and_spins(self):
+        class FakeClock:
+            def __init__(self):
+                self.now = 10.0
+                self.sleeps = []
+
+            def clock(self):
+                return self.now
+
+            def sleep(self, seconds):
+                self.sleeps.append(seconds)
+                # simulate that the OS does not wake us up exactly in time
+                self.now += seconds + 0.0005 if seconds > 0 else 0.0004
+
+        c = FakeClock()
+        driver.wait_until(10.1, sleep=c.sleep, clock=c.clock)
+
+        self.assertTrue(c.now >= 10.1)
+        self.assertAlmostEqual(0.1 - driver.PACING_SPIN_SECONDS, c.sleeps[0])
+        # the rest is spent spinning
+        self.assertTrue(all(s == 0 for s in c.sleeps[1:]))
+        self.assertTrue(len(c.sleeps) > 1)
+
+    def test_wait_until_does_not_wait_for_past_deadline(self):
+        sleep = mock.Mock()
+        driver.wait_until(1.0, sleep=sleep, clock=lambda: 2.0)
+        sleep.assert_not_called()
 
     @mock.patch("elasticsearch.Elasticsearch")
     def test_cancel_execute_schedule(self, es):
@@ -492,6 +1365,29 @@ class ExecutorTests(TestCase):
             sample_size = len(samples)
             self.assertEqual(0, sample_size)
 
+    def test_execute_schedule_with_open_load_model(self):
+        def run(*args, **kwargs):
+            time.sleep(0.05)
+            return 1, "ops"
+
+        runner = self.context_managed(run)
+        # one request every 10ms but each request takes 50ms
+        schedule = [(i * 0.01, metrics.SampleType.Normal, (i + 1) / 20, runner, None) for i in range(20)]
+        sampler = driver.Sampler(client_id=0, task=None, start_timestamp=0)
+        driver.execute_schedule(threading.Event(), 0, "operation_name", schedule, None, sampler, max_in_flight=2)
+
+        samples = sampler.samples
+        dropped = sampler.counters.get(("dropped_requests", None, metrics.SampleType.Normal), 0)
+        self.assertEqual(20, len(samples) + dropped)
+        self.assertTrue(dropped > 0)
+        # more requests have been issued than a single client could have done in a closed loop
+        self.assertTrue(len(samples) > 5, msg="Expected more than 5 samples but got %d" % len(samples))
+        for sample in samples:
+            # latency is measured from the scheduled arrival time
+            self.assertTrue(sample.latency_ms >= sample.service_time_ms)
+        # counters are reset after they have been retrieved
+        self.assertEqual({}, sampler.counters)
+
     @mock.patch("elasticsearch.Elasticsearch")
     def test_execute_schedule_aborts_on_error(self, es):
         class ExpectedUnitTestException(Exception):
@@ -173,6 +173,152 @@ class BulkIndexRunnerTests(TestCase):
 
         es.bulk.assert_called_with(body=bulk_params["body"], params={})
 
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_with_raw_response(self, es):
+        es.bulk.return_value = '{"took":30,"errors":false,"items":[{"index":{"status":201}},{"index":{"status":201}}]}'
+        bulk = runner.BulkIndex()
+
+        result = bulk(es, {
+            "body": ["action_meta_data", "index_line", "action_meta_data", "index_line"],
+            "action_metadata_present": True,
+            "bulk-size": 2,
+            "index": "test"
+        })
+
+        self.assertEqual(True, result["success"])
+        self.assertEqual(2, result["success-count"])
+        self.assertEqual(0, result["error-count"])
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_error_with_raw_response(self, es):
+        es.bulk.return_value = '{"took":30,"errors":true,"items":[{"index":{"status":201,"_shards":{"total":2,"successful":1,' \
+                               '"failed":0}}},{"index":{"status":500,"_shards":{"total":2,"successful":0,"failed":2}}}]}'
+        bulk = runner.BulkIndex()
+
+        result = bulk(es, {
+            "body": ["action_meta_data", "index_line", "action_meta_data", "index_line"],
+            "action_metadata_present": True,
+            "bulk-size": 2,
+            "index": "test"
+        })
+
+        self.assertEqual(False, result["success"])
+        self.assertEqual(1, result["success-count"])
+        self.assertEqual(1, result["error-count"])
+
+    @mock.patch("time.sleep")
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_retries_rejected_items(self, es, sleep):
+        es.bulk.side_effect = [
+            '{"took":30,"errors":true,"items":[{"index":{"status":201,"_shards":{"total":2,"successful":1,"failed":0}}},'
+            '{"index":{"status":429}},{"delete":{"status":429}}]}',
+            {
+                "took": 10,
+                "errors": True,
+                "items": [
+                    {"index": {"status": 201, "_shards": {"total": 2, "successful": 1, "failed": 0}}},
+                    {"delete": {"status": 429}}
+                ]
+            },
+            {
+                "took": 5,
+                "errors": False,
+                "items": [
+                    {"delete": {"status": 200, "_shards": {"total": 2, "successful": 1, "failed": 0}}}
+                ]
+            }
+        ]
+        bulk = runner.BulkIndex()
+
+        result = bulk(es, {
+            "body": b'{"index":{}}\n{"f":1}\n{"index":{}}\n{"f":2}\n{"delete":{"_id":"3"}}\n',
+            "action_metadata_present": True,
+            "bulk-size": 3,
+            "index": "test",
+            "retry-rejected": {
+                "initial-backoff": 0.5
+            }
+        })
+
+        self.assertEqual(True, result["success"])
+        self.assertEqual(3, result["success-count"])
+        self.assertEqual(0, result["error-count"])
+        self.assertEqual(45, result["took"])
+        self.assertEqual(3, result["rejected-count"])
+        self.assertEqual(2, result["retries"])
+        self.assertTrue(result["retry-time"] > 0)
+
+        es.bulk.assert_has_calls([
+            mock.call(body=b'{"index":{}}\n{"f":2}\n{"delete":{"_id":"3"}}\n', params={}),
+            mock.call(body=b'{"delete":{"_id":"3"}}\n', params={})
+        ])
+        sleep.assert_has_calls([mock.call(0.5), mock.call(1.0)])
+
+    @mock.patch("time.sleep")
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_gives_up_retrying_rejected_items(self, es, sleep):
+        es.bulk.return_value = {
+            "took": 10,
+            "errors": True,
+            "items": [
+                {"index": {"status": 429}}
+            ]
+        }
+        bulk = runner.BulkIndex()
+
+        result = bulk(es, {
+            "body": ["index_line"],
+            "action_metadata_present": False,
+            "bulk-size": 1,
+            "index": "test",
+            "type": "test-type",
+            "retry-rejected": {
+                "max-retries": 2,
+                "initial-backoff": 1,
+                "max-backoff": 1.5
+            }
+        })
+
+        self.assertEqual(False, result["success"])
+        self.assertEqual(0, result["success-count"])
+        self.assertEqual(1, result["error-count"])
+        self.assertEqual(3, result["rejected-count"])
+        self.assertEqual(2, result["retries"])
+
+        self.assertEqual(3, es.bulk.call_count)
+        es.bulk.assert_called_with(body=["index_line"], index="test", doc_type="test-type", params={})
+        sleep.assert_has_calls([mock.call(1), mock.call(1.5)])
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_bulk_index_without_rejections_does_not_retry(self, es):
+        es.bulk.return_value = '{"took":30,"errors":false,"items":[{"index":{"status":201}}]}'
+        bulk = runner.BulkIndex()
+
+        result = bulk(es, {
+            "body": ["action_meta_data", "index_line"],
+            "action_metadata_present": True,
+            "bulk-size": 1,
+            "retry-rejected": {}
+        })
+
+        self.assertEqual(True, result["success"])
+        self.assertEqual(0, result["rejected-count"])
+        self.assertEqual(0, result["retries"])
+        self.assertEqual(0, result["retry-time"])
+        self.assertEqual(1, es.bulk.call_count)
+
+    def test_extracts_took(self):
+        self.assertEqual(30, runner.took('{"took":30,"errors":false,"items":[]}'))
+        self.assertEqual(30, runner.took({"took": 30, "errors": False, "items": []}))
+        self.assertIsNone(runner.took('{\n  "took" : 30\n}'))
+        self.assertIsNone(runner.took({"acknowledged": True}))
+
+    def test_detects_raw_responses_without_errors(self):
+        self.assertTrue(runner.without_errors('{"took":30,"errors":false,"items":[]}'))
+        self.assertFalse(runner.without_errors('{"took":30,"errors":true,"items":[{"index":{"errors":false}}]}'))
+        # inconclusive
+        self.assertFalse(runner.without_errors('{\n  "took" : 30,\n  "errors" : false\n}'))
+
     @mock.patch("elasticsearch.Elasticsearch")
     def test_mixed_bulk_with_simple_stats(self, es):
         es.bulk.return_value = {
@@ -460,11 +606,37 @@ class BulkIndexRunnerTests(TestCase):
 
         es.bulk.assert_called_with(body=bulk_params["body"], params={})
 
+    def test_detailed_stats_for_items_without_shards(self):
+        response = {
+            "errors": True,
+            "items": [
+                {"index": {"status": 201, "result": "created", "_shards": {"total": 2, "successful": 2, "failed": 0}}},
+                {"index": {"status": 429, "error": {"type": "es_rejected_execution_exception"}}},
+                {"delete": {"status": 200, "result": "deleted", "_shards": {"total": 2, "successful": 2, "failed": 0}}},
+                {"index": {"status": 201, "result": "created", "_shards": {"total": 2, "successful": 1, "failed": 1}}}
+            ]
+        }
+
+        stats = runner.BulkIndex().detailed_stats(4, response)
+
+        self.assertEqual(False, stats["success"])
+        self.assertEqual(2, stats["success-count"])
+        self.assertEqual(2, stats["error-count"])
+        self.assertEqual({
+            "index": {"item-count": 3, "created": 2},
+            "delete": {"item-count": 1, "deleted": 1}
+        }, stats["ops"])
+        self.assertEqual([
+            {"item-count": 2, "shards": {"total": 2, "successful": 2, "failed": 0}},
+            {"item-count": 1, "shards": {"total": 2, "successful": 1, "failed": 1}}
+        ], stats["shards_histogram"])
+
 
 class QueryRunnerTests(TestCase):
     @mock.patch("elasticsearch.Elasticsearch")
     def test_query_match_all(self, es):
         es.search.return_value = {
+            "took": 5,
             "hits": {
                 "hits": [
                     {
@@ -488,10 +660,11 @@ class QueryRunnerTests(TestCase):
         }
 
         with query_runner:
-            num_ops, ops_unit = query_runner(es, params)
+            result = query_runner(es, params)
 
-        self.assertEqual(1, num_ops)
-        self.assertEqual("ops", ops_unit)
+        self.assertEqual(1, result["weight"])
+        self.assertEqual("ops", result["unit"])
+        self.assertEqual(5, result["took"])
 
     @mock.patch("elasticsearch.Elasticsearch")
     def test_scroll_query_only_one_page(self, es):
@@ -646,6 +819,47 @@ class QueryRunnerTests(TestCase):
         self.assertEqual(1, results["hits"])
         self.assertEqual("ops", results["unit"])
 
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_sliced_scroll_query(self, es):
+        es.search.return_value = {"_scroll_id": "some-scroll-id", "took": 12, "hits": {"hits": [{"_id": "1"}, {"_id": "2"}]}}
+        es.transport.perform_request.side_effect = [
+            {"_scroll_id": "some-scroll-id", "took": 3, "hits": {"hits": []}},
+            # delete scroll id response
+            {
+                "acknowledged": True
+            }
+        ]
+
+        query_runner = runner.Query()
+
+        params = {
+            "pages": "all",
+            "items_per_page": 100,
+            "index": "unittest",
+            "type": "type",
+            "use_request_cache": False,
+            "scroll_keep_alive": "1m",
+            "slice": {"id": 1, "max": 4},
+            "body": {
+                "query": {
+                    "match_all": {}
+                },
+                "slice": {"id": 1, "max": 4}
+            }
+        }
+
+        with query_runner:
+            results = query_runner(es, params)
+
+        self.assertEqual(2, results["pages"])
+        self.assertEqual(2, results["hits"])
+        self.assertEqual(15, results["took"])
+        self.assertEqual(1, results["slice-id"])
+        self.assertEqual(4, results["slices"])
+        es.search.assert_called_with(index="unittest", doc_type="type", body=params["body"], sort="_doc", scroll="1m", size=100,
+                                     request_cache=False)
+        es.transport.perform_request.assert_any_call("GET", "/_search/scroll", params={"scroll_id": "some-scroll-id", "scroll": "1m"})
+
     @mock.patch("elasticsearch.Elasticsearch")
     def test_scroll_query_request_all_pages(self, es):
         # page 1
@@ -704,3 +918,43 @@ class QueryRunnerTests(TestCase):
         self.assertEqual(2, results["pages"])
         self.assertEqual(4, results["hits"])
         self.assertEqual("ops", results["unit"])
+
+
+class MultiSearchRunnerTests(TestCase):
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_msearch(self, es):
+        es.msearch.return_value = {
+            "took": 14,
+            "responses": [
+                {"took": 12, "hits": {"hits": []}},
+                {"took": 8, "hits": {"hits": []}},
+                {"error": {"type": "index_not_found_exception"}, "status": 404}
+            ]
+        }
+        body = [{"index": "logs"}, {"query": {"match_all": {}}}] * 3
+
+        result = runner.MultiSearch()(es, {"body": body, "queries": 3})
+
+        self.assertEqual({
+            "weight": 3,
+            "unit": "queries",
+            "success": False,
+            "success-count": 2,
+            "error-count": 1,
+            "took": 14
+        }, result)
+        es.msearch.assert_called_with(body=body)
+
+    @mock.patch("elasticsearch.Elasticsearch")
+    def test_msearch_without_top_level_took(self, es):
+        es.msearch.return_value = {
+            "responses": [
+                {"took": 12, "hits": {"hits": []}},
+                {"took": 8, "hits": {"hits": []}}
+            ]
+        }
+
+        result = runner.MultiSearch()(es, {"body": [], "queries": 2})
+
+        self.assertTrue(result["success"])
+        self.assertEqual(12, result["took"])
@@ -739,6 +739,65 @@ class EsResultsStoreTests(TestCase):
         self.es_mock.bulk_index.assert_called_with(index="rally-results-2016-01", doc_type="results", items=expected_docs)
 
 
+class HistogramTests(TestCase):
+    def test_percentiles_within_relative_error(self):
+        h = metrics.Histogram(relative_error=0.001)
+        for i in range(1, 1001):
+            h.record(float(i))
+
+        self.assertEqual(1000, h.count)
+        self.assertEqual(1.0, h.min)
+        self.assertEqual(1000.0, h.max)
+        self.assertAlmostEqual(500.5, h.mean)
+        # nearest rank instead of interpolation
+        for percentile, expected in [(0, 1.0), (50, 500.0), (99, 990.0), (99.9, 999.0), (100, 1000.0)]:
+            self.assertAlmostEqual(expected, h.percentile(percentile), delta=expected * 0.001)
+
+    def test_records_zero(self):
+        h = metrics.Histogram()
+        h.record(0)
+        h.record(0)
+        h.record(10)
+
+        self.assertEqual(0, h.percentile(50))
+        self.assertEqual(10, h.percentile(100))
+
+    def test_empty_histogram(self):
+        h = metrics.Histogram()
+        self.assertIsNone(h.percentile(99))
+        self.assertIsNone(h.mean)
+
+    def test_merge(self):
+        h1 = metrics.Histogram()
+        h2 = metrics.Histogram()
+        for i in range(1, 501):
+            h1.record(float(i))
+        for i in range(501, 1001):
+            h2.record(float(i))
+
+        h1.merge(h2)
+
+        self.assertEqual(1000, h1.count)
+        self.assertEqual(1.0, h1.min)
+        self.assertEqual(1000.0, h1.max)
+        self.assertAlmostEqual(990.0, h1.percentile(99), delta=1.0)
+
+    def test_merge_requires_same_relative_error(self):
+        with self.assertRaises(exceptions.RallyAssertionError):
+            metrics.Histogram(relative_error=0.01).merge(metrics.Histogram(relative_error=0.001))
+
+    def test_round_trip(self):
+        h = metrics.Histogram()
+        for i in range(0, 100):
+            h.record(float(i))
+
+        restored = metrics.Histogram.from_dict(h.to_dict())
+
+        self.assertEqual(h.count, restored.count)
+        self.assertEqual(h.sum, restored.sum)
+        self.assertEqual(h.percentiles([50, 90, 100]), restored.percentiles([50, 90, 100]))
+
+
 class InMemoryMetricsStoreTests(TestCase):
     def setUp(self):
         self.cfg = config.Config()
@@ -793,6 +852,26 @@ class InMemoryMetricsStoreTests(TestCase):
 
         self.assertAlmostEqual(500.5, self.metrics_store.get_median("query_latency", lap=1))
 
+    def test_get_histogram(self):
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults", create=True)
+        for lap in [1, 2]:
+            self.metrics_store.lap = lap
+            h = metrics.Histogram()
+            for i in range(1, 501):
+                h.record(float(i + (lap - 1) * 500))
+            self.metrics_store.put_histogram_cluster_level("query_latency", h, "ms", operation="query")
+
+        self.metrics_store.close()
+
+        self.metrics_store.open(EsMetricsTests.TRIAL_TIMESTAMP, "test", "append-no-conflicts", "defaults")
+
+        self.assertEqual(500, self.metrics_store.get_one("query_latency_histogram", lap=1))
+        self.assertEqual(1000, self.metrics_store.get_histogram("query_latency", operation="query").count)
+        lap_histogram = self.metrics_store.get_histogram("query_latency", operation="query", lap=2)
+        self.assertEqual(500, lap_histogram.count)
+        self.assertEqual(501.0, lap_histogram.min)
+        self.assertIsNone(self.metrics_store.get_histogram("query_latency", operation="unknown"))
+
     def assert_equal_percentiles(self, name, percentiles, expected_percentiles):
         actual_percentiles = self.metrics_store.get_percentiles(name, percentiles=percentiles)
         self.assertEqual(len(expected_percentiles), len(actual_percentiles))
@@ -52,6 +52,46 @@ class StatsCalculatorTests(TestCase):
         self.assertEqual(collections.OrderedDict([("50", 200), ("100", 215)]), opm["service_time"])
         self.assertAlmostEqual(0.3333333333333333, opm["error_rate"])
 
+    def test_calculate_stats_from_histograms(self):
+        cfg = config.Config()
+        cfg.add(config.Scope.application, "system", "env.name", "unittest")
+        cfg.add(config.Scope.application, "system", "time.start", datetime.datetime.now())
+        cfg.add(config.Scope.application, "reporting", "datastore.type", "in-memory")
+        cfg.add(config.Scope.application, "mechanic", "car.name", "unittest_car")
+        cfg.add(config.Scope.application, "race", "laps", 1)
+        cfg.add(config.Scope.application, "race", "user.tag", "")
+        cfg.add(config.Scope.application, "race", "pipeline", "from-sources-skip-build")
+
+        search = track.Task(operation=track.Operation(name="search", operation_type=track.OperationType.Search, params=None))
+        challenge = track.Challenge(name="unittest", description="", index_settings=None, schedule=[search], default=True)
+        t = track.Track("unittest", "unittest-track", challenges=[challenge])
+
+        store = metrics.metrics_store(cfg, read_only=False, track=t, challenge=challenge)
+        store.lap = 1
+
+        store.put_value_cluster_level("throughput", 100, unit="ops/s", operation="search", operation_type=track.OperationType.Search)
+
+        latency = metrics.Histogram()
+        service_time = metrics.Histogram()
+        for i in range(1, 101):
+            latency.record(float(i) + 10)
+            service_time.record(float(i))
+        store.put_histogram_cluster_level("latency", latency, unit="ms", operation="search", operation_type=track.OperationType.Search)
+        store.put_histogram_cluster_level("service_time", service_time, unit="ms", operation="search",
+                                          operation_type=track.OperationType.Search)
+        store.put_count_cluster_level("error_count", 5, operation="search", operation_type=track.OperationType.Search)
+
+        stats = reporter.calculate_results(store, metrics.create_race(cfg, t, challenge))
+
+        del store
+
+        opm = stats.metrics("search")
+        self.assertEqual(["50", "90", "99", "100"], list(opm["latency"].keys()))
+        self.assertAlmostEqual(60, opm["latency"]["50"], delta=0.1)
+        self.assertAlmostEqual(110, opm["latency"]["100"])
+        self.assertAlmostEqual(100, opm["service_time"]["100"])
+        self.assertAlmostEqual(0.05, opm["error_rate"])
+
 
 def select(l, name, operation=None):
     for item in l:
@@ -140,6 +180,47 @@ class StatsTests(TestCase):
             }
         }, select(metric_list, "old_gc_time"))
 
+    def test_as_flat_list_with_max_sustainable_throughput(self):
+        s = reporter.Stats()
+        s.add_op_metrics("term", {"min": 480, "median": 500, "max": 510, "unit": "ops/s"}, {}, {}, 0.0,
+                         max_sustainable_throughput={"value": 500, "unit": "ops/s"})
+
+        self.assertEqual({
+            "name": "max_sustainable_throughput",
+            "operation": "term",
+            "value": {
+                "single": 500
+            }
+        }, select(s.as_flat_list(), "max_sustainable_throughput", "term"))
+
+    def test_as_flat_list_with_driver_overhead(self):
+        s = reporter.Stats()
+        s.add_op_metrics("term", {"min": 480, "median": 500, "max": 510, "unit": "ops/s"}, {}, {}, 0.0,
+                         driver_overhead={"params": 0.2, "sampling": 0.05})
+
+        self.assertEqual({
+            "name": "driver_overhead_params",
+            "operation": "term",
+            "value": {
+                "single": 0.2
+            }
+        }, select(s.as_flat_list(), "driver_overhead_params", "term"))
+        self.assertIsNone(select(s.as_flat_list(), "driver_overhead_serialization", "term"))
+
+    def test_as_flat_list_with_server_time(self):
+        s = reporter.Stats()
+        s.add_op_metrics("term", {"min": 480, "median": 500, "max": 510, "unit": "ops/s"}, {}, {}, 0.0,
+                         server_time=collections.OrderedDict([("50", 2), ("100", 4)]))
+
+        self.assertEqual({
+            "name": "server_time",
+            "operation": "term",
+            "value": {
+                "50": 2,
+                "100": 4
+            }
+        }, select(s.as_flat_list(), "server_time", "term"))
+
 
 class ComparisonReporterTests(TestCase):
     def test_formats_table(self):
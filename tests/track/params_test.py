@@ -448,6 +448,17 @@ class BulkIndexParamSourceTests(TestCase):
 
         self.assertEqual("'batch-size' must be a multiple of 'bulk-size'", ctx.exception.args[0])
 
+    def test_create_with_invalid_retry_policy(self):
+        with self.assertRaises(exceptions.InvalidSyntax) as ctx:
+            params.BulkIndexParamSource(indices=[], params={
+                "bulk-size": 5,
+                "retry-rejected": {
+                    "max-retries": -1
+                }
+            })
+
+        self.assertEqual("'max-retries' in 'retry-rejected' must be a non-negative number but was [-1]", ctx.exception.args[0])
+
     def test_create_with_no_metadata_but_conflicts(self):
         with self.assertRaises(exceptions.InvalidSyntax) as ctx:
             params.BulkIndexParamSource(indices=[], params={
@@ -626,6 +637,85 @@ class BulkDataGeneratorTests(TestCase):
         }, all_bulks[0])
 
 
+class SearchParamSourceTests(TestCase):
+    def test_assigns_slices_to_clients(self):
+        source = params.SearchParamSource(indices=[], params={
+            "index": "logs",
+            "type": "log",
+            "body": {"query": {"match_all": {}}},
+            "pages": "all",
+            "results-per-page": 1000,
+            "sliced-scroll": True
+        })
+
+        partitions = [source.partition(i, 3).params() for i in range(3)]
+
+        for i, p in enumerate(partitions):
+            self.assertEqual({"id": i, "max": 3}, p["slice"])
+            self.assertEqual({"query": {"match_all": {}}, "slice": {"id": i, "max": 3}}, p["body"])
+        # the original body is untouched
+        self.assertEqual({"query": {"match_all": {}}}, source.params()["body"])
+
+    def test_does_not_slice_for_single_client(self):
+        source = params.SearchParamSource(indices=[], params={
+            "index": "logs",
+            "body": {"query": {"match_all": {}}},
+            "pages": 10,
+            "results-per-page": 1000,
+            "sliced-scroll": True
+        })
+
+        self.assertIs(source, source.partition(0, 1))
+        self.assertNotIn("slice", source.params())
+
+    def test_sliced_scroll_requires_pages(self):
+        with self.assertRaisesRegex(exceptions.InvalidSyntax, "'sliced-scroll' requires 'pages'"):
+            params.SearchParamSource(indices=[], params={
+                "index": "logs",
+                "body": {"query": {"match_all": {}}},
+                "sliced-scroll": True
+            })
+
+
+class MultiSearchParamSourceTests(TestCase):
+    def test_batches_query_bodies_round_robin(self):
+        source = params.param_source_for_operation(track.OperationType.MultiSearch.name, [], {
+            "index": "logs",
+            "type": "log",
+            "cache": False,
+            "queries-per-request": 3,
+            "bodies": [
+                {"query": {"term": {"status": 200}}},
+                {"query": {"term": {"status": 404}}}
+            ]
+        })
+        header = {"index": "logs", "type": "log", "request_cache": False}
+
+        first = source.params()
+        self.assertEqual(3, first["queries"])
+        self.assertEqual([header, {"query": {"term": {"status": 200}}},
+                          header, {"query": {"term": {"status": 404}}},
+                          header, {"query": {"term": {"status": 200}}}], first["body"])
+        second = source.params()
+        self.assertEqual([header, {"query": {"term": {"status": 404}}},
+                          header, {"query": {"term": {"status": 200}}},
+                          header, {"query": {"term": {"status": 404}}}], second["body"])
+        # requests are reused once all distinct batches have been built
+        self.assertIs(first, source.params())
+
+    def test_derives_index_and_type(self):
+        index = track.Index(name="logs", auto_managed=True, types=[track.Type(name="log", mapping_file=None)])
+        source = params.MultiSearchParamSource([index], {"body": {"query": {"match_all": {}}}})
+
+        p = source.params()
+        self.assertEqual(10, p["queries"])
+        self.assertEqual([{"index": "logs", "type": "log"}, {"query": {"match_all": {}}}] * 10, p["body"])
+
+    def test_requires_query_body(self):
+        with self.assertRaisesRegex(exceptions.InvalidSyntax, "Either 'body' or 'bodies' is mandatory"):
+            params.MultiSearchParamSource([], {"index": "logs"})
+
+
 class ParamsRegistrationTests(TestCase):
     @staticmethod
     def param_source_function(indices, params):